@@ -0,0 +1,136 @@
+import logging
+from collections import Counter
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.changes import ChangeSet
+from app.db.errors import DATABASE_ERRORS
+from app.db.models import District, Street
+
+
+def district_slug(name_en: str) -> str:
+    """Returns slug of district used by map, e.g. 'Vake District' → 'vake'"""
+
+    return name_en.lower().removesuffix(' district').replace(' ', '-')
+
+
+class DistrictAggregates:
+    """
+    Number of streets affected by active outages per district,
+    split by outage type and emergency, for the interactive map.
+
+    Aggregates are maintained incrementally from change set of every
+    new snapshot, so map requests only read precomputed values.
+    Rendered fragments are cached until the next change. Districts of
+    streets are reloaded with `reload` after update_streets replaced them.
+
+    Example:
+        ```python
+        aggregates = await DistrictAggregates.load(async_session)
+        refresher.subscribe(aggregates.update)
+        aggregates.get('vake')
+        ```
+    """
+
+    def __init__(
+        self,
+        streets: Iterable[Tuple[int, int]] = (),
+        districts: Iterable[Tuple[int, str]] = ()
+    ) -> None:
+        self.street_districts: Dict[int, int] = dict(streets)
+        self.districts: Dict[str, int] = {district_slug(name_en): district_id for district_id, name_en in districts}
+        # Number of active outages referencing each street, per district and per (district, type, emergency)
+        self._streets: Dict[int, Counter] = {}
+        self._streets_by_type: Dict[Tuple[int, str, bool], Counter] = {}
+        self._aggregates: Dict[str, dict] = {}
+        self._fragments: Dict[str, str] = {}
+
+    @classmethod
+    async def load(cls, sessionmaker: Optional[async_sessionmaker[AsyncSession]]) -> 'DistrictAggregates':
+        """Loads districts of streets from database, empty aggregates if database is unavailable"""
+
+        aggregates = cls()
+        if sessionmaker is not None:
+            await aggregates.reload(sessionmaker, lambda: ())
+        return aggregates
+
+    async def reload(
+        self, sessionmaker: async_sessionmaker[AsyncSession], outages: Callable[[], Iterable[dict]]
+    ) -> bool:
+        """
+        Replaces districts of streets with ones from database, e.g. after
+        update_streets, and recounts active outages returned by `outages`.
+        Aggregates are kept as is if database is unavailable.
+        Returns whether districts are reloaded.
+        """
+
+        try:
+            async with sessionmaker() as session:
+                streets = (await session.execute(select(Street.id, Street.district_id))).tuples().all()
+                districts = (await session.execute(select(District.id, District.name_en))).tuples().all()
+        except DATABASE_ERRORS as err:
+            logging.error(f"Error occured when loading districts from database. {err}")
+            return False
+
+        self.street_districts = dict(streets)
+        self.districts = {district_slug(name_en): district_id for district_id, name_en in districts}
+        # Outages are taken after the last await, so no change set is missed in between
+        self._streets = {}
+        self._streets_by_type = {}
+        self.update(ChangeSet(added=list(outages())))
+        return True
+
+    def update(self, changes: ChangeSet) -> None:
+        """Applies change set of outages to aggregates"""
+
+        for outage in changes.removed:
+            self._apply(outage, -1)
+        for previous, current in changes.changed:
+            self._apply(previous, -1)
+            self._apply(current, 1)
+        for outage in changes.added:
+            self._apply(outage, 1)
+        self._aggregates = {slug: self._aggregate(district_id) for slug, district_id in self.districts.items()}
+        self._fragments = {}
+
+    def _apply(self, outage: dict, delta: int) -> None:
+        for street_id in outage.get('street_ids') or ():
+            district_id = self.street_districts.get(street_id)
+            if district_id is None:
+                continue
+            key = (district_id, outage.get('type'), bool(outage.get('emergency')))
+            for counter in (
+                self._streets.setdefault(district_id, Counter()),
+                self._streets_by_type.setdefault(key, Counter())
+            ):
+                counter[street_id] += delta
+                if counter[street_id] <= 0:
+                    del counter[street_id]
+
+    def _aggregate(self, district_id: int) -> dict:
+        types = {}
+        for (key_district_id, outage_type, emergency), streets in self._streets_by_type.items():
+            if key_district_id == district_id and streets:
+                types.setdefault(outage_type, {'planned': 0, 'emergency': 0})
+                types[outage_type]['emergency' if emergency else 'planned'] = len(streets)
+        return {'streets': len(self._streets.get(district_id, ())), 'types': types}
+
+    def all(self) -> Dict[str, dict]:
+        return self._aggregates
+
+    def get(self, slug: str) -> Optional[dict]:
+        if slug not in self.districts:
+            return None
+        return self._aggregates.get(slug, {'streets': 0, 'types': {}})
+
+    def get_fragment(self, slug: str, render: Callable[[str, dict], str]) -> Optional[str]:
+        """Returns html fragment of district, rendered once per change"""
+
+        aggregate = self.get(slug)
+        if aggregate is None:
+            return None
+        if slug not in self._fragments:
+            self._fragments[slug] = render(slug, aggregate)
+        return self._fragments[slug]
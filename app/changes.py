@@ -0,0 +1,63 @@
+import hashlib
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Tuple
+
+
+def fingerprint(outage: dict, street_id: Optional[int] = None) -> str:
+    """
+    Returns stable sha256 fingerprint of scrapped outage content,
+    street_id is included for outage rows of particular streets
+    """
+
+    description = ' '.join(str(outage.get('description') or '').split()).lower()
+    key = '|'.join([
+        str(outage.get('provider')),
+        str(outage.get('type')),
+        str(outage.get('date')),
+        str(bool(outage.get('emergency'))),
+        description
+    ] + ([str(street_id)] if street_id is not None else []))
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def get_fingerprint(outage: dict) -> str:
+    """Returns fingerprint attached to outage by provider, computes it for outages without one"""
+
+    return outage.get('fingerprint') or fingerprint(outage)
+
+
+@dataclass(frozen=True)
+class ChangeSet:
+    """
+    Difference between two runs of outages, keyed by fingerprint.
+
+    Outages with the same fingerprint but different other fields
+    (e.g. title or matched streets) are changed, kept as (previous, current).
+    """
+
+    added: List[dict] = field(default_factory=list)
+    changed: List[Tuple[dict, dict]] = field(default_factory=list)
+    removed: List[dict] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+
+def diff(previous: Iterable[dict], current: Iterable[dict]) -> ChangeSet:
+    """Returns change set of current outages against previous ones in single hashed pass"""
+
+    remaining = {get_fingerprint(outage): outage for outage in previous}
+    changes = ChangeSet()
+    seen = set()
+    for outage in current:
+        key = get_fingerprint(outage)
+        if key in seen:
+            continue
+        seen.add(key)
+        known = remaining.pop(key, None)
+        if known is None:
+            changes.added.append(outage)
+        elif known != outage:
+            changes.changed.append((known, outage))
+    changes.removed.extend(remaining.values())
+    return changes
@@ -2,9 +2,35 @@
 import os
 import sys
 import logging
-from typing import Optional, List
+from typing import Dict, Optional, List
 import argparse
-from sqlalchemy import create_engine, update
+import csv
+import io
+import json
+import random
+import threading
+import hashlib
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Connection,
+    Float,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    delete,
+    exists,
+    func,
+    select,
+    tuple_,
+    update
+)
+from sqlalchemy.dialects.postgresql import JSONB, insert
 from sqlalchemy.orm import Session
 import overpy
 import time
@@ -14,13 +40,159 @@ sys.path.append(
     os.path.join(os.path.dirname(__file__), '..')
 )
 
-from settings import DATABASE_URL  # noqa: E402
-from app.db.models import City, District, Street  # noqa: E402
+from settings import (  # noqa: E402
+    DATABASE_URL,
+    OVERPASS_WORKERS,
+    OVERPASS_RATE,
+    OVERPASS_BURST,
+    OVERPASS_RETRIES,
+    OVERPASS_BACKOFF,
+    OVERPASS_CACHE_DIR,
+    STREET_SIMPLIFY_TOLERANCE,
+    METRICS_TEXTFILE
+)
+from app.db.models import City, District, Street, Subscription  # noqa: E402
+from app.geo import centroid, simplify  # noqa: E402
+from app.metrics import UPDATE_STREETS_DURATION, instrument_engine, write_textfile  # noqa: E402
 
 
 logging.basicConfig(level=logging.DEBUG)
 
 
+OVERPASS_QUERY = """
+[out:json];
+area["name:en"="{district}"]->.district;
+(
+way(area.district)["highway"="trunk"]["name"];
+way(area.district)["highway"="primary"]["name"]["bridge"!="Yes"];
+way(area.district)["highway"="secondary"]["name"];
+way(area.district)["highway"="tertiary"]["name"];
+way(area.district)["highway"="residential"]["name"];
+way(area.district)["highway"="living_street"]["name"];
+);
+out tags geom;
+"""
+
+
+def way_geometry(way: overpy.Way) -> dict:
+    """
+    Returns simplified [[lat, lon], ...] vertices of way with its center,
+    rounded to about 10 cm, so unchanged ways compare equal to stored ones
+    """
+
+    points = [(float(point['lat']), float(point['lon'])) for point in way.attributes.get('geometry') or () if point]
+    if not points:
+        return {'lat': None, 'lon': None, 'geometry': None}
+    geometry = [(round(lat, 6), round(lon, 6)) for lat, lon in simplify(points, STREET_SIMPLIFY_TOLERANCE)]
+    lat, lon = centroid(geometry)
+    return {'lat': round(lat, 6), 'lon': round(lon, 6), 'geometry': [list(point) for point in geometry]}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Tokens are refilled at `rate` per second up to `capacity`,
+    `acquire` blocks until a token is available.
+    """
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class OverpassCache:
+    """
+    Content-addressed on-disk cache of raw Overpass responses.
+
+    Responses are stored once as objects/<sha256 of response>.json,
+    refs/<sha256 of district and query> points to the latest response
+    of district query, so reruns with unchanged OSM data share objects.
+    """
+
+    def __init__(self, directory: str = OVERPASS_CACHE_DIR) -> None:
+        self.directory = Path(directory)
+
+    def _ref(self, district: str, query: str) -> Path:
+        key = hashlib.sha256(f"{district}\0{query}".encode()).hexdigest()
+        return self.directory / 'refs' / key
+
+    def get(self, district: str, query: str) -> Optional[bytes]:
+        ref = self._ref(district, query)
+        if not ref.exists():
+            return None
+        return (self.directory / 'objects' / f"{ref.read_text().strip()}.json").read_bytes()
+
+    def put(self, district: str, query: str, data: bytes) -> None:
+        digest = hashlib.sha256(data).hexdigest()
+        obj = self.directory / 'objects' / f"{digest}.json"
+        ref = self._ref(district, query)
+        obj.parent.mkdir(parents=True, exist_ok=True)
+        ref.parent.mkdir(parents=True, exist_ok=True)
+        if not obj.exists():
+            obj.write_bytes(data)
+        # Replace ref atomically, concurrent readers never see partial file
+        tmp = ref.with_suffix('.tmp')
+        tmp.write_text(digest)
+        tmp.replace(ref)
+
+
+class RecordingOverpass(overpy.Overpass):
+    """Overpass API client keeping raw json response of the last query"""
+
+    raw: Optional[bytes] = None
+
+    def parse_json(self, data, encoding: str = 'utf-8') -> overpy.Result:
+        self.raw = data if isinstance(data, bytes) else data.encode(encoding)
+        return super().parse_json(data, encoding)
+
+
+def replay_district_streets(district: str, cache: OverpassCache) -> overpy.Result:
+    """Returns streets of district from cached Overpass response without network"""
+
+    data = cache.get(district, OVERPASS_QUERY.format(district=district))
+    if data is None:
+        raise LookupError(f"No cached Overpass response for {district}")
+    return overpy.Overpass().parse_json(data)
+
+
+def query_district_streets(district: str, bucket: TokenBucket, cache: OverpassCache) -> overpy.Result:
+    """
+    Queries Overpass API for streets of district and caches raw response,
+    retries with exponential backoff and jitter when server is overloaded
+    """
+
+    query = OVERPASS_QUERY.format(district=district)
+    api = RecordingOverpass()
+    for attempt in range(OVERPASS_RETRIES):
+        bucket.acquire()
+        try:
+            result = api.query(query)
+            cache.put(district, query, api.raw)
+            return result
+        except (overpy.exception.OverpassTooManyRequests, overpy.exception.OverpassGatewayTimeout) as err:
+            if attempt == OVERPASS_RETRIES - 1:
+                raise
+            delay = OVERPASS_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5)
+            logging.warning(f"Overpass API is overloaded ({err}), retry for {district} in {delay:.1f}s.")
+            time.sleep(delay)
+
+
 class Database:
     """
     The primary purpose of this class is to populate the database with initial data
@@ -29,16 +201,28 @@ class Database:
     Attributes (optional):
         cities (list): List of city dictionaries.
         districts (list): List of district dictionaries.
+        cache (OverpassCache): Cache of raw Overpass responses, OVERPASS_CACHE_DIR by default.
 
     Methods:
         setup_cities(self): Populate database with cities.
         setup_districts(self): Populate database with districts.
-        update_streets(self): Interface with the Overpass API, to update streets data.
-        Update existing, Insert new and Delete removed (key is Street.osm_id column).
+        update_streets(self, replay): Interface with the Overpass API, to update streets data.
+        Districts are queried concurrently under rate limit, returns status of each district.
+        Raw responses are cached on disk, replay=True runs sync from cache without network.
+        sync_streets(self, streets, district_ids): Update existing, Insert new and Delete removed
+        (key is Street.osm_id column) with set-based statements in one transaction,
+        only streets which differ from database are written.
     """
 
-    def __init__(self, cities: Optional[List[dict]] = None, districts: Optional[List[dict]] = None) -> None:
+    def __init__(
+        self,
+        cities: Optional[List[dict]] = None,
+        districts: Optional[List[dict]] = None,
+        cache: Optional[OverpassCache] = None
+    ) -> None:
         self.engine = create_engine(DATABASE_URL)
+        instrument_engine(self.engine)
+        self.cache = cache if cache is not None else OverpassCache()
         self.cities = cities if cities is not None else [{'name_en': 'Tbilisi', 'name_ka': 'თბილისი'}]
         self.districts = districts if districts is not None else [
             {"city_id": 1, "name_en": "Samgori District", "name_ka": "სამგორის რაიონი"},
@@ -84,78 +268,168 @@ class Database:
                     logging.info(f"{district_name} already exists in the database.")
         return
 
-    def update_streets(self) -> None:  # noqa: C901
-
-        api = overpy.Overpass()
-        query = """
-        [out:json];
-        area["name:en"="{district}"]->.district;
-        (
-        way(area.district)["highway"="trunk"]["name"];
-        way(area.district)["highway"="primary"]["name"]["bridge"!="Yes"];
-        way(area.district)["highway"="secondary"]["name"];
-        way(area.district)["highway"="tertiary"]["name"];
-        way(area.district)["highway"="residential"]["name"];
-        way(area.district)["highway"="living_street"]["name"];
-        );
-        out tags;
-        """
+    def update_streets(self, replay: bool = False) -> Dict[str, str]:
+
         with Session(self.engine) as session:
             districts = session.query(District).all()
-            new_streets = []
-            old_streets = session.query(Street).all()
 
-            # Map existing streets by osm_id column as key
-            existing_streets_map = {old_street.osm_id: old_street for old_street in old_streets}
+        new_streets = []
+        synced_districts = []
+        statuses = {}
 
-            # TODO: Need refactoring
-            for district in districts:
-                logging.info(f"Trying to retrieve all streets of {district.name_en}.")
+        with UPDATE_STREETS_DURATION.time(phase='fetch'), ThreadPoolExecutor(max_workers=OVERPASS_WORKERS) as executor:
+            if replay:
+                fetch = partial(replay_district_streets, cache=self.cache)
+            else:
+                fetch = partial(
+                    query_district_streets, bucket=TokenBucket(OVERPASS_RATE, OVERPASS_BURST), cache=self.cache
+                )
+            futures = {
+                executor.submit(fetch, district.name_en): district
+                for district in districts
+            }
+            for future in as_completed(futures):
+                district = futures[future]
                 try:
-                    time.sleep(0.1)
-                    result = api.query(query.format(district=district.name_en))
-                    logging.info(f"{len(result.ways)} streets retrieved successfully.")
+                    result = future.result()
                 except Exception as err:
-                    logging.error(f"Error occured when retrieving data from Overpass API. {err}")
-                for way in result.ways:
-                    street = {
+                    statuses[district.name_en] = f"failed: {err}"
+                    logging.error(f"Error occured when retrieving streets of {district.name_en}. {err}")
+                    continue
+                statuses[district.name_en] = f"{len(result.ways)} streets"
+                logging.info(f"{len(result.ways)} streets of {district.name_en} retrieved successfully.")
+                synced_districts.append(district.id)
+                new_streets.extend(
+                    {
                         'district_id': district.id,
                         'name_en': way.tags.get('name:en'),
                         'name_ka': way.tags.get('name:ka', way.tags.get('name')),
-                        'osm_id': way.id
+                        'osm_id': way.id,
+                        **way_geometry(way)
                     }
-                    new_streets.append(street)
-
-            # Update existing streets
-            for street in new_streets:
-                exists = existing_streets_map.get(street['osm_id'])
-                if exists:
-                    try:
-                        session.execute(update(Street).where(Street.osm_id == street['osm_id']).values(street))
-                        session.commit()
-                    except Exception as err:
-                        session.rollback()
-                        logging.error(f"Error occured when updating streets in database. {err}")
-
-            # Insert new streets
-            try:
-                insert_mapping = [street for street in new_streets if street['osm_id'] not in existing_streets_map]
-                session.bulk_insert_mappings(Street, insert_mapping)
-                session.commit()
-            except Exception as err:
-                session.rollback()
-                logging.error(f"Error occured when inserting new streets in database. {err}")
-
-            # Delete removed streets
-            try:
-                filter_mapping = [street['osm_id'] for street in new_streets]
-                session.query(Street).filter(~Street.osm_id.in_(filter_mapping)).delete(synchronize_session=False)
-                session.commit()
-            except Exception as err:
-                session.rollback()
-                logging.error(f"Error occered when deleting removed streets from database. {err}")
+                    for way in result.ways
+                )
 
-        return
+        if not self.sync_streets(new_streets, synced_districts):
+            statuses.update({
+                district.name_en: f"failed: {statuses[district.name_en]} retrieved, but not saved"
+                for district in districts if district.id in synced_districts
+            })
+        return statuses
+
+    def sync_streets(self, streets: List[dict], district_ids: List[int]) -> bool:
+        """
+        Synchronizes street table with given streets in one transaction:
+        streets are copied into temporary table, then inserted or updated
+        with single INSERT ... ON CONFLICT (osm_id), which writes only rows
+        that differ, and removed ones are deleted with single anti-join.
+
+        Only streets of given districts are deleted, so streets of districts
+        which failed to be retrieved are kept. Returns whether streets are saved.
+        """
+
+        try:
+            with self.engine.begin() as connection:
+                with UPDATE_STREETS_DURATION.time(phase='copy'):
+                    street_sync = self._copy_streets(connection, streets)
+                with UPDATE_STREETS_DURATION.time(phase='write'):
+                    self._write_streets(connection, street_sync, district_ids)
+        except Exception as err:
+            logging.error(f"Error occured when synchronizing streets in database. {err}")
+            return False
+
+        return True
+
+    @staticmethod
+    def _copy_streets(connection: Connection, streets: List[dict]) -> Table:
+        """Copies streets into temporary table dropped on commit, returns the table"""
+
+        street_sync = Table(
+            'street_sync', MetaData(),
+            Column('district_id', Integer),
+            Column('name_en', String(255)),
+            Column('name_ka', String(255)),
+            Column('osm_id', BigInteger),
+            Column('lat', Float),
+            Column('lon', Float),
+            Column('geometry', JSONB),
+            prefixes=['TEMPORARY'],
+            postgresql_on_commit='DROP'
+        )
+
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(
+            (
+                street['district_id'], street['name_en'], street['name_ka'], street['osm_id'],
+                street.get('lat'), street.get('lon'),
+                json.dumps(street['geometry']) if street.get('geometry') else None
+            )
+            for street in streets
+        )
+        buffer.seek(0)
+
+        street_sync.create(connection)
+        connection.connection.cursor().copy_expert(
+            "COPY street_sync (district_id, name_en, name_ka, osm_id, lat, lon, geometry) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+        logging.info(f"{len(streets)} streets copied to staging table.")
+        return street_sync
+
+    @staticmethod
+    def _write_streets(connection: Connection, street_sync: Table, district_ids: List[int]) -> None:
+        """
+        Applies staged streets with set-based statements, subscriptions
+        of deleted streets are matched again to streets of the same name
+        """
+
+        # Ways on district borders are returned for both districts, first district is kept
+        columns = ['district_id', 'name_en', 'name_ka', 'osm_id', 'lat', 'lon', 'geometry']
+        upsert = insert(Street).from_select(
+            columns,
+            select(*[street_sync.c[column] for column in columns])
+            .distinct(street_sync.c.osm_id)
+            .order_by(street_sync.c.osm_id, street_sync.c.district_id)
+        )
+        values = [column for column in columns if column != 'osm_id']
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[Street.osm_id],
+            set_={column: upsert.excluded[column] for column in values},
+            where=tuple_(*[Street.__table__.c[column] for column in values]).is_distinct_from(
+                tuple_(*[upsert.excluded[column] for column in values])
+            )
+        )
+        upserted = connection.execute(upsert).rowcount
+        logging.info(f"{upserted} streets inserted or updated.")
+
+        connection.execute(
+            update(Subscription)
+            .where(Subscription.street_id == Street.id, Subscription.street_name.is_distinct_from(Street.name_ka))
+            .values(street_name=Street.name_ka)
+        )
+        deleted = connection.execute(
+            delete(Street).where(
+                Street.district_id.in_(district_ids),
+                ~exists().where(street_sync.c.osm_id == Street.osm_id)
+            )
+        ).rowcount
+        logging.info(f"{deleted} removed streets deleted.")
+
+        rematched = connection.execute(
+            update(Subscription)
+            .where(Subscription.street_id.is_(None), Subscription.street_name.in_(select(Street.name_ka)))
+            .values(street_id=select(func.min(Street.id)).where(Street.name_ka == Subscription.street_name)
+                    .scalar_subquery())
+        ).rowcount
+        logging.info(f"{rematched} subscriptions of removed streets matched again.")
+
+
+def report_statuses(statuses: Dict[str, str]) -> bool:
+    """Prints status of every district, returns whether any of them failed"""
+
+    for district, status in sorted(statuses.items()):
+        print(f"{district}: {status}")
+    return any(status.startswith('failed') for status in statuses.values())
 
 
 def main():
@@ -165,9 +439,15 @@ def main():
         'function',
         help='Function to execute [setup_cities, setup_districts, update_streets]'
     )
+    parser.add_argument(
+        '--replay',
+        action='store_true',
+        help='Run update_streets from cached Overpass responses without network'
+    )
     args = parser.parse_args()
 
     db = Database()
+    failed = False
 
     match args.function:
         case 'setup_cities':
@@ -175,10 +455,14 @@ def main():
         case 'setup_districts':
             db.setup_districts()
         case 'update_streets':
-            db.update_streets()
+            failed = report_statuses(db.update_streets(replay=args.replay))
         case _:
             print('Command does not exist')
-    pass
+
+    if METRICS_TEXTFILE:
+        write_textfile(METRICS_TEXTFILE)
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == '__main__':
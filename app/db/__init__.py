@@ -1,4 +1,4 @@
-from app.db.models import City, District, Street, Outage
+from app.db.models import City, District, Street, Outage, HashSum, Subscription
 
 
-__all__ = ['City', 'District', 'Street', 'Outage']
+__all__ = ['City', 'District', 'Street', 'Outage', 'HashSum', 'Subscription']
@@ -0,0 +1,7 @@
+import asyncpg
+from sqlalchemy.exc import SQLAlchemyError
+
+
+# Errors of unavailable or misconfigured database, asyncpg raises some of them
+# (e.g. wrong password or database name) on connect without SQLAlchemy wrapper
+DATABASE_ERRORS = (SQLAlchemyError, asyncpg.PostgresError, OSError)
@@ -2,14 +2,19 @@ from datetime import datetime
 import uuid
 
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import func
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy import (
+    BigInteger,
+    CheckConstraint,
     ForeignKey,
     Integer,
     String,
     Text,
     Boolean,
     DateTime,
+    Float,
+    Index,
     Uuid
 )
 
@@ -46,12 +51,20 @@ class Street(Base):
     """Street model"""
 
     __tablename__ = 'street'
+    __table_args__ = (
+        Index('ix_street_name_en_trgm', 'name_en', postgresql_using='gin', postgresql_ops={'name_en': 'gin_trgm_ops'}),
+        Index('ix_street_name_ka_trgm', 'name_ka', postgresql_using='gin', postgresql_ops={'name_ka': 'gin_trgm_ops'}),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    district_id: Mapped[int] = mapped_column(Integer, ForeignKey('district.id'))
+    district_id: Mapped[int] = mapped_column(Integer, ForeignKey('district.id'), index=True)
     name_en: Mapped[str] = mapped_column(String(255), nullable=True)
     name_ka: Mapped[str] = mapped_column(String(255), nullable=False)
-    osm_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    osm_id: Mapped[int] = mapped_column(BigInteger, nullable=False, unique=True, index=True)
+    # Center of way and its simplified [[lat, lon], ...] vertices, see NearbyIndex
+    lat: Mapped[float] = mapped_column(Float, nullable=True)
+    lon: Mapped[float] = mapped_column(Float, nullable=True)
+    geometry: Mapped[list] = mapped_column(JSONB, nullable=True)
 
     district = relationship('District', back_populates='streets')
     outages = relationship('Outage', back_populates='street')
@@ -61,9 +74,16 @@ class Outage(Base):
     """Outage model"""
 
     __tablename__ = 'outage'
+    __table_args__ = (
+        # Active outages, listed by id and resolved per provider on every refresh
+        Index('ix_outage_active_id', 'id', postgresql_where=text('resolved_at IS NULL')),
+        Index('ix_outage_active_provider', 'provider', postgresql_where=text('resolved_at IS NULL')),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    street_id: Mapped[int] = mapped_column(Integer, ForeignKey('street.id'))
+    street_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('street.id', ondelete='SET NULL'), nullable=True, index=True
+    )
     house_number: Mapped[int] = mapped_column(Integer, nullable=True)
     type: Mapped[str] = mapped_column(String(255), nullable=False)
     provider: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -75,7 +95,9 @@ class Outage(Base):
     start: Mapped[datetime] = mapped_column(DateTime, nullable=True)
     end: Mapped[datetime] = mapped_column(DateTime, nullable=True)
     uuid: Mapped['uuid.UUID'] = mapped_column(Uuid, default=uuid.uuid4, nullable=False)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now, nullable=False)
+    fingerprint: Mapped[str] = mapped_column(String(64), nullable=False, unique=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now(), nullable=False)
+    resolved_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
 
     street = relationship('Street', back_populates='outages')
 
@@ -89,5 +111,38 @@ class HashSum(Base):
     __tablename__ = 'hash_sum'
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    url: Mapped[str] = mapped_column(String(255), nullable=False)
+    url: Mapped[str] = mapped_column(String(255), nullable=False, unique=True)
     value: Mapped[str] = mapped_column(String(64), nullable=False)
+    etag: Mapped[str] = mapped_column(String(255), nullable=True)
+    last_modified: Mapped[str] = mapped_column(String(64), nullable=True)
+
+
+class Subscription(Base):
+    """
+    Telegram chat subscription to outages of street (optionally house number)
+    or of whole district
+
+    Street is kept by its name too, as street ways are replaced by
+    update_streets: street_id is set to NULL when way is deleted and
+    subscription is matched again to street with the same name.
+    """
+
+    __tablename__ = 'subscription'
+    __table_args__ = (
+        CheckConstraint(
+            'street_id IS NOT NULL OR street_name IS NOT NULL OR district_id IS NOT NULL',
+            name='subscription_target_check'
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    chat_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
+    street_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('street.id', ondelete='SET NULL'), nullable=True, index=True
+    )
+    street_name: Mapped[str] = mapped_column(String(255), nullable=True)
+    district_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('district.id', ondelete='CASCADE'), nullable=True, index=True
+    )
+    house_number: Mapped[int] = mapped_column(Integer, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now(), nullable=False)
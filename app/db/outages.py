@@ -0,0 +1,161 @@
+from datetime import date, datetime, time
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.changes import ChangeSet, fingerprint
+from app.db.models import Outage
+
+
+# Rows per INSERT statement, keeps bind parameters below asyncpg limit
+UPSERT_CHUNK_SIZE = 1000
+
+# Outages resolved per UPDATE statement, each one takes several bind parameters
+RESOLVE_CHUNK_SIZE = 100
+
+# Columns identifying rows of one outage whatever their street, same fields as fingerprint
+IDENTITY_COLUMNS = ('provider', 'type', 'start', 'emergency', 'description_en')
+
+
+def _to_rows(outage: dict) -> Iterator[dict]:
+    """Maps scrapped outage dictionary to Outage columns, one row per mentioned street"""
+
+    outage_date = outage.get('date')
+    for street_id in outage.get('street_ids') or [None]:
+        yield {
+            'fingerprint': fingerprint(outage, street_id),
+            'street_id': street_id,
+            'type': outage.get('type'),
+            'provider': outage.get('provider'),
+            'emergency': bool(outage.get('emergency')),
+            'title_en': outage.get('title'),
+            'description_en': outage.get('description'),
+            'start': datetime.combine(outage_date, time()) if isinstance(outage_date, date) else None,
+            'resolved_at': None
+        }
+
+
+def _to_dicts(outages: Iterable[Outage]) -> List[dict]:
+    """Maps Outage rows back to scrapped outage dictionaries, merging rows of streets"""
+
+    result = {}
+    for outage in outages:
+        key = (outage.provider, outage.type, outage.start, outage.emergency, outage.title_en, outage.description_en)
+        if key not in result:
+            result[key] = {
+                'date': outage.start.date() if outage.start else None,
+                'type': outage.type,
+                'provider': outage.provider,
+                'emergency': outage.emergency,
+                'title': outage.title_en,
+                'description': outage.description_en,
+                'street_ids': []
+            }
+            result[key]['fingerprint'] = fingerprint(result[key])
+        if outage.street_id is not None:
+            result[key]['street_ids'].append(outage.street_id)
+    for outage in result.values():
+        outage['street_ids'].sort()
+    return list(result.values())
+
+
+def _identity(row: dict) -> Tuple:
+    return tuple(row[column] for column in IDENTITY_COLUMNS)
+
+
+def _rows_of(identity: Tuple, kept: Iterable[str]):
+    """Returns condition matching rows of outage except kept fingerprints, rows of deleted streets included"""
+
+    return and_(
+        *[getattr(Outage, column).is_not_distinct_from(value) for column, value in zip(IDENTITY_COLUMNS, identity)],
+        Outage.fingerprint.not_in(list(kept))
+    )
+
+
+async def _upsert(session: AsyncSession, rows: List[dict]) -> None:
+    """Inserts or updates rows keyed by fingerprint, resolved ones become active again"""
+
+    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        statement = insert(Outage).values(rows[i:i + UPSERT_CHUNK_SIZE])
+        statement = statement.on_conflict_do_update(
+            index_elements=[Outage.fingerprint],
+            set_={
+                'street_id': statement.excluded.street_id,
+                'title_en': statement.excluded.title_en,
+                'description_en': statement.excluded.description_en,
+                'resolved_at': None
+            }
+        )
+        await session.execute(statement)
+
+
+async def save_outages(session: AsyncSession, outages: Iterable[dict], providers: Iterable[str]) -> None:
+    """
+    Upserts scrap batch in single transaction keyed by outage fingerprint,
+    active outages of given providers missing in batch are marked resolved.
+
+    Pass only providers which were scrapped successfully, so outages of
+    timed out or failed providers are not resolved by mistake.
+    """
+
+    rows = list({row['fingerprint']: row for outage in outages for row in _to_rows(outage)}.values())
+    providers = list(providers)
+
+    async with session.begin():
+        await _upsert(session, rows)
+        await session.execute(
+            update(Outage)
+            .where(
+                Outage.resolved_at.is_(None),
+                Outage.provider.in_(providers),
+                Outage.fingerprint.not_in([row['fingerprint'] for row in rows])
+            )
+            .values(resolved_at=datetime.now())
+        )
+
+
+async def save_changes(session: AsyncSession, changes: ChangeSet) -> None:
+    """
+    Applies change set in single transaction: rows of added and changed
+    outages are upserted, rows of removed outages and rows of streets
+    no longer mentioned by changed outages are marked resolved.
+
+    Rows are resolved by outage identity rather than by fingerprint of
+    street row, so rows whose street was deleted (street_id set to NULL)
+    are resolved too.
+    """
+
+    rows = {row['fingerprint']: row for outage in changes.added for row in _to_rows(outage)}
+    for _, current in changes.changed:
+        rows.update((row['fingerprint'], row) for row in _to_rows(current))
+    kept: Dict[Tuple, Set[str]] = {}
+    for row in rows.values():
+        kept.setdefault(_identity(row), set()).add(row['fingerprint'])
+    resolved = list({
+        _identity(next(_to_rows(outage)))
+        for outage in [*changes.removed, *[previous for previous, _ in changes.changed]]
+    })
+
+    async with session.begin():
+        await _upsert(session, list(rows.values()))
+        for i in range(0, len(resolved), RESOLVE_CHUNK_SIZE):
+            conditions = [_rows_of(identity, kept.get(identity, ())) for identity in resolved[i:i + RESOLVE_CHUNK_SIZE]]
+            await session.execute(
+                update(Outage)
+                .where(Outage.resolved_at.is_(None), or_(*conditions))
+                .values(resolved_at=datetime.now())
+            )
+
+
+def active_outages():
+    """Returns statement selecting outages which are not resolved yet, served by ix_outage_active_id"""
+
+    return select(Outage).where(Outage.resolved_at.is_(None)).order_by(Outage.id)
+
+
+async def get_active_outages(session: AsyncSession) -> List[dict]:
+    """Returns outages which are not resolved yet"""
+
+    return _to_dicts(await session.scalars(active_outages()))
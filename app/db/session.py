@@ -0,0 +1,18 @@
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from settings import DATABASE_URL_ASYNC, DB_HOST, DB_NAME
+from app.metrics import instrument_engine
+
+
+# Async engine used by application, cli.py keeps its own sync engine.
+# Without database settings app runs without persistence, async_session is None
+
+async_engine: Optional[AsyncEngine] = None
+async_session: Optional[async_sessionmaker[AsyncSession]] = None
+
+if DB_HOST and DB_NAME:
+    async_engine = create_async_engine(DATABASE_URL_ASYNC, pool_pre_ping=True)
+    async_session = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+    instrument_engine(async_engine.sync_engine)
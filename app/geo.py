@@ -0,0 +1,73 @@
+import math
+from typing import List, Sequence, Tuple
+
+
+# Meters per degree of latitude, degree of longitude is shorter by cos(latitude)
+METERS_PER_DEGREE = 111_320
+
+# (latitude, longitude) in degrees
+Point = Tuple[float, float]
+
+
+def project(point: Point, origin_lat: float) -> Tuple[float, float]:
+    """
+    Returns (x, y) meters of point in equirectangular projection around
+    origin latitude, distortion is negligible at city scale
+    """
+
+    lat, lon = point
+    return lon * METERS_PER_DEGREE * math.cos(math.radians(origin_lat)), lat * METERS_PER_DEGREE
+
+
+def _segment_distance(point: Tuple[float, float], start: Tuple[float, float], end: Tuple[float, float]) -> float:
+    """Returns distance from projected point to projected segment"""
+
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    length = dx * dx + dy * dy
+    t = 0 if length == 0 else max(0, min(1, ((point[0] - start[0]) * dx + (point[1] - start[1]) * dy) / length))
+    return math.hypot(point[0] - start[0] - t * dx, point[1] - start[1] - t * dy)
+
+
+def distance_to_line(point: Point, line: Sequence[Point]) -> float:
+    """Returns meters from point to the nearest segment of polyline"""
+
+    origin = point[0]
+    projected = [project(vertex, origin) for vertex in line]
+    segments = zip(projected, projected[1:]) if len(projected) > 1 else [(projected[0], projected[0])]
+    return min(_segment_distance(project(point, origin), start, end) for start, end in segments)
+
+
+def simplify(line: Sequence[Point], tolerance: float) -> List[Point]:
+    """Douglas-Peucker simplification, drops vertices closer than tolerance meters to simplified polyline"""
+
+    if len(line) < 3:
+        return list(line)
+    projected = [project(vertex, line[0][0]) for vertex in line]
+    keep = [True] + [False] * (len(line) - 2) + [True]
+    stack = [(0, len(line) - 1)]
+    while stack:
+        start, end = stack.pop()
+        index, distance = max(
+            ((i, _segment_distance(projected[i], projected[start], projected[end])) for i in range(start + 1, end)),
+            key=lambda item: item[1],
+            default=(start, 0)
+        )
+        if distance > tolerance:
+            keep[index] = True
+            stack.extend(((start, index), (index, end)))
+    return [vertex for vertex, kept in zip(line, keep) if kept]
+
+
+def centroid(line: Sequence[Point]) -> Point:
+    """Returns center of polyline weighted by length of its segments, first vertex of zero length line"""
+
+    total = lat = lon = 0.0
+    for start, end in zip(line, line[1:]):
+        (x1, y1), (x2, y2) = project(start, line[0][0]), project(end, line[0][0])
+        length = math.hypot(x2 - x1, y2 - y1)
+        lat += (start[0] + end[0]) / 2 * length
+        lon += (start[1] + end[1]) / 2 * length
+        total += length
+    if total == 0:
+        return line[0]
+    return lat / total, lon / total
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from typing import Callable, List, Optional
+
+import asyncpg
+
+from settings import DATABASE_URL, LEADER_LOCK_KEY, LEADER_RETRY_INTERVAL, OUTAGES_CHANNEL
+
+
+class LeaderElection:
+    """
+    Elects single scraping process among all workers and nodes
+    with Postgres session-level advisory lock.
+
+    Every process keeps one dedicated connection, which tries to take the
+    lock every interval and listens on notification channel. Lock is held
+    while connection lives, so when leader exits or its connection drops,
+    another process takes over on its next attempt.
+
+    Without connection to database no process can be elected, callers
+    should check `connected` and decide themselves (refresher scraps).
+
+    Leader publishes saved snapshots with `notify`, callbacks added with
+    `on_notification` are called with payload in other processes.
+
+    Example:
+        ```python
+        election = LeaderElection()
+        election.on_notification(lambda payload: ...)
+        await election.start()
+        election.is_leader
+        await election.stop()
+        ```
+    """
+
+    def __init__(
+        self,
+        dsn: str = DATABASE_URL,
+        key: int = LEADER_LOCK_KEY,
+        channel: str = OUTAGES_CHANNEL,
+        interval: float = LEADER_RETRY_INTERVAL
+    ) -> None:
+        self.dsn = dsn
+        self.key = key
+        self.channel = channel
+        self.interval = interval
+        self.is_leader = False
+        self._connection: Optional[asyncpg.Connection] = None
+        self._callbacks: List[Callable[[str], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def connected(self) -> bool:
+        return self._connection is not None and not self._connection.is_closed()
+
+    def on_notification(self, callback: Callable[[str], None]) -> None:
+        """Adds callback called with payload of notifications sent by leader"""
+
+        self._callbacks.append(callback)
+
+    def _notified(self, connection, pid, channel, payload) -> None:
+        if self.is_leader:
+            return
+        for callback in self._callbacks:
+            try:
+                callback(payload)
+            except Exception as err:
+                logging.error(f"Error occured in notification callback {callback!r}:\n{err!r}")
+
+    async def campaign(self) -> bool:
+        """Connects if needed and tries to take the lock, returns whether process is leader"""
+
+        if not self.connected:
+            self.is_leader = False
+            self._connection = await asyncpg.connect(self.dsn)
+            await self._connection.add_listener(self.channel, self._notified)
+        if not self.is_leader:
+            self.is_leader = await self._connection.fetchval('SELECT pg_try_advisory_lock($1)', self.key)
+            if self.is_leader:
+                logging.info("This process is elected as scraping leader.")
+        return self.is_leader
+
+    async def notify(self, payload: str) -> None:
+        """Sends payload to followers, does nothing when connection is lost"""
+
+        if not self.connected:
+            return
+        try:
+            await self._connection.execute('SELECT pg_notify($1, $2)', self.channel, payload)
+        except (asyncpg.PostgresError, OSError) as err:
+            logging.error(f"Error occured when notifying followers. {err}")
+
+    async def _campaign(self) -> None:
+        try:
+            await self.campaign()
+        except (asyncpg.PostgresError, OSError) as err:
+            logging.error(f"Error occured during leader election. {err}")
+            self.is_leader = False
+
+    async def run(self) -> None:
+        """Campaigns every interval until cancelled"""
+
+        while True:
+            await asyncio.sleep(self.interval)
+            await self._campaign()
+
+    async def start(self) -> None:
+        """Campaigns once, so leader is known before refresher starts, then keeps campaigning in background"""
+
+        await self._campaign()
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stops campaigning and closes connection, which releases the lock"""
+
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self.connected:
+            await self._connection.close()
+        self.is_leader = False
@@ -0,0 +1,149 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, Sequence
+
+import prometheus_client
+from prometheus_client import CollectorRegistry, generate_latest, multiprocess
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+
+# Default histogram buckets in seconds, from fast parses to slow upstream pages
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+CONTENT_TYPE = prometheus_client.CONTENT_TYPE_LATEST
+
+# Only totals are exposed, without *_created series of every label set
+prometheus_client.disable_created_metrics()
+
+
+class MetricCounter:
+    """Monotonic counter, e.g. number of responses by status, labels are given as keyword arguments"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self._metric = prometheus_client.Counter(name, documentation, labelnames)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        (self._metric.labels(**labels) if labels else self._metric).inc(amount)
+
+
+class MetricHistogram:
+    """Distribution of observed values in cumulative buckets, e.g. durations"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DURATION_BUCKETS
+    ) -> None:
+        self._metric = prometheus_client.Histogram(name, documentation, labelnames, buckets=buckets)
+
+    def observe(self, value: float, **labels: str) -> None:
+        (self._metric.labels(**labels) if labels else self._metric).observe(value)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observes duration of block in seconds"""
+
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start_time, **labels)
+
+
+def render() -> bytes:
+    """
+    Returns all metrics in Prometheus text exposition format.
+
+    When PROMETHEUS_MULTIPROC_DIR is set (e.g. uvicorn with several workers),
+    every worker writes its metrics there and they are aggregated on render,
+    so any worker answers with metrics of all of them. The directory should
+    be emptied before the server starts.
+    """
+
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return generate_latest()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def write_textfile(path: str) -> None:
+    """Writes metrics atomically for node_exporter textfile collector, used by short-lived cli.py"""
+
+    prometheus_client.write_to_textfile(path, prometheus_client.REGISTRY)
+
+
+@contextmanager
+def span(name: str, **attributes: str) -> Iterator[None]:
+    """OpenTelemetry span around block when opentelemetry-api is installed, no-op otherwise"""
+
+    if trace is None:
+        yield
+        return
+    with trace.get_tracer('outages-ge').start_as_current_span(name, attributes=attributes):
+        yield
+
+
+def instrument_engine(engine) -> None:
+    """Traces queries of given sync engine when opentelemetry-instrumentation-sqlalchemy is installed"""
+
+    try:
+        from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+    except ImportError:
+        return
+    SQLAlchemyInstrumentor().instrument(engine=engine)
+
+
+# Providers
+
+SCRAPE_DURATION = MetricHistogram(
+    'outages_provider_scrape_duration_seconds', 'Duration of provider scraps', ['provider', 'result']
+)
+FETCH_DURATION = MetricHistogram(
+    'outages_fetch_duration_seconds', 'Latency of requests to provider hosts', ['provider', 'host']
+)
+FETCH_RESPONSES = MetricCounter(
+    'outages_fetch_responses_total', 'Responses of provider hosts by status code', ['provider', 'host', 'status']
+)
+PARSE_DURATION = MetricHistogram(
+    'outages_parse_duration_seconds', 'Duration of parsing provider pages in worker threads', ['provider']
+)
+PAGE_CACHE = MetricCounter(
+    'outages_page_cache_total', 'Fetched pages by page cache result: not_modified, unchanged or miss',
+    ['provider', 'result']
+)
+FETCH_RESILIENCE = MetricCounter(
+    'outages_fetch_resilience_total', 'Fetch retries, hedged requests and requests rejected by open circuit',
+    ['provider', 'host', 'event']
+)
+FETCH_COALESCED = MetricCounter(
+    'outages_fetch_coalesced_total', 'Fetches served without own request: shared in-flight or memo', ['result']
+)
+STREET_MATCHES = MetricHistogram(
+    'outages_street_matches', 'Number of streets matched per outage description', ['provider'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100)
+)
+
+# Application
+
+REQUEST_DURATION = MetricHistogram(
+    'outages_request_duration_seconds', 'Duration of application requests', ['method', 'route', 'status']
+)
+
+NOTIFICATIONS = MetricCounter(
+    'outages_notifications_total', 'Telegram notifications by result: sent, error or dropped', ['result']
+)
+
+# cli.py update_streets
+
+UPDATE_STREETS_DURATION = MetricHistogram(
+    'outages_update_streets_phase_duration_seconds', 'Duration of update_streets phases', ['phase'],
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600)
+)
@@ -0,0 +1,158 @@
+import logging
+import math
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from settings import NEARBY_CELL_SIZE
+from app.changes import ChangeSet, get_fingerprint
+from app.db.errors import DATABASE_ERRORS
+from app.db.models import Street
+from app.geo import METERS_PER_DEGREE, Point, distance_to_line
+
+
+class NearbyIndex:
+    """
+    In-process grid index over street geometries for outages near location.
+
+    Every street is put into grid cells of `cell_size` meters covered by its
+    segments, so lookup measures distance only to streets of cells around
+    the circle instead of scanning all streets. Cells span the same degrees
+    of latitude and longitude, so they are narrower from west to east, which
+    is fine as distances are measured exactly afterwards.
+
+    Active outages are kept per street from change set of every new snapshot,
+    like district aggregates. Streets without stored geometry (update_streets
+    wasn't run since geometry is stored) are not found. Geometries are
+    reloaded with `reload` after update_streets replaced streets.
+
+    Example:
+        ```python
+        index = await NearbyIndex.load(async_session)
+        refresher.subscribe(index.update)
+        index.outages_near(41.7151, 44.8271, radius=500)
+        ```
+    """
+
+    def __init__(
+        self,
+        streets: Iterable[Tuple[int, Optional[Sequence[Sequence[float]]]]] = (),
+        cell_size: float = NEARBY_CELL_SIZE
+    ) -> None:
+        self.cell_size = cell_size
+        self.geometries: Dict[int, List[Point]] = {}
+        self._cells: Dict[Tuple[int, int], List[int]] = {}
+        # Active outages by street id and fingerprint
+        self._outages: Dict[int, Dict[str, dict]] = {}
+        self._add_streets(streets)
+
+    @classmethod
+    async def load(cls, sessionmaker: Optional[async_sessionmaker[AsyncSession]]) -> 'NearbyIndex':
+        """Builds index from geometries of all streets in database, empty one if database is unavailable"""
+
+        index = cls()
+        if sessionmaker is not None:
+            await index.reload(sessionmaker)
+        return index
+
+    async def reload(self, sessionmaker: async_sessionmaker[AsyncSession]) -> bool:
+        """
+        Replaces street geometries with ones from database, e.g. after
+        update_streets replaced ways, active outages of streets are kept.
+        Index is kept as is if database is unavailable.
+        Returns whether geometries are reloaded.
+        """
+
+        try:
+            async with sessionmaker() as session:
+                streets = (await session.execute(
+                    select(Street.id, Street.geometry).where(Street.geometry.is_not(None))
+                )).tuples().all()
+        except DATABASE_ERRORS as err:
+            logging.error(f"Error occured when loading street geometries from database. {err}")
+            return False
+
+        self.geometries = {}
+        self._cells = {}
+        self._add_streets(streets)
+        return True
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        step = self.cell_size / METERS_PER_DEGREE
+        return math.floor(lat / step), math.floor(lon / step)
+
+    def _cells_between(self, low: Point, high: Point) -> Iterator[Tuple[int, int]]:
+        """Yields cells of bounding box given by its south-west and north-east corners"""
+
+        (min_row, min_column), (max_row, max_column) = self._cell(*low), self._cell(*high)
+        for row in range(min_row, max_row + 1):
+            for column in range(min_column, max_column + 1):
+                yield row, column
+
+    def _add_streets(self, streets: Iterable[Tuple[int, Optional[Sequence[Sequence[float]]]]]) -> None:
+        for street_id, geometry in streets:
+            if geometry:
+                self.add(street_id, [(lat, lon) for lat, lon in geometry])
+
+    def add(self, street_id: int, geometry: List[Point]) -> None:
+        """Adds street to cells of bounding boxes of its segments"""
+
+        self.geometries[street_id] = geometry
+        cells = set()
+        for start, end in zip(geometry, geometry[1:] or geometry):
+            cells.update(self._cells_between(
+                (min(start[0], end[0]), min(start[1], end[1])), (max(start[0], end[0]), max(start[1], end[1]))
+            ))
+        for cell in cells:
+            self._cells.setdefault(cell, []).append(street_id)
+
+    def streets_near(self, lat: float, lon: float, radius: float) -> Dict[int, float]:
+        """Returns meters to streets within radius meters of location by street id"""
+
+        lat_delta = radius / METERS_PER_DEGREE
+        lon_delta = lat_delta / max(math.cos(math.radians(lat)), 0.01)
+        candidates = {
+            street_id
+            for cell in self._cells_between((lat - lat_delta, lon - lon_delta), (lat + lat_delta, lon + lon_delta))
+            for street_id in self._cells.get(cell, ())
+        }
+
+        result = {}
+        for street_id in candidates:
+            distance = distance_to_line((lat, lon), self.geometries[street_id])
+            if distance <= radius:
+                result[street_id] = distance
+        return result
+
+    def outages_near(self, lat: float, lon: float, radius: float) -> List[dict]:
+        """Returns active outages of streets within radius meters with distance to the nearest one, nearest first"""
+
+        outages: Dict[str, Tuple[float, dict]] = {}
+        for street_id, distance in self.streets_near(lat, lon, radius).items():
+            for key, outage in self._outages.get(street_id, {}).items():
+                if key not in outages or distance < outages[key][0]:
+                    outages[key] = (distance, outage)
+        return [
+            {**outage, 'distance': round(distance)}
+            for distance, outage in sorted(outages.values(), key=lambda item: item[0])
+        ]
+
+    def update(self, changes: ChangeSet) -> None:
+        """Applies change set of outages to outages of streets"""
+
+        for outage in changes.removed:
+            self._apply(outage, remove=True)
+        for previous, current in changes.changed:
+            self._apply(previous, remove=True)
+            self._apply(current)
+        for outage in changes.added:
+            self._apply(outage)
+
+    def _apply(self, outage: dict, remove: bool = False) -> None:
+        key = get_fingerprint(outage)
+        for street_id in outage.get('street_ids') or ():
+            if remove:
+                self._outages.get(street_id, {}).pop(key, None)
+            else:
+                self._outages.setdefault(street_id, {})[key] = outage
@@ -0,0 +1,14 @@
+from app.notifier.subscriptions import SubscriptionIndex
+from app.notifier.transport import AbstractTransport, DeliveryError, LogTransport, RetryAfter, TelegramTransport
+from app.notifier.dispatcher import Notifier
+
+
+__all__ = [
+    'SubscriptionIndex',
+    'AbstractTransport',
+    'DeliveryError',
+    'LogTransport',
+    'RetryAfter',
+    'TelegramTransport',
+    'Notifier'
+]
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from settings import NOTIFIER_BATCH_SIZE, NOTIFIER_BURST, NOTIFIER_RATE, NOTIFIER_RELOAD_INTERVAL, NOTIFIER_RETRIES
+from app.changes import ChangeSet
+from app.leader import LeaderElection
+from app.metrics import NOTIFICATIONS
+from app.notifier.subscriptions import SubscriptionIndex
+from app.notifier.transport import AbstractTransport, RetryAfter
+
+
+# Telegram limits text of one message
+MAX_MESSAGE_LENGTH = 4096
+
+
+def format_message(outages: List[dict]) -> str:
+    """Returns one notification text for all new outages of chat"""
+
+    parts = []
+    for outage in outages:
+        kind = 'Emergency' if outage.get('emergency') else 'Planned'
+        parts.append(f"{kind} {outage.get('type')} outage, {outage.get('date')}\n{outage.get('description')}")
+    text = '\n\n'.join(parts)
+    return text if len(text) <= MAX_MESSAGE_LENGTH else text[:MAX_MESSAGE_LENGTH - 1] + '…'
+
+
+class AsyncTokenBucket:
+    """
+    Token bucket rate limiter for coroutines.
+
+    Tokens are refilled at `rate` per second up to `capacity`, `pause`
+    stops all acquirers, e.g. when transport asks to retry later.
+    """
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now >= self.paused_until:
+                self.tokens = min(self.capacity, self.tokens + (now - max(self.updated, self.paused_until)) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            else:
+                wait = self.paused_until - now
+            await asyncio.sleep(wait)
+
+
+class Notifier:
+    """
+    Sends notifications about new outages to subscribed chats.
+
+    Notifier is a refresher listener: outages added by change set of new
+    snapshot are matched against subscription index and grouped into one message
+    per chat. Messages are sent in background in concurrent batches through
+    pluggable transport, limited by token bucket, rate limited messages
+    pause the bucket and are retried.
+
+    Subscribe it with leader_only, so only scrapping process sends
+    notifications and outages loaded on startup are not repeated.
+
+    With sessionmaker given, subscription index is reloaded from database
+    every reload_interval seconds, so subscriptions added meanwhile and
+    streets matched again after update_streets are picked up. With election
+    given, only leader reloads it, as only leader publishes.
+
+    Example:
+        ```python
+        notifier = Notifier(await SubscriptionIndex.load(async_session), LogTransport(), async_session)
+        refresher.subscribe(notifier.publish, leader_only=True)
+        notifier.start()
+        ```
+    """
+
+    def __init__(
+        self,
+        index: SubscriptionIndex,
+        transport: AbstractTransport,
+        sessionmaker: Optional[async_sessionmaker[AsyncSession]] = None,
+        rate: float = NOTIFIER_RATE,
+        burst: int = NOTIFIER_BURST,
+        batch_size: int = NOTIFIER_BATCH_SIZE,
+        retries: int = NOTIFIER_RETRIES,
+        reload_interval: float = NOTIFIER_RELOAD_INTERVAL,
+        election: Optional[LeaderElection] = None
+    ) -> None:
+        self.index = index
+        self.transport = transport
+        self.sessionmaker = sessionmaker
+        self.reload_interval = reload_interval
+        self.election = election
+        self.batch_size = batch_size
+        self.retries = retries
+        self._bucket = AsyncTokenBucket(rate, burst)
+        self._queue: asyncio.Queue[Tuple[int, str]] = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._reload: Optional[asyncio.Task] = None
+
+    def publish(self, changes: ChangeSet) -> None:
+        """Queues messages about added outages"""
+
+        messages: Dict[int, List[dict]] = {}
+        for outage in changes.added:
+            for chat_id in self.index.match(outage):
+                messages.setdefault(chat_id, []).append(outage)
+        for chat_id, chat_outages in messages.items():
+            self._queue.put_nowait((chat_id, format_message(chat_outages)))
+
+    async def run(self) -> None:
+        """Sends queued messages in batches until cancelled"""
+
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await asyncio.gather(*[self._send(chat_id, text) for chat_id, text in batch])
+
+    async def _send(self, chat_id: int, text: str) -> None:
+        for _ in range(self.retries):
+            await self._bucket.acquire()
+            try:
+                await self.transport.send(chat_id, text)
+            except RetryAfter as err:
+                logging.warning(f"Notifications are rate limited, retry in {err.seconds}s.")
+                self._bucket.pause(err.seconds)
+                continue
+            except Exception as err:
+                logging.error(f"Error occured when sending notification to {chat_id}:\n{err!r}")
+                NOTIFICATIONS.inc(result='error')
+                return
+            NOTIFICATIONS.inc(result='sent')
+            return
+        NOTIFICATIONS.inc(result='dropped')
+
+    @property
+    def is_leader(self) -> bool:
+        """Whether this process publishes, every process does while database is unavailable"""
+
+        return self.election is None or self.election.is_leader or not self.election.connected
+
+    async def reload_subscriptions(self) -> None:
+        """Reloads subscription index every reload interval until cancelled"""
+
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            if self.is_leader:
+                await self.index.reload(self.sessionmaker)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
+        if self.sessionmaker is not None:
+            self._reload = asyncio.create_task(self.reload_subscriptions())
+
+    async def stop(self) -> None:
+        for task in (self._task, self._reload):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
@@ -0,0 +1,112 @@
+import logging
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.errors import DATABASE_ERRORS
+from app.db.models import Street, Subscription
+
+
+class SubscriptionIndex:
+    """
+    In-memory inverted index of subscriptions by street and district.
+
+    Subscribers of outage are found by looking up its streets and their
+    districts, so matching costs are proportional to the number of matches
+    rather than to the number of subscribers. Subscriptions of streets
+    removed by update_streets and not matched again are skipped.
+
+    Example:
+        ```python
+        index = await SubscriptionIndex.load(async_session)
+        index.add(chat_id=42, street_id=7)
+        index.match({'street_ids': [7], ...})  # {42}
+        ```
+    """
+
+    def __init__(self, streets: Iterable[Tuple[int, int]] = ()) -> None:
+        self.street_districts: Dict[int, int] = dict(streets)
+        # street_id -> chat_id -> subscribed house numbers, None means whole street
+        self._by_street: Dict[int, Dict[int, Set[Optional[int]]]] = {}
+        # district_id -> chat_ids
+        self._by_district: Dict[int, Set[int]] = {}
+
+    @classmethod
+    async def load(cls, sessionmaker: Optional[async_sessionmaker[AsyncSession]]) -> 'SubscriptionIndex':
+        """Loads subscriptions from database, empty index if database is unavailable"""
+
+        index = cls()
+        if sessionmaker is not None:
+            await index.reload(sessionmaker)
+        return index
+
+    async def reload(self, sessionmaker: async_sessionmaker[AsyncSession]) -> bool:
+        """
+        Replaces subscriptions with ones from database, e.g. after streets
+        were updated, index is kept as is if database is unavailable.
+        Returns whether subscriptions are reloaded.
+        """
+
+        try:
+            async with sessionmaker() as session:
+                streets = (await session.execute(select(Street.id, Street.district_id))).tuples().all()
+                subscriptions = (await session.execute(select(
+                    Subscription.chat_id, Subscription.street_id, Subscription.district_id, Subscription.house_number
+                ))).tuples().all()
+        except DATABASE_ERRORS as err:
+            logging.error(f"Error occured when loading subscriptions from database. {err}")
+            return False
+
+        self.street_districts = dict(streets)
+        self._by_street = {}
+        self._by_district = {}
+        for chat_id, street_id, district_id, house_number in subscriptions:
+            self.add(chat_id, street_id, district_id, house_number)
+        return True
+
+    def __len__(self) -> int:
+        return sum(map(len, self._by_street.values())) + sum(map(len, self._by_district.values()))
+
+    def add(
+        self,
+        chat_id: int,
+        street_id: Optional[int] = None,
+        district_id: Optional[int] = None,
+        house_number: Optional[int] = None
+    ) -> None:
+        if street_id is not None:
+            self._by_street.setdefault(street_id, {}).setdefault(chat_id, set()).add(house_number)
+        elif district_id is not None:
+            self._by_district.setdefault(district_id, set()).add(chat_id)
+
+    def remove(
+        self,
+        chat_id: int,
+        street_id: Optional[int] = None,
+        district_id: Optional[int] = None,
+        house_number: Optional[int] = None
+    ) -> None:
+        if street_id is not None:
+            house_numbers = self._by_street.get(street_id, {}).get(chat_id, set())
+            house_numbers.discard(house_number)
+            if not house_numbers:
+                self._by_street.get(street_id, {}).pop(chat_id, None)
+        elif district_id is not None:
+            self._by_district.get(district_id, set()).discard(chat_id)
+
+    def match(self, outage: dict) -> Set[int]:
+        """Returns chat ids subscribed to streets or districts of outage"""
+
+        house_number = outage.get('house_number')
+        chats = set()
+        districts = set()
+        for street_id in outage.get('street_ids') or ():
+            for chat_id, house_numbers in self._by_street.get(street_id, {}).items():
+                # Outages without house number affect whole street
+                if house_number is None or None in house_numbers or house_number in house_numbers:
+                    chats.add(chat_id)
+            districts.add(self.street_districts.get(street_id))
+        for district_id in districts:
+            chats.update(self._by_district.get(district_id, ()))
+        return chats
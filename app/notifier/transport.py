@@ -0,0 +1,61 @@
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Deque, Tuple
+
+import httpx
+
+
+class RetryAfter(Exception):
+    """Raised by transport when messages are rate limited, retry after given seconds"""
+
+    def __init__(self, seconds: float) -> None:
+        super().__init__(f"Retry after {seconds}s")
+        self.seconds = seconds
+
+
+class DeliveryError(Exception):
+    """Raised by transport when message is rejected"""
+    pass
+
+
+class AbstractTransport(ABC):
+    """Delivers notification messages to chats"""
+
+    @abstractmethod
+    async def send(self, chat_id: int, text: str) -> None:
+        """Sends message to chat, raises RetryAfter when rate limited"""
+        pass
+
+
+class LogTransport(AbstractTransport):
+    """Transport which only logs and keeps last messages, used locally and without bot token"""
+
+    def __init__(self, keep: int = 100) -> None:
+        self.sent: Deque[Tuple[int, str]] = deque(maxlen=keep)
+
+    async def send(self, chat_id: int, text: str) -> None:
+        logging.info(f"Notification to {chat_id}:\n{text}")
+        self.sent.append((chat_id, text))
+
+
+class TelegramTransport(AbstractTransport):
+    """
+    Sends messages with Telegram Bot API sendMessage method
+    https://core.telegram.org/bots/api#sendmessage
+
+    Bot token is a part of request url, so errors are raised without it.
+    """
+
+    API_URL = 'https://api.telegram.org'
+
+    def __init__(self, client: httpx.AsyncClient, token: str) -> None:
+        self.client = client
+        self.url = f"{self.API_URL}/bot{token}/sendMessage"
+
+    async def send(self, chat_id: int, text: str) -> None:
+        response = await self.client.post(self.url, json={'chat_id': chat_id, 'text': text})
+        if response.status_code == 429:
+            raise RetryAfter(response.json().get('parameters', {}).get('retry_after', 1))
+        if response.is_error:
+            raise DeliveryError(f"Telegram responded with {response.status_code}")
@@ -0,0 +1,23 @@
+from app.parser.base import AbstractProvider, GetOutagesError, ParseError, create_client
+from app.parser.flight import SingleFlight
+from app.parser.resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded
+from app.parser.pages import Page, PageStore
+from app.parser.streets import StreetMatcher
+from app.parser.registry import PROVIDERS, get_providers_outages
+
+
+__all__ = [
+    'AbstractProvider',
+    'GetOutagesError',
+    'ParseError',
+    'create_client',
+    'SingleFlight',
+    'CircuitBreaker',
+    'CircuitOpenError',
+    'DeadlineExceeded',
+    'Page',
+    'PageStore',
+    'StreetMatcher',
+    'PROVIDERS',
+    'get_providers_outages'
+]
@@ -1,9 +1,138 @@
 from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import itertools
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
 import httpx
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+from bs4 import BeautifulSoup, SoupStrainer
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+from app.changes import fingerprint
+from app.metrics import FETCH_DURATION, FETCH_RESILIENCE, FETCH_RESPONSES, PAGE_CACHE, PARSE_DURATION, span
+from app.parser.flight import SingleFlight
+from app.parser.pages import Page, PageStore
+from app.parser.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceeded,
+    backoff,
+    budget,
+    remaining,
+    request_timeout
+)
+from app.parser.streets import StreetMatcher
+
+from settings import (
+    HTTP_TIMEOUT,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP2,
+    HTTP_MAX_CONCURRENCY_PER_HOST,
+    PARSER_WORKERS,
+    HTML_PARSER,
+    PROVIDER_MAX_LIST_PAGES,
+    PROVIDER_LIST_BUDGET,
+    PROVIDER_RETRIES,
+    PROVIDER_HEDGE_DELAY
+)
+
+
+# Parses html in worker threads, so concurrent scraps don't block event loop
+_parser_executor = ThreadPoolExecutor(max_workers=PARSER_WORKERS, thread_name_prefix='parser')
+
+
+# Merges concurrent fetches of the same url and reuses results shortly, shared by all providers
+_flight = SingleFlight()
+
+
+# Limits in-flight requests per provider host, shared by all providers
+_host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def _get_host_semaphore(url: str) -> asyncio.Semaphore:
+    """Returns semaphore bounding concurrent requests to url's host"""
+
+    host = urlsplit(url).netloc
+    if host not in _host_semaphores:
+        _host_semaphores[host] = asyncio.Semaphore(HTTP_MAX_CONCURRENCY_PER_HOST)
+    return _host_semaphores[host]
+
+
+# Rejects requests to failing provider host, shared by all providers
+_host_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def _get_host_breaker(url: str) -> CircuitBreaker:
+    """Returns circuit breaker of url's host"""
+
+    host = urlsplit(url).netloc
+    if host not in _host_breakers:
+        _host_breakers[host] = CircuitBreaker(host)
+    return _host_breakers[host]
+
+
+def _is_retryable(err: httpx.HTTPError) -> bool:
+    """Whether failed GET may succeed when repeated: transport errors, 429 and 5xx"""
+
+    if isinstance(err, httpx.HTTPStatusError):
+        return err.response.status_code == 429 or err.response.status_code >= 500
+    return True
+
+
+async def _first_success(tasks: set) -> httpx.Response:
+    """Returns response of first succeeded task, error of the last one if all failed"""
+
+    pending = set(tasks)
+    while True:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is None:
+                return task.result()
+        if not pending:
+            return done.pop().result()
+
+
+def _parse(
+    markup: str, parse: Callable[[BeautifulSoup], Any], parse_only: Optional[SoupStrainer] = None
+) -> Any:
+    """Builds soup of given fragment only and applies parse function to it"""
+
+    return parse(BeautifulSoup(markup, HTML_PARSER, parse_only=parse_only))
+
+
+def create_client() -> httpx.AsyncClient:
+    """
+    Returns long-lived pooled client shared by providers.
+
+    Should be created once (e.g. per app lifespan) and closed by its owner,
+    so connections to provider hosts are kept alive between scraps.
+    """
+
+    return httpx.AsyncClient(
+        http2=HTTP2,
+        timeout=httpx.Timeout(HTTP_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+        ),
+        follow_redirects=True
+    )
+
+
+class GetOutagesError(Exception):
+    """Raised when provider fails to retrieve or parse outages"""
+    pass
+
+
+class ParseError(GetOutagesError):
+    """Raised when provider page doesn't have expected markup"""
+    pass
 
 
 class AbstractProvider(ABC):
@@ -13,13 +142,31 @@ class AbstractProvider(ABC):
     This class serves as a blueprint for creating provider parsers,
     ensuring a consistent interface across various provider implementations.
 
-    You should redefine ROOT_URL, PLANNED_URL, EMERGENCY_URL, TYPE and
+    You should redefine NAME, ROOT_URL, PLANNED_URL, EMERGENCY_URL, TYPE and
     scrap_outages, normalize_ouyages abstract methods.
 
+    Provider uses shared `client` if given, otherwise it creates own one,
+    which is closed with `aclose` or on exit of `async with` block.
+    Pages fetched with `_get_parsed` are parsed only if their hash sum
+    differs from the one kept in shared `pages` store. Parsing runs in worker
+    threads and is limited to fragments declared by provider
+    (LIST_FRAGMENT, PLANNED_DETAILS_FRAGMENT, EMERGENCY_DETAILS_FRAGMENT),
+    None means the whole document is parsed.
+    Paginated list views are crawled with `_crawl_list` until rows fall
+    below date horizon, page number is passed in LIST_PAGE_PARAM.
+    Streets mentioned in outages are found with shared `streets` matcher.
+    Concurrent fetches of the same url by any providers are merged into one
+    request and results are reused for FETCH_MEMO_TTL seconds, see `flight`.
+    Scrap is limited by deadline budget given to `get_outages`, list views
+    may use LIST_BUDGET share of it and detail views the rest. Failed GETs
+    are retried, see `_get_response`, slow ones are duplicated after
+    HEDGE_DELAY seconds when it is set.
+
     Example:
         ```python
         class GWP(AbstractProvider):
 
+            NAME = 'GWP'
             TYPE = 'water'
             ROOT_URL = 'https://www.gwp.ge'
             EMERGENCY_URL = urljoin(ROOT_URL, '/emergency')
@@ -30,43 +177,298 @@ class AbstractProvider(ABC):
                 return [
                     {'date': 'yyyy-mm-dd',
                     'type': 'water',
+                    'provider': 'GWP',
                     'emergency': True,
                     'title': 'Title',
                     'info': 'Info'
                     }
                 ]
+
+        async with create_client() as client:
+            outages = await GWP(client).get_outages()
         ```
     """
 
+    NAME = 'Provider'
     ROOT_URL = 'https://www.example.com'
     EMERGENCY_URL = urljoin(ROOT_URL, '/emergency')
     PLANNED_URL = urljoin(ROOT_URL, '/planned')
     TYPE = 'type'
+    LIST_FRAGMENT: Optional[SoupStrainer] = None
+    PLANNED_DETAILS_FRAGMENT: Optional[SoupStrainer] = None
+    EMERGENCY_DETAILS_FRAGMENT: Optional[SoupStrainer] = None
+    LIST_PAGE_PARAM = 'page'
+    LIST_MAX_PAGES = PROVIDER_MAX_LIST_PAGES
+    LIST_BUDGET = PROVIDER_LIST_BUDGET
+    RETRIES = PROVIDER_RETRIES
+    HEDGE_DELAY = PROVIDER_HEDGE_DELAY
+
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        pages: Optional[PageStore] = None,
+        streets: Optional[StreetMatcher] = None,
+        flight: Optional[SingleFlight] = None
+    ) -> None:
+        self._client = client
+        self._owns_client = client is None
+        self.pages = pages if pages is not None else PageStore()
+        self.streets = streets if streets is not None else StreetMatcher()
+        self.flight = flight if flight is not None else _flight
+
+    async def __aenter__(self) -> 'AbstractProvider':
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.aclose()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared client, created lazily when provider owns it"""
+
+        if self._client is None:
+            self._client = create_client()
+        return self._client
+
+    async def aclose(self) -> None:
+        """Closes client only if it was created by provider itself"""
 
-    async def get_outages(self) -> list:
-        """Wrapper"""
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get_outages(self, deadline: Optional[float] = None) -> list:
+        """
+        Wrapper, scraps planned and emergency outages concurrently within
+        deadline budget in seconds and attaches stable fingerprint to every outage.
+        Raises DeadlineExceeded when budget is spent, GetOutagesError when pages
+        can't be fetched or parsed. Other errors are bugs and propagate as is.
+        """
 
         start_time = time.time()
-        logging.debug("Scrapping started.")
-        scrapped_outages = await self.scrap_outages(emergency=False)
-        scrapped_outages.extend(await self.scrap_outages(emergency=True))
+        logging.debug(f"{self.NAME} scrapping started.")
+        try:
+            with budget(deadline):
+                planned, emergency = await asyncio.gather(
+                    self.scrap_outages(emergency=False),
+                    self.scrap_outages(emergency=True)
+                )
+        except (httpx.HTTPError, CircuitOpenError) as err:
+            raise GetOutagesError(f"{self.NAME}: {err!r}") from err
+        scrapped_outages = planned + emergency
+        for outage in scrapped_outages:
+            outage['fingerprint'] = fingerprint(outage)
         logging.debug(
-            f"Scrapping ended. "
+            f"{self.NAME} scrapping ended. "
             f"{len(scrapped_outages)} elements in {time.time() - start_time}s"
         )
 
         return scrapped_outages
 
+    async def _get_response(self, url: str, headers: Optional[dict] = None) -> httpx.Response:
+        """
+        Returns successful or not modified response from given url.
+
+        GETs failed with transport error, 429 or 5xx are retried up to RETRIES
+        times after jittered exponential backoff, other error statuses are
+        raised at once. Failures of host are counted by its circuit breaker,
+        requests to host with open circuit raise CircuitOpenError.
+        """
+
+        breaker = _get_host_breaker(url)
+        for attempt in itertools.count():
+            self._check_circuit(breaker, url)
+            try:
+                response = await self._get_hedged(url, headers)
+                if response.status_code >= 400:
+                    response.raise_for_status()
+            except (httpx.TransportError, httpx.HTTPStatusError) as err:
+                if not _is_retryable(err):
+                    breaker.success()
+                    raise
+                breaker.failure()
+                await self._wait_retry(url, attempt, err)
+            else:
+                breaker.success()
+                return response
+
+    def _check_circuit(self, breaker: CircuitBreaker, url: str) -> None:
+        try:
+            breaker.check()
+        except CircuitOpenError:
+            FETCH_RESILIENCE.inc(provider=self.NAME, host=breaker.name, event='circuit_open')
+            raise
+
+    async def _wait_retry(self, url: str, attempt: int, err: httpx.HTTPError) -> None:
+        """Waits backoff of given attempt within remaining budget, raises err if no retries are left"""
+
+        left = remaining()
+        if left is not None and left <= 0:
+            raise DeadlineExceeded(f"Fetch budget is spent, last error: {err!r}") from err
+        if attempt >= self.RETRIES:
+            raise err
+        delay = backoff(attempt)
+        logging.debug(f"{self.NAME} retries {url} in {delay:.2f}s after {err!r}")
+        FETCH_RESILIENCE.inc(provider=self.NAME, host=urlsplit(url).netloc, event='retry')
+        # Next attempt raises DeadlineExceeded if budget is spent meanwhile
+        await asyncio.sleep(delay if left is None else max(min(delay, left), 0))
+
+    async def _get_hedged(self, url: str, headers: Optional[dict] = None) -> httpx.Response:
+        """Sends GET, duplicate one is sent if no response came in HEDGE_DELAY seconds, first success wins"""
+
+        if not self.HEDGE_DELAY:
+            return await self._fetch(url, headers)
+        tasks = {asyncio.ensure_future(self._fetch(url, headers))}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.HEDGE_DELAY)
+            if not done:
+                FETCH_RESILIENCE.inc(provider=self.NAME, host=urlsplit(url).netloc, event='hedge')
+                tasks.add(asyncio.ensure_future(self._fetch(url, headers)))
+            return await _first_success(tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _fetch(self, url: str, headers: Optional[dict] = None) -> httpx.Response:
+        """Sends single GET within remaining budget, latency and status are recorded per host"""
+
+        host = urlsplit(url).netloc
+        status = 'error'
+        async with _get_host_semaphore(url):
+            timeout = request_timeout(HTTP_TIMEOUT)
+            try:
+                with FETCH_DURATION.time(provider=self.NAME, host=host), span('fetch', url=url):
+                    response = await self.client.get(url, headers=headers, timeout=timeout)
+                status = str(response.status_code)
+                return response
+            finally:
+                FETCH_RESPONSES.inc(provider=self.NAME, host=host, status=status)
+
     @staticmethod
-    async def _get_soup(url: str) -> BeautifulSoup:
-        """Returns soup from given url"""
+    async def _run_parser(
+        markup: str, parse: Callable[[BeautifulSoup], Any], parse_only: Optional[SoupStrainer] = None
+    ) -> Any:
+        """Runs parse function in parser worker pool"""
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_parser_executor, _parse, markup, parse, parse_only)
+
+    async def _get_parsed(
+        self, url: str, parse: Callable[[BeautifulSoup], Any], parse_only: Optional[SoupStrainer] = None
+    ) -> Any:
+        """
+        Returns result of parse function applied to soup of given fragment from url,
+        AttributeError, IndexError or ValueError of parse function raise ParseError.
+
+        Concurrent calls of url share one request. Conditional request is sent
+        if page was parsed before, parsing is skipped when server responds
+        with 304 or page hash sum is unchanged. Results are shared by url, so
+        every url has to be parsed with the same function and fragment.
+        """
+
+        return await self.flight.do(('parsed', url), lambda: self._traced_fetch_parsed(url, parse, parse_only))
+
+    async def _traced_fetch_parsed(
+        self, url: str, parse: Callable[[BeautifulSoup], Any], parse_only: Optional[SoupStrainer] = None
+    ) -> Any:
+        with span('get_parsed', provider=self.NAME, url=url):
+            return await self._fetch_parsed(url, parse, parse_only)
+
+    async def _fetch_parsed(
+        self, url: str, parse: Callable[[BeautifulSoup], Any], parse_only: Optional[SoupStrainer] = None
+    ) -> Any:
+        page = self.pages.get(url)
+        response = await self._get_response(url, headers=self.pages.get_headers(url))
+        if response.status_code == 304 and page is not None:
+            PAGE_CACHE.inc(provider=self.NAME, result='not_modified')
+            return page.parsed
+
+        digest = hashlib.sha256(response.content).hexdigest()
+        if page is not None and page.parsed is not None and page.digest == digest:
+            PAGE_CACHE.inc(provider=self.NAME, result='unchanged')
+            return page.parsed
+
+        PAGE_CACHE.inc(provider=self.NAME, result='miss')
+        try:
+            with PARSE_DURATION.time(provider=self.NAME):
+                parsed = await self._run_parser(response.text, parse, parse_only)
+        except (AttributeError, IndexError, ValueError) as err:
+            raise ParseError(f"{self.NAME}: {url} has unexpected markup. {err!r}") from err
+        self.pages.put(url, Page(
+            digest,
+            response.headers.get('ETag'),
+            response.headers.get('Last-Modified'),
+            parsed
+        ))
+        return parsed
+
+    def _get_list_page_url(self, url: str, page: int) -> str:
+        """Returns url of given page of list view, first page is url itself"""
+
+        if page == 1:
+            return url
+        parts = urlsplit(url)
+        query = [(key, value) for key, value in parse_qsl(parts.query) if key != self.LIST_PAGE_PARAM]
+        return urlunsplit(parts._replace(query=urlencode(query + [(self.LIST_PAGE_PARAM, page)])))
+
+    async def _get_list_page(
+        self,
+        url: str,
+        page: int,
+        parse: Callable[[BeautifulSoup, date], Tuple[List[tuple], bool]],
+        horizon: date
+    ) -> Optional[Tuple[List[tuple], bool]]:
+        """
+        Returns parsed rows of given page of list view. Pages after the first
+        one which respond with 404 or have no list (ParseError) return None,
+        as the list ends there and rows of earlier pages are kept.
+        """
+
+        try:
+            return await self._get_parsed(
+                self._get_list_page_url(url, page), lambda soup: parse(soup, horizon), self.LIST_FRAGMENT
+            )
+        except (httpx.HTTPStatusError, ParseError) as err:
+            if page == 1 or isinstance(err, httpx.HTTPStatusError) and err.response.status_code != 404:
+                raise
+            logging.warning(f"{self.NAME}: page {page} of {url} has no list, list is assumed to end there. {err!r}")
+            return None
+
+    async def _crawl_list(
+        self,
+        url: str,
+        parse: Callable[[BeautifulSoup, date], Tuple[List[tuple], bool]],
+        horizon: date
+    ) -> List[tuple]:
+        """
+        Returns rows of paginated list view dated at or after horizon.
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
-            response_text = response.text
+        List views are expected to be ordered newest first, so `parse` returns
+        rows (tuples starting with date) of page up to the first row below
+        horizon, together with flag whether horizon was reached. Crawl stops
+        on such page, on page shorter than the first one (the last page),
+        on missing page after the first one (see `_get_list_page`)
+        or after LIST_MAX_PAGES pages, so history is neither fetched nor parsed.
+        Pages are fetched within LIST_BUDGET share of remaining budget.
+        """
 
-        soup = BeautifulSoup(response_text, 'html.parser')
-        return soup
+        rows = []
+        seen = set()
+        page_size = None
+        with budget(share=self.LIST_BUDGET):
+            for page in range(1, self.LIST_MAX_PAGES + 1):
+                parsed = await self._get_list_page(url, page, parse, horizon)
+                if parsed is None:
+                    break
+                page_rows, reached = parsed
+                # Parsed pages may be reused from store, parsed with earlier horizon
+                new_rows = [row for row in page_rows if row[0] >= horizon and row not in seen]
+                rows.extend(new_rows)
+                seen.update(new_rows)
+                page_size = page_size or len(page_rows)
+                if reached or not new_rows or len(new_rows) < page_size:
+                    break
+        return rows
 
     @abstractmethod
     async def scrap_outages(self, emergency: bool = False) -> list:
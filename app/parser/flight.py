@@ -0,0 +1,59 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from settings import FETCH_MEMO_SIZE, FETCH_MEMO_TTL
+from app.metrics import FETCH_COALESCED
+
+
+class SingleFlight:
+    """
+    Merges concurrent calls with the same key into one call and memoizes
+    its result for `ttl` seconds.
+
+    Call runs as separate task, so it is not cancelled with any of its callers
+    (e.g. on provider deadline) while others still wait for it. Failures
+    are shared by concurrent callers but are not memoized.
+
+    Example:
+        ```python
+        flight = SingleFlight(ttl=30)
+        page = await flight.do(('page', url), lambda: fetch(url))
+        ```
+    """
+
+    def __init__(self, ttl: float = FETCH_MEMO_TTL, max_size: int = FETCH_MEMO_SIZE) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self._memo: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Returns memoized result of key, result of in-flight call of key or result of new call"""
+
+        memo = self._memo.get(key)
+        if memo is not None and memo[0] > time.monotonic():
+            FETCH_COALESCED.inc(result='memo')
+            return memo[1]
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda task: self._done(key, task))
+        else:
+            FETCH_COALESCED.inc(result='shared')
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Future) -> None:
+        self._in_flight.pop(key, None)
+        if task.cancelled() or task.exception() is not None or self.ttl <= 0:
+            return
+        self._memo[key] = (time.monotonic() + self.ttl, task.result())
+        self._memo.move_to_end(key)
+        while len(self._memo) > self.max_size:
+            self._memo.popitem(last=False)
+
+    def clear(self) -> None:
+        self._memo.clear()
@@ -1,16 +1,23 @@
+import asyncio
 from datetime import datetime, date
 from urllib.parse import urljoin
+from bs4 import BeautifulSoup, SoupStrainer
+from app.metrics import STREET_MATCHES
 from app.parser.base import AbstractProvider
-from typing import List
+from typing import List, Tuple
 
 
 class GWP(AbstractProvider):
     """GWP water provider"""
 
+    NAME = 'GWP'
     TYPE = 'water'
     ROOT_URL = 'https://www.gwp.ge'
     PLANNED_URL = urljoin(ROOT_URL, '/en/dagegmili')
     EMERGENCY_URL = urljoin(ROOT_URL, '/en/gadaudebeli')
+    LIST_FRAGMENT = SoupStrainer('table', class_='samushaoebi')
+    PLANNED_DETAILS_FRAGMENT = SoupStrainer(class_='news-details')
+    EMERGENCY_DETAILS_FRAGMENT = SoupStrainer(class_='initial')
 
     async def scrap_outages(self, emergency: bool = False) -> list:
         """Abstract interface to retrieve outages"""
@@ -27,77 +34,123 @@ class GWP(AbstractProvider):
         # Divide outages by districts
         outages_by_district = await self._divide_outages_by_district(scrapped_outages)
 
-        # TODO: divide outages by streets
+        # Divide outages by streets
+        outages_by_streets = await self._divide_outages_by_streets(outages_by_district)
 
         # Return results
-        return outages_by_district
+        return outages_by_streets
 
     async def _get_outages(
         self, url: str, current_date: date, emergency: bool
     ) -> List[dict]:
-        """Scraps outages on high level from outages list view"""
+        """Scraps outages on high level from pages of outages list view"""
 
         result = []
-        soup = await self._get_soup(url)
+        rows = await self._crawl_list(url, self._parse_outages, current_date)
+
+        for outage_date, title, link in rows:
+            result.append(
+                {
+                    'date': outage_date,
+                    'type': self.TYPE,
+                    'provider': self.NAME,
+                    'emergency': emergency,
+                    'title': title,
+                    'link': link
+                }
+            )
 
+        return result
+
+    def _parse_outages(self, soup: BeautifulSoup, horizon: date) -> Tuple[List[tuple], bool]:
+        """
+        Parses (date, title, link) rows of outages list view page,
+        parsing stops at first row dated before horizon
+        """
+
+        result = []
         rows = soup.find('table', class_='samushaoebi').find_all('tr')
 
         for row in rows:
-            date = datetime.strptime(
+            outage_date = datetime.strptime(
                 row.find('span', {'style': 'color:#f00000'}).text.strip(),
                 '%d/%m/%Y'
             ).date()
-            if date >= current_date:
-                link = urljoin(self.ROOT_URL, row.a.get('href'))
-                title = row.find_all("a")[1].get_text(strip=True)
-                result.append(
-                    {
-                        'date': date,
-                        'type': self.TYPE,
-                        'emergency': emergency,
-                        'title': title,
-                        'link': link
-                    }
-                )
+            if outage_date < horizon:
+                return result, True
+            link = urljoin(self.ROOT_URL, row.a.get('href'))
+            title = row.find_all("a")[1].get_text(strip=True)
+            result.append((outage_date, title, link))
 
-        return result
+        return result, False
 
     async def _divide_outages_by_district(
         self, outages: List[dict]
     ) -> List[dict]:
-        """Jump into outage detail view and scrap it"""
+        """
+        Jump into outage detail views and scrap them concurrently,
+        number of in-flight requests is bounded per host by provider,
+        results keep the order of given outages
+        """
 
-        result = []
+        details = await asyncio.gather(
+            *[self._scrap_outage_details(outage) for outage in outages]
+        )
 
-        for outage in outages:
+        return [description for descriptions in details for description in descriptions]
+
+    async def _scrap_outage_details(self, outage: dict) -> List[dict]:
+        """Scraps outage detail view and divides it by descriptions"""
+
+        result = []
 
-            # Description patterns
-            emergency = outage.get('emergency')
-            if emergency:
-                selector = ".initial > ul > li > p"
-            else:
-                selector = ".news-details > p"
-
-            url = outage.get('link')
-            soup = await self._get_soup(url)
-            outage_descriprions = soup.css.select(selector)
-
-            # TODO: Select districts from database
-            # and add District.id to outage dictionary
-            for description in outage_descriprions:
-                if description.get_text(strip=True) != '':
-                    result.append(
-                        {
-                            'date': outage.get('date'),
-                            'type': self.TYPE,
-                            'emergency': emergency,
-                            'title': outage.get('title'),
-                            'description': description.get_text(strip=True).replace("\xa0", " ")
-                        }
-                    )
+        # Description patterns
+        emergency = outage.get('emergency')
+        if emergency:
+            selector = ".initial > ul > li > p"
+            fragment = self.EMERGENCY_DETAILS_FRAGMENT
+        else:
+            selector = ".news-details > p"
+            fragment = self.PLANNED_DETAILS_FRAGMENT
+
+        url = outage.get('link')
+        outage_descriprions = await self._get_parsed(
+            url, lambda soup: self._parse_descriptions(soup, selector), fragment
+        )
+
+        # TODO: Select districts from database
+        # and add District.id to outage dictionary
+        for description in outage_descriprions:
+            result.append(
+                {
+                    'date': outage.get('date'),
+                    'type': self.TYPE,
+                    'provider': self.NAME,
+                    'emergency': emergency,
+                    'title': outage.get('title'),
+                    'description': description
+                }
+            )
 
         return result
-    
-    # TODO: divide outages by streets
-    async def _divide_outages_by_streets():
-        pass
+
+    @staticmethod
+    def _parse_descriptions(soup: BeautifulSoup, selector: str) -> List[str]:
+        """Parses non-empty descriptions of outage detail view"""
+
+        return [
+            description.get_text(strip=True).replace("\xa0", " ")
+            for description in soup.css.select(selector)
+            if description.get_text(strip=True) != ''
+        ]
+
+    async def _divide_outages_by_streets(
+        self, outages: List[dict]
+    ) -> List[dict]:
+        """Adds sorted ids of streets mentioned in outage descriptions, so they compare equal to loaded ones"""
+
+        for outage in outages:
+            outage['street_ids'] = sorted(self.streets.match(outage.get('description')))
+            STREET_MATCHES.observe(len(outage['street_ids']), provider=self.NAME)
+
+        return outages
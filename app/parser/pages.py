@@ -0,0 +1,120 @@
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.errors import DATABASE_ERRORS
+from app.db.models import HashSum
+
+
+@dataclass
+class Page:
+    """Hash sum of fetched webpage with its validators and parsed content"""
+
+    digest: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    parsed: Any = None
+
+
+class PageStore:
+    """
+    Keeps hash sums of provider webpages to skip parsing of unchanged ones.
+
+    Parsed content is kept in memory, hash sums are persisted to HashSum table
+    when sessionmaker is given, so changes are detected across restarts.
+    `put` never touches database, hash sums of changed pages are written
+    with `flush` in one statement after scrap, outside of fetch deadlines.
+
+    Example:
+        ```python
+        pages = PageStore(async_session)
+        await pages.load()
+        outages = await GWP(client, pages).get_outages()
+        await pages.flush()
+        ```
+    """
+
+    def __init__(self, sessionmaker: Optional[async_sessionmaker[AsyncSession]] = None) -> None:
+        self.sessionmaker = sessionmaker
+        self.pages: Dict[str, Page] = {}
+        # Urls of pages which hash sums are not persisted yet
+        self._dirty: Set[str] = set()
+
+    def get(self, url: str) -> Optional[Page]:
+        return self.pages.get(url)
+
+    def get_headers(self, url: str) -> dict:
+        """Returns conditional request headers, only if parsed content can be reused"""
+
+        page = self.pages.get(url)
+        headers = {}
+        if page is None or page.parsed is None:
+            return headers
+        if page.etag:
+            headers['If-None-Match'] = page.etag
+        if page.last_modified:
+            headers['If-Modified-Since'] = page.last_modified
+        return headers
+
+    def put(self, url: str, page: Page) -> None:
+        """Stores page in memory, its hash sum is persisted on next flush if it is changed"""
+
+        previous = self.pages.get(url)
+        self.pages[url] = page
+        if previous is not None and previous.digest == page.digest:
+            return
+        self._dirty.add(url)
+
+    async def load(self) -> None:
+        """Loads persisted hash sums, content of these pages is parsed on first fetch"""
+
+        if self.sessionmaker is None:
+            return
+        try:
+            async with self.sessionmaker() as session:
+                hash_sums = (await session.scalars(select(HashSum))).all()
+        except DATABASE_ERRORS as err:
+            logging.error(f"Error occured when loading hash sums from database. {err}")
+            return
+        for hash_sum in hash_sums:
+            self.pages.setdefault(
+                hash_sum.url,
+                Page(hash_sum.value, hash_sum.etag, hash_sum.last_modified)
+            )
+
+    async def flush(self) -> None:
+        """Persists hash sums of pages changed since last flush with single upsert"""
+
+        if self.sessionmaker is None or not self._dirty:
+            return
+        urls, self._dirty = self._dirty, set()
+        rows = [
+            {
+                'url': url,
+                'value': self.pages[url].digest,
+                'etag': self.pages[url].etag,
+                'last_modified': self.pages[url].last_modified
+            }
+            for url in urls
+        ]
+        statement = insert(HashSum).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[HashSum.url],
+            set_={
+                'value': statement.excluded.value,
+                'etag': statement.excluded.etag,
+                'last_modified': statement.excluded.last_modified
+            }
+        )
+        try:
+            async with self.sessionmaker() as session:
+                await session.execute(statement)
+                await session.commit()
+        except DATABASE_ERRORS as err:
+            logging.error(f"Error occured when saving hash sums in database. {err}")
+            # Pages changed meanwhile are already dirty, failed ones are retried on next flush
+            self._dirty.update(urls)
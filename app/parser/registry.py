@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional, Type
+
+import httpx
+
+from settings import PROVIDER_DEADLINE
+from app.metrics import SCRAPE_DURATION, span
+from app.parser.base import AbstractProvider, GetOutagesError
+from app.parser.pages import PageStore
+from app.parser.streets import StreetMatcher
+from app.parser.gwp import GWP
+
+
+# Providers scraped by application, add new providers here
+
+PROVIDERS: List[Type[AbstractProvider]] = [GWP]
+
+
+async def _get_outages(instance: AbstractProvider, deadline: float) -> list:
+    """
+    Scraps provider within deadline, which is also its fetch budget,
+    duration is recorded by result: ok, timeout or error
+    """
+
+    start_time = time.perf_counter()
+    result = 'error'
+    try:
+        with span('scrape', provider=instance.NAME):
+            outages = await asyncio.wait_for(instance.get_outages(deadline), deadline)
+        result = 'ok'
+        return outages
+    except asyncio.TimeoutError:
+        result = 'timeout'
+        raise
+    finally:
+        SCRAPE_DURATION.observe(time.perf_counter() - start_time, provider=instance.NAME, result=result)
+
+
+async def get_providers_outages(
+    client: httpx.AsyncClient,
+    deadline: float = PROVIDER_DEADLINE,
+    providers: Optional[List[Type[AbstractProvider]]] = None,
+    pages: Optional[PageStore] = None,
+    streets: Optional[StreetMatcher] = None
+) -> dict:
+    """
+    Scraps all registered providers concurrently, each within its own deadline.
+
+    Returns outages of succeeded providers, tagged with names of providers
+    which timed out or failed, so partial results are still served.
+    """
+
+    pages = pages if pages is not None else PageStore()
+    streets = streets if streets is not None else StreetMatcher()
+    instances = [
+        provider(client, pages, streets)
+        for provider in (providers if providers is not None else PROVIDERS)
+    ]
+    results = await asyncio.gather(
+        *[_get_outages(instance, deadline) for instance in instances],
+        return_exceptions=True
+    )
+
+    response = {'outages': [], 'timed_out': [], 'failed': []}
+    for instance, result in zip(instances, results):
+        if isinstance(result, asyncio.TimeoutError):
+            logging.warning(f"{instance.NAME} exceeded {deadline}s deadline.")
+            response['timed_out'].append(instance.NAME)
+        elif isinstance(result, GetOutagesError):
+            logging.error(f"Error occured while getting outages:\n{result!r}")
+            response['failed'].append(instance.NAME)
+        elif isinstance(result, Exception):
+            logging.error(f"Unexpected error occured while getting {instance.NAME} outages.", exc_info=result)
+            response['failed'].append(instance.NAME)
+        else:
+            response['outages'].extend(result)
+
+    return response
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from settings import (
+    PROVIDER_BREAKER_COOLDOWN,
+    PROVIDER_BREAKER_THRESHOLD,
+    PROVIDER_RETRY_BACKOFF,
+    PROVIDER_RETRY_MAX_BACKOFF
+)
+
+
+# Monotonic time fetches of current task have to finish by, None means unlimited
+_deadline: ContextVar[Optional[float]] = ContextVar('deadline', default=None)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised when fetch budget is spent, so provider is reported timed out"""
+    pass
+
+
+class CircuitOpenError(Exception):
+    """Raised when requests to host are rejected after repeated failures"""
+    pass
+
+
+def remaining() -> Optional[float]:
+    """Returns seconds left of current budget, None if there is no budget"""
+
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+@contextmanager
+def budget(seconds: Optional[float] = None, share: float = 1) -> Iterator[None]:
+    """
+    Limits fetches within block to given seconds and share of remaining
+    budget, whichever is sooner. Budget is inherited by tasks created within
+    block, time left after block is available to the rest of outer budget.
+
+    Example:
+        ```python
+        with budget(15):
+            with budget(share=0.5):
+                await fetch_list()  # Up to 7.5 seconds
+            await fetch_details()  # Up to the rest of 15 seconds
+        ```
+    """
+
+    left = remaining()
+    limits = [limit for limit in (seconds, left * share if left is not None else None) if limit is not None]
+    if not limits:
+        yield
+        return
+    token = _deadline.set(time.monotonic() + min(limits))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def request_timeout(timeout: float) -> float:
+    """Returns given timeout cut to remaining budget, raises DeadlineExceeded when budget is spent"""
+
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("Fetch budget is spent")
+    return min(timeout, left)
+
+
+def backoff(attempt: int, base: float = PROVIDER_RETRY_BACKOFF, cap: float = PROVIDER_RETRY_MAX_BACKOFF) -> float:
+    """Returns seconds to wait before retry with exponential backoff and full jitter"""
+
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Rejects requests to failing host instead of waiting for its timeouts.
+
+    After `threshold` failures in a row circuit opens and requests fail fast
+    with CircuitOpenError for `cooldown` seconds. Then single request is let
+    through to probe host and circuit stays open for another cooldown, unless
+    the probe succeeds and closes it.
+
+    Example:
+        ```python
+        breaker.check()
+        try:
+            response = await client.get(url)
+        except httpx.TransportError:
+            breaker.failure()
+            raise
+        breaker.success()
+        ```
+    """
+
+    def __init__(
+        self, name: str, threshold: int = PROVIDER_BREAKER_THRESHOLD, cooldown: float = PROVIDER_BREAKER_COOLDOWN
+    ) -> None:
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def check(self) -> None:
+        """Raises CircuitOpenError unless request may be sent"""
+
+        if self.opened_at is None:
+            return
+        if time.monotonic() - self.opened_at < self.cooldown:
+            raise CircuitOpenError(f"Circuit of {self.name} is open after {self.failures} failures")
+        # This request probes host, others fail fast until it succeeds or cooldown passes again
+        self.opened_at = time.monotonic()
+
+    def success(self) -> None:
+        if self.opened_at is not None:
+            logging.info(f"Circuit of {self.name} is closed.")
+        self.failures = 0
+        self.opened_at = None
+
+    def failure(self) -> None:
+        self.failures += 1
+        if self.failures < self.threshold:
+            return
+        if self.opened_at is None:
+            logging.warning(f"Circuit of {self.name} is open after {self.failures} failures in a row.")
+        self.opened_at = time.monotonic()
@@ -0,0 +1,200 @@
+import logging
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.errors import DATABASE_ERRORS
+from app.db.models import Street
+
+
+# Street type words with their common abbreviations, (full, *abbreviations)
+STREET_TYPES_EN = [
+    ('street', 'str', 'st'),
+    ('avenue', 'ave', 'av'),
+    ('lane', 'ln'),
+    ('deadend', 'dead end'),
+    ('square', 'sq'),
+    ('highway', 'hwy'),
+    ('embankment', 'emb'),
+    ('descent',),
+    ('ascent',),
+    ('quarter',),
+    ('drive', 'dr'),
+    ('road', 'rd'),
+]
+STREET_TYPES_KA = [
+    ('ქუჩა', 'ქ'),
+    ('გამზირი', 'გამზ'),
+    ('შესახვევი', 'შეს', 'შესახ'),
+    ('ჩიხი',),
+    ('მოედანი', 'მოედ'),
+    ('გზატკეცილი', 'გზატკ'),
+    ('სანაპირო', 'სანაპ'),
+    ('აღმართი', 'აღმ'),
+    ('დაღმართი', 'დაღმ'),
+    ('კვარტალი', 'კვ'),
+    ('გასასვლელი', 'გას'),
+]
+
+# Georgian postpositions and case endings, stripped from words (each group once)
+# so inflected mentions ("კოსტავას ქუჩაზე", "კოსტავაზე") match names ("კოსტავას ქუჩა")
+_SUFFIXES_KA = (
+    ('ისთვის', 'ისკენ', 'იდან', 'ამდე', 'მდე', 'თან', 'ზე', 'ში', 'ით', 'ად'),
+    ('ის', 'ს'),
+    ('ა', 'ე', 'ი', 'ო', 'უ')
+)
+_MIN_STEM_LENGTH = 3
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize(text: str) -> List[str]:
+    """Returns lowercased words of text without punctuation"""
+
+    return _NON_WORD.sub(' ', text.lower()).split()
+
+
+def stem(word: str) -> str:
+    """Returns georgian word without postposition, case ending and final vowel, other words as is"""
+
+    if not '\u10d0' <= word[0] <= '\u10ff':
+        return word
+    for suffixes in _SUFFIXES_KA:
+        for suffix in suffixes:
+            if word.endswith(suffix) and len(word) - len(suffix) >= _MIN_STEM_LENGTH:
+                word = word[:-len(suffix)]
+                break
+    return word
+
+
+def _variants(name: str, street_types: List[tuple], bare: bool = False) -> Set[Tuple[str, ...]]:
+    """
+    Returns normalized spellings of street name as word tuples: with full and
+    abbreviated street type and without given names or initials
+    ("I. Chavchavadze ave" → "Chavchavadze ave"). With bare, surname is also
+    matched without street type, as georgian texts often omit it ("კოსტავაზე").
+    """
+
+    words = normalize(name)
+    for forms in street_types:
+        for form in forms:
+            form_words = form.split()
+            if len(words) > len(form_words) and words[-len(form_words):] == form_words:
+                cores = {tuple(words[:-len(form_words)])}
+                # Surname alone, but not ordinals like "1st" of numbered lanes
+                if words[-len(form_words) - 1].isalpha():
+                    cores.add((words[-len(form_words) - 1],))
+                variants = {core + tuple(variant.split()) for core in cores for variant in forms}
+                if bare:
+                    # Not fragments of numbered names like "1-ლი შესახვევი"
+                    variants.update(core for core in cores if len(core) == 1 and len(core[0]) > _MIN_STEM_LENGTH)
+                return variants
+    # Names without street type (e.g. "Rustaveli Avenue" tagged as "Rustaveli")
+    # are matched by full name only, to avoid matching person names
+    return {tuple(words)} if len(words) > 1 else set()
+
+
+class StreetMatcher:
+    """
+    Aho-Corasick automaton over words of street names, finds every street
+    mentioned in text in a single linear pass regardless of number of names.
+    Georgian words of names and text are compared by `stem`, so declined
+    names and street types are matched too.
+
+    Example:
+        ```python
+        matcher = StreetMatcher([(1, 'Ilia Chavchavadze Avenue', 'ილია ჭავჭავაძის გამზირი')])
+        matcher.match('Vake district, Chavchavadze ave. N37')  # [1]
+        ```
+    """
+
+    def __init__(self, streets: Iterable[Tuple[int, Optional[str], Optional[str]]] = ()) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, Set[int]]]] = [[]]
+        self._patterns: Dict[Tuple[str, ...], Set[int]] = {}
+
+        for street_id, name_en, name_ka in streets:
+            variants = _variants(name_en or '', STREET_TYPES_EN) | _variants(name_ka or '', STREET_TYPES_KA, bare=True)
+            for pattern in variants:
+                self._patterns.setdefault(tuple(stem(word) for word in pattern), set()).add(street_id)
+
+        for pattern in self._patterns:
+            self._insert(pattern)
+        self._build()
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    @classmethod
+    async def load(cls, sessionmaker: Optional[async_sessionmaker[AsyncSession]]) -> 'StreetMatcher':
+        """Builds matcher from all streets in database, empty one if database is unavailable"""
+
+        if sessionmaker is None:
+            return cls()
+        try:
+            async with sessionmaker() as session:
+                streets = (await session.execute(select(Street.id, Street.name_en, Street.name_ka))).tuples().all()
+        except DATABASE_ERRORS as err:
+            logging.error(f"Error occured when loading streets from database. {err}")
+            return cls()
+        logging.info(f"{len(streets)} streets loaded to street matcher.")
+        return cls(streets)
+
+    def _insert(self, pattern: Tuple[str, ...]) -> None:
+        state = 0
+        for word in pattern:
+            if word not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][word] = len(self._goto) - 1
+            state = self._goto[state][word]
+        self._output[state].append((len(pattern), self._patterns[pattern]))
+
+    def _build(self) -> None:
+        """Computes failure links breadth-first and merges outputs along them"""
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, child in self._goto[state].items():
+                queue.append(child)
+                fail = self._fail[state]
+                while fail and word not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(word, 0) if self._goto[fail].get(word) != child else 0
+                if self._output[self._fail[child]]:
+                    self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def _find(self, words: List[str]) -> List[Tuple[int, int, Set[int]]]:
+        """Returns (start, end, street ids) word positions of all pattern occurrences"""
+
+        matches = []
+        state = 0
+        for end, word in enumerate(words, 1):
+            while state and word not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(word, 0)
+            for length, street_ids in self._output[state]:
+                matches.append((end - length, end, street_ids))
+        return matches
+
+    def match(self, text: str) -> List[int]:
+        """
+        Returns ids of streets mentioned in text in order of appearance,
+        overlapping mentions are resolved in favour of the longest one.
+        """
+
+        result: Dict[int, None] = {}
+        covered = 0
+        words = [stem(word) for word in normalize(text)]
+        for start, end, street_ids in sorted(self._find(words), key=lambda m: (m[0], -m[1])):
+            if start < covered:
+                continue
+            covered = end
+            result.update(dict.fromkeys(sorted(street_ids)))
+        return list(result)
@@ -0,0 +1,341 @@
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple, Type
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from settings import REFRESH_INTERVAL, SNAPSHOT_MAX_AGE
+from app.changes import ChangeSet, diff, get_fingerprint
+from app.db.errors import DATABASE_ERRORS
+from app.db.outages import get_active_outages, save_changes, save_outages
+from app.leader import LeaderElection
+from app.parser import PROVIDERS, AbstractProvider, PageStore, StreetMatcher, get_providers_outages
+from app.responses import digest_etag, dumps
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Immutable result of one providers refresh, shared by all handlers"""
+
+    outages: Tuple[dict, ...] = ()
+    timed_out: Tuple[str, ...] = ()
+    failed: Tuple[str, ...] = ()
+    updated_at: Optional[datetime] = None
+    version: int = 0
+    created: float = field(default_factory=time.monotonic)
+    # Serialized bodies and etags by staleness, snapshot is immutable so they are built once
+    _bodies: Dict[bool, bytes] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _etags: Dict[bool, str] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def age(self) -> float:
+        """Seconds since snapshot was published"""
+
+        return time.monotonic() - self.created
+
+    def as_dict(self, stale: bool = False) -> dict:
+        return {
+            'outages': self.outages,
+            'timed_out': self.timed_out,
+            'failed': self.failed,
+            'updated_at': self.updated_at,
+            'stale': stale
+        }
+
+    def body(self, stale: bool = False) -> bytes:
+        """Returns JSON of `as_dict`, serialized once per snapshot"""
+
+        if stale not in self._bodies:
+            self._bodies[stale] = dumps(self.as_dict(stale))
+        return self._bodies[stale]
+
+    def etag(self, stale: bool = False) -> str:
+        """
+        Returns weak etag of `body` derived from outages and provider statuses
+        in stable order, without updated_at, so it is kept by refreshes which
+        don't change outages and every process serving them gives the same etag
+        """
+
+        if stale not in self._etags:
+            self._etags[stale] = digest_etag(dumps({
+                'outages': sorted(self.outages, key=get_fingerprint),
+                'timed_out': sorted(self.timed_out),
+                'failed': sorted(self.failed),
+                'stale': stale
+            }, sort_keys=True))
+        return self._etags[stale]
+
+
+class OutagesRefresher:
+    """
+    Scraps providers in background on schedule and publishes immutable snapshot.
+
+    Handlers read `snapshot` without touching upstream. Snapshot older than
+    max_age is still served as stale, while single revalidation is started,
+    so upstream is hit once per interval regardless of number of clients.
+    Revalidations start at most once per max_age, so snapshot which stays
+    stale because all providers fail doesn't make traffic scrap them again
+    and again.
+    Every refresh is compared with previous snapshot by outage fingerprints,
+    when nothing is added, changed or removed, snapshot keeps its version and
+    only its timestamps are renewed. Outages of timed out or failed providers
+    are carried over from previous snapshot, so they are not reported removed.
+
+    With sessionmaker given, change set of every new snapshot version is
+    persisted to Outage table and active outages from database are served
+    until first refresh. After failed save, next version is saved in full.
+
+    Listeners added with `subscribe` are called with change set of every
+    new snapshot version.
+
+    With election given, only elected leader process scraps providers and
+    notifies other processes after every save. Followers reload active
+    outages from database on notification and on every refresh instead,
+    so scraping cost doesn't grow with number of workers. Scrap of process
+    which lost leadership meanwhile is neither saved nor published. Listeners
+    added with leader_only (e.g. notifications) are called only with change
+    sets scrapped by this process against known snapshot, so neither
+    followers nor restarts repeat them.
+
+    Example:
+        ```python
+        refresher = OutagesRefresher(client, sessionmaker=async_session)
+        await refresher.load()
+        refresher.start()
+        outages = refresher.get()
+        await refresher.stop()
+        ```
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        interval: float = REFRESH_INTERVAL,
+        max_age: float = SNAPSHOT_MAX_AGE,
+        providers: Optional[List[Type[AbstractProvider]]] = None,
+        pages: Optional[PageStore] = None,
+        streets: Optional[StreetMatcher] = None,
+        sessionmaker: Optional[async_sessionmaker[AsyncSession]] = None,
+        election: Optional[LeaderElection] = None
+    ) -> None:
+        self.client = client
+        self.pages = pages if pages is not None else PageStore()
+        self.streets = streets if streets is not None else StreetMatcher()
+        self.sessionmaker = sessionmaker
+        self.interval = interval
+        self.max_age = max_age
+        self.providers = providers if providers is not None else PROVIDERS
+        self.snapshot = Snapshot()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._revalidation: Optional[asyncio.Task] = None
+        # Monotonic time of last refresh attempt, successful or not
+        self._last_attempt: Optional[float] = None
+        self._flush: Optional[asyncio.Task] = None
+        self._listeners: List[Tuple[Callable[[ChangeSet], None], bool]] = []
+        # Whether database matches snapshot, so only change sets need to be saved
+        self._synced = False
+        self.election = election
+        if election is not None:
+            election.on_notification(self._on_notification)
+
+    @property
+    def is_leader(self) -> bool:
+        """Whether this process scraps, every process does while database is unavailable"""
+
+        return self.election is None or self.election.is_leader or not self.election.connected
+
+    def subscribe(self, listener: Callable[[ChangeSet], None], leader_only: bool = False) -> None:
+        """Adds listener called with change set of every new snapshot version"""
+
+        self._listeners.append((listener, leader_only))
+
+    def _set_snapshot(self, snapshot: Snapshot, changes: ChangeSet, scrapped: bool = False) -> None:
+        """Replaces snapshot and notifies listeners if its version changed"""
+
+        previous, self.snapshot = self.snapshot, snapshot
+        if previous.version == snapshot.version:
+            return
+        for listener, leader_only in self._listeners:
+            if leader_only and not scrapped:
+                continue
+            try:
+                listener(changes)
+            except Exception as err:
+                logging.error(f"Error occured in snapshot listener {listener!r}:\n{err!r}")
+
+    def get(self) -> dict:
+        """Returns current snapshot in O(1), revalidates it in background when stale"""
+
+        snapshot, stale = self.current()
+        return snapshot.as_dict(stale=stale)
+
+    def current(self) -> Tuple[Snapshot, bool]:
+        """Returns current snapshot with staleness flag, revalidates it in background when stale"""
+
+        snapshot = self.snapshot
+        stale = snapshot.updated_at is None or snapshot.age() > self.max_age
+        if stale and self._can_revalidate():
+            self._revalidation = asyncio.create_task(self.refresh())
+        return snapshot, stale
+
+    def _can_revalidate(self) -> bool:
+        """Whether no refresh is running and none was attempted within max_age"""
+
+        if self._lock.locked():
+            return False
+        return self._last_attempt is None or time.monotonic() - self._last_attempt >= self.max_age
+
+    async def refresh(self) -> Snapshot:
+        """
+        Scraps providers and publishes new snapshot, concurrent calls are merged.
+        Followers, and leader which lost leadership while scraping, reload
+        snapshot from database instead.
+        """
+
+        if self._lock.locked():
+            async with self._lock:
+                return self.snapshot
+
+        async with self._lock:
+            self._last_attempt = time.monotonic()
+            if self.is_leader:
+                result = await get_providers_outages(
+                    self.client, providers=self.providers, pages=self.pages, streets=self.streets
+                )
+                self._flush_pages()
+            # Scrap finished after leadership was lost is left to new leader
+            if not self.is_leader:
+                await self.load(self.snapshot.timed_out, self.snapshot.failed)
+                return self.snapshot
+            snapshot, changes = self._publish(result)
+            if snapshot.version != self.snapshot.version:
+                await self._save(snapshot, changes)
+            self._set_snapshot(snapshot, changes, scrapped=self.snapshot.version > 0)
+        return self.snapshot
+
+    def _flush_pages(self) -> None:
+        """Persists changed page hash sums in background, so slow database delays neither scrap nor snapshot"""
+
+        if self._flush is None or self._flush.done():
+            self._flush = asyncio.create_task(self.pages.flush())
+
+    def _publish(self, result: dict) -> Tuple[Snapshot, ChangeSet]:
+        """Returns snapshot to publish for given providers result with its change set"""
+
+        unavailable = set(result['timed_out'] + result['failed'])
+        if self.snapshot.version and len(unavailable) == len(self.providers):
+            logging.warning("All providers failed, previous snapshot is kept.")
+            return self.snapshot, ChangeSet()
+
+        outages = list(result['outages'])
+        outages.extend(outage for outage in self.snapshot.outages if outage.get('provider') in unavailable)
+        changes = diff(self.snapshot.outages, outages)
+        if self.snapshot.version and not changes:
+            logging.debug("Outages are unchanged, snapshot is renewed.")
+            return replace(
+                self.snapshot,
+                timed_out=tuple(result['timed_out']),
+                failed=tuple(result['failed']),
+                updated_at=datetime.now(),
+                created=time.monotonic()
+            ), changes
+
+        logging.info(
+            f"Outages changed: {len(changes.added)} added, "
+            f"{len(changes.changed)} changed, {len(changes.removed)} removed."
+        )
+        return Snapshot(
+            outages=tuple(outages),
+            timed_out=tuple(result['timed_out']),
+            failed=tuple(result['failed']),
+            updated_at=datetime.now(),
+            version=self.snapshot.version + 1
+        ), changes
+
+    async def load(self, timed_out: Tuple[str, ...] = (), failed: Tuple[str, ...] = ()) -> None:
+        """
+        Publishes active outages persisted in database, as initial stale snapshot
+        on startup and as fresh one when follower reloads it
+        """
+
+        if self.sessionmaker is None:
+            return
+        try:
+            async with self.sessionmaker() as session:
+                outages = await get_active_outages(session)
+        except DATABASE_ERRORS as err:
+            logging.error(f"Error occured when loading outages from database. {err}")
+            return
+        self._synced = True
+
+        changes = diff(self.snapshot.outages, outages)
+        updated_at = datetime.now() if self.snapshot.version else None
+        if self.snapshot.version and not changes:
+            snapshot = replace(
+                self.snapshot, timed_out=timed_out, failed=failed, updated_at=updated_at, created=time.monotonic()
+            )
+        else:
+            snapshot = Snapshot(tuple(outages), timed_out, failed, updated_at, self.snapshot.version + 1)
+        self._set_snapshot(snapshot, changes)
+
+    def _on_notification(self, payload: str) -> None:
+        """Reloads snapshot saved by leader, with names of its timed out and failed providers"""
+
+        statuses = json.loads(payload)
+        self._revalidation = asyncio.create_task(self._reload(
+            tuple(statuses.get('timed_out', ())), tuple(statuses.get('failed', ()))
+        ))
+
+    async def _reload(self, timed_out: Tuple[str, ...], failed: Tuple[str, ...]) -> None:
+        async with self._lock:
+            await self.load(timed_out, failed)
+
+    async def _save(self, snapshot: Snapshot, changes: ChangeSet) -> None:
+        """
+        Persists change set of snapshot, or all its outages when database
+        is not in sync, outages of failed providers are kept as is
+        """
+
+        if self.sessionmaker is None:
+            return
+        unavailable = set(snapshot.timed_out + snapshot.failed)
+        providers = [provider.NAME for provider in self.providers if provider.NAME not in unavailable]
+        try:
+            async with self.sessionmaker() as session:
+                if self._synced:
+                    await save_changes(session, changes)
+                else:
+                    await save_outages(session, snapshot.outages, providers)
+        except DATABASE_ERRORS as err:
+            logging.error(f"Error occured when saving outages in database. {err}")
+            self._synced = False
+            return
+        self._synced = True
+        if self.election is not None:
+            await self.election.notify(json.dumps({
+                'version': snapshot.version, 'timed_out': snapshot.timed_out, 'failed': snapshot.failed
+            }))
+
+    async def run(self) -> None:
+        """Refreshes snapshot every interval until cancelled"""
+
+        while True:
+            try:
+                await self.refresh()
+            except Exception as err:
+                logging.error(f"Error occured while refreshing outages:\n{err!r}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        for task in (self._task, self._revalidation, self._flush):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
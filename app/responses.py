@@ -0,0 +1,123 @@
+import gzip
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from settings import COMPRESSION_MIN_SIZE, GZIP_LEVEL
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Number of compressed bodies kept, a few versions of every cached resource
+COMPRESSED_CACHE_SIZE = 32
+
+# Compressed bodies by (body, encoding), hash of bytes is computed once per body object
+_compressed: 'OrderedDict[Tuple[bytes, str], bytes]' = OrderedDict()
+
+
+def dumps(data: Any, sort_keys: bool = False) -> bytes:
+    """Serializes data to JSON, with orjson when installed"""
+
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(data, default=jsonable_encoder, option=option)
+    return json.dumps(jsonable_encoder(data), separators=(',', ':'), sort_keys=sort_keys).encode()
+
+
+def digest_etag(body: bytes) -> str:
+    """Returns strong etag of body content"""
+
+    return hashlib.sha1(body).hexdigest()
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _get_quality(params: list) -> float:
+    """Returns q-value of Accept-Encoding item params, invalid one refuses encoding"""
+
+    for param in params:
+        name, _, value = param.partition('=')
+        if name.strip().lower() == 'q':
+            try:
+                return float(value)
+            except ValueError:
+                return 0
+    return 1
+
+
+def _get_encoding(request: Request, body: bytes) -> Optional[str]:
+    """Returns best content encoding accepted by client"""
+
+    if len(body) < COMPRESSION_MIN_SIZE:
+        return None
+    qualities = {}
+    for value in request.headers.get('accept-encoding', '').split(','):
+        coding, *params = value.split(';')
+        qualities[coding.strip().lower()] = _get_quality(params)
+    if qualities.get('gzip', qualities.get('*', 0)) > 0:
+        return 'gzip'
+    return None
+
+
+def _get_compressed(body: bytes, encoding: str) -> bytes:
+    """Returns compressed body, every version is compressed once"""
+
+    key = (body, encoding)
+    if key in _compressed:
+        _compressed.move_to_end(key)
+    else:
+        _compressed[key] = _compress(body, encoding)
+        if len(_compressed) > COMPRESSED_CACHE_SIZE:
+            _compressed.popitem(last=False)
+    return _compressed[key]
+
+
+def cached_response(
+    request: Request,
+    body: bytes,
+    etag: str,
+    media_type: str,
+    cache_control: str,
+    weak: bool = False,
+    last_modified: Optional[datetime] = None
+) -> Response:
+    """
+    Returns response of body with given etag: 304 when client has it,
+    otherwise body compressed with best accepted encoding.
+
+    Every encoding gets its own etag ("<etag>-gzip") as bytes differ.
+    Weak etag (W/"<etag>") is for bodies which are equivalent, but not
+    identical (e.g. differ in timestamp), If-None-Match is compared weakly.
+    Naive last_modified is taken as local time.
+    """
+
+    encoding = _get_encoding(request, body)
+    opaque_tag = f'"{etag}-{encoding}"' if encoding else f'"{etag}"'
+    headers: Dict[str, str] = {
+        'ETag': f'W/{opaque_tag}' if weak else opaque_tag,
+        'Cache-Control': cache_control,
+        'Vary': 'Accept-Encoding'
+    }
+    if last_modified is not None:
+        headers['Last-Modified'] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+
+    if_none_match = request.headers.get('if-none-match', '')
+    tags = {value.strip().removeprefix('W/') for value in if_none_match.split(',')}
+    if if_none_match.strip() == '*' or opaque_tag in tags:
+        return Response(status_code=304, headers=headers)
+
+    if encoding:
+        body = _get_compressed(body, encoding)
+        headers['Content-Encoding'] = encoding
+    return Response(body, media_type=media_type, headers=headers)
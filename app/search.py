@@ -0,0 +1,154 @@
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.errors import DATABASE_ERRORS
+from app.db.models import Street
+from app.parser.streets import STREET_TYPES_EN, STREET_TYPES_KA, normalize
+
+
+# Street type words are skipped, they are present in almost every name
+_STREET_TYPE_WORDS = {word for forms in STREET_TYPES_EN + STREET_TYPES_KA for form in forms for word in form.split()}
+
+
+def _trigrams(text: str, prefix: bool = False) -> Set[str]:
+    """
+    Returns trigrams of words padded like pg_trgm does ("  word "),
+    last word of prefix query is not padded at the end to match longer words
+    and is kept even if it is street type word ("st" of "Stanislavski")
+    """
+
+    words = normalize(text)
+    words = [
+        word for i, word in enumerate(words)
+        if word not in _STREET_TYPE_WORDS or (prefix and i == len(words) - 1)
+    ]
+    trigrams = set()
+    for i, word in enumerate(words):
+        padded = f"  {word}" if prefix and i == len(words) - 1 else f"  {word} "
+        trigrams.update(padded[j:j + 3] for j in range(len(padded) - 2))
+    return trigrams
+
+
+class StreetIndex:
+    """
+    In-process trigram index over street names for typo tolerant search as you type.
+
+    Streets with the same names (OSM ways of one street) are merged into one entry.
+    While index is empty (e.g. database was unavailable at startup) search falls back
+    to pg_trgm indexed query.
+
+    Example:
+        ```python
+        index = await StreetIndex.load(async_session)
+        await index.search('chavchav')
+        ```
+    """
+
+    def __init__(
+        self,
+        streets: Iterable[Tuple[int, int, Optional[str], Optional[str]]] = (),
+        sessionmaker: Optional[async_sessionmaker[AsyncSession]] = None
+    ) -> None:
+        self.sessionmaker = sessionmaker
+        self.entries: List[dict] = []
+        self._trigrams: Dict[str, List[int]] = {}
+
+        entries: Dict[Tuple[Optional[str], Optional[str]], dict] = {}
+        for street_id, district_id, name_en, name_ka in streets:
+            entry = entries.setdefault((name_en, name_ka), {
+                'name_en': name_en,
+                'name_ka': name_ka,
+                'street_ids': [],
+                'district_ids': []
+            })
+            entry['street_ids'].append(street_id)
+            if district_id not in entry['district_ids']:
+                entry['district_ids'].append(district_id)
+
+        for entry_id, entry in enumerate(entries.values()):
+            self.entries.append(entry)
+            for trigram in _trigrams(entry['name_en'] or '') | _trigrams(entry['name_ka'] or ''):
+                self._trigrams.setdefault(trigram, []).append(entry_id)
+
+    @classmethod
+    async def load(cls, sessionmaker: Optional[async_sessionmaker[AsyncSession]]) -> 'StreetIndex':
+        """Builds index from all streets in database, empty one if database is unavailable"""
+
+        if sessionmaker is None:
+            return cls()
+        try:
+            async with sessionmaker() as session:
+                streets = (await session.execute(
+                    select(Street.id, Street.district_id, Street.name_en, Street.name_ka)
+                )).tuples().all()
+        except DATABASE_ERRORS as err:
+            logging.error(f"Error occured when loading streets from database. {err}")
+            return cls(sessionmaker=sessionmaker)
+        return cls(streets, sessionmaker)
+
+    async def search(self, query: str, limit: int = 10) -> List[dict]:
+        """Returns streets ranked by similarity of their names to query"""
+
+        if self.entries or self.sessionmaker is None:
+            return self._search(query, limit)
+        return await self._search_database(query, limit)
+
+    def _search(self, query: str, limit: int) -> List[dict]:
+        """
+        Scores entries by share of query trigrams found in their names,
+        names starting with query are ranked first, then shorter ones
+        """
+
+        trigrams = _trigrams(query, prefix=True)
+        if not trigrams:
+            return []
+        scores = Counter(entry_id for trigram in trigrams for entry_id in self._trigrams.get(trigram, ()))
+        prefix = ' '.join(normalize(query))
+
+        def rank(item: Tuple[int, int]) -> tuple:
+            entry = self.entries[item[0]]
+            names = [' '.join(normalize(name)) for name in (entry['name_en'], entry['name_ka']) if name]
+            starts = any(name.startswith(prefix) or f" {prefix}" in name for name in names)
+            return (-starts, -item[1], min(map(len, names)))
+
+        # Candidates sharing less than a third of query trigrams are typos too far away
+        candidates = [item for item in scores.items() if item[1] * 3 >= len(trigrams)]
+        best = sorted(candidates, key=lambda item: -item[1])[:limit * 5]
+        return [self.entries[entry_id] for entry_id, _ in sorted(best, key=rank)[:limit]]
+
+    async def _search_database(self, query: str, limit: int) -> List[dict]:
+        """Searches streets with pg_trgm similarity and prefix match, served by trigram indexes"""
+
+        pattern = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        score = func.greatest(func.similarity(Street.name_en, query), func.similarity(Street.name_ka, query))
+        statement = (
+            select(
+                Street.name_en,
+                Street.name_ka,
+                func.array_agg(Street.id),
+                func.array_agg(Street.district_id.distinct())
+            )
+            .where(or_(
+                Street.name_en.op('%')(query),
+                Street.name_ka.op('%')(query),
+                Street.name_en.ilike(pattern, escape='\\'),
+                Street.name_ka.ilike(pattern, escape='\\')
+            ))
+            .group_by(Street.name_en, Street.name_ka)
+            .order_by(func.max(score).desc())
+            .limit(limit)
+        )
+        try:
+            async with self.sessionmaker() as session:
+                rows = (await session.execute(statement)).all()
+        except DATABASE_ERRORS as err:
+            logging.error(f"Error occured when searching streets in database. {err}")
+            return []
+        return [
+            {'name_en': name_en, 'name_ka': name_ka, 'street_ids': street_ids, 'district_ids': district_ids}
+            for name_en, name_ka, street_ids, district_ids in rows
+        ]
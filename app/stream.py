@@ -0,0 +1,99 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, Optional, Set
+
+from settings import STREAM_KEEPALIVE, STREAM_QUEUE_SIZE
+from app.changes import ChangeSet, get_fingerprint
+from app.responses import dumps
+
+
+def _event(name: str, version: int, data: dict) -> str:
+    """Formats Server-Sent Event, data is serialized once for all subscribers"""
+
+    return f"event: {name}\nid: {version}\ndata: {dumps(data).decode()}\n\n"
+
+
+class OutagesHub:
+    """
+    Broadcasts outage changes to all Server-Sent Events subscribers.
+
+    Hub is a refresher listener, so every change is computed and serialized
+    once regardless of number of subscribers, and subscribers never trigger
+    scraps or database queries. New subscriber receives current outages
+    in `snapshot` event, then only `delta` events with added outages
+    and fingerprints of resolved ones.
+
+    Subscriber which does not keep up with STREAM_QUEUE_SIZE pending events
+    is dropped, browser EventSource reconnects and gets fresh snapshot.
+
+    Example:
+        ```python
+        hub = OutagesHub()
+        refresher.subscribe(hub.publish)
+        async for event in hub.subscribe():
+            ...
+        ```
+    """
+
+    def __init__(self, keepalive: float = STREAM_KEEPALIVE, queue_size: int = STREAM_QUEUE_SIZE) -> None:
+        self.keepalive = keepalive
+        self.queue_size = queue_size
+        self.version = 0
+        self._outages: Dict[str, dict] = {}
+        self._snapshot: Optional[str] = None
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    def publish(self, changes: ChangeSet) -> None:
+        """Sends change set of outages to all subscribers"""
+
+        updated = changes.added + [current for _, current in changes.changed]
+        resolved = [get_fingerprint(outage) for outage in changes.removed]
+        for key in resolved:
+            self._outages.pop(key, None)
+        for outage in updated:
+            self._outages[get_fingerprint(outage)] = outage
+        self._snapshot = None
+        if not changes:
+            return
+
+        self.version += 1
+        event = _event('delta', self.version, {
+            'added': [dict(outage, fingerprint=get_fingerprint(outage)) for outage in changes.added],
+            'changed': [dict(current, fingerprint=get_fingerprint(current)) for _, current in changes.changed],
+            'resolved': resolved
+        })
+        for queue in list(self._subscribers):
+            if queue.qsize() < self.queue_size:
+                queue.put_nowait(event)
+                continue
+            logging.warning("Outages stream subscriber is too slow, dropped.")
+            self._subscribers.discard(queue)
+            queue.put_nowait(None)
+
+    def snapshot(self) -> str:
+        """Returns `snapshot` event of current outages, serialized once per version"""
+
+        if self._snapshot is None:
+            outages = [dict(outage, fingerprint=key) for key, outage in self._outages.items()]
+            self._snapshot = _event('snapshot', self.version, {'outages': outages})
+        return self._snapshot
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        """Yields snapshot event, then delta events and keep-alive comments until cancelled"""
+
+        # One slot is reserved for the drop marker
+        queue = asyncio.Queue(self.queue_size + 1)
+        self._subscribers.add(queue)
+        try:
+            yield self.snapshot()
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    return
+                yield event
+        finally:
+            self._subscribers.discard(queue)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+import os
+import sys
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from typing import Dict, Type
+
+# Required to "import" from parent directory
+sys.path.append(
+    os.path.join(os.path.dirname(__file__), '..')
+)
+
+from settings import PROVIDER_RETRIES  # noqa: E402
+from app.parser import GetOutagesError, SingleFlight, create_client  # noqa: E402
+from app.parser.base import _host_breakers  # noqa: E402
+from app.parser.gwp import GWP  # noqa: E402
+from benchmarks.stub_server import GWPStubServer, stub_provider  # noqa: E402
+
+
+logging.basicConfig(level=logging.INFO)
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+
+def scenarios(provider: Type[GWP], hedge_delay: float) -> Dict[str, Type[GWP]]:
+    """Returns provider classes by name of fetch settings compared"""
+
+    return {
+        name: type(f'{provider.__name__}_{name}', (provider,), {'RETRIES': retries, 'HEDGE_DELAY': hedge})
+        for name, retries, hedge in (
+            ('no_retries', 0, 0),
+            ('retries', PROVIDER_RETRIES, 0),
+            ('retries_hedged', PROVIDER_RETRIES, hedge_delay)
+        )
+    }
+
+
+async def bench_scenario(provider: Type[GWP], runs: int, deadline: float) -> Dict[str, float]:
+    """Scraps stub server `runs` times, returns scrap latency percentiles and shares of results"""
+
+    timings = []
+    results = {'ok': 0, 'timeout': 0, 'failed': 0}
+    async with create_client() as client:
+        for _ in range(runs):
+            # Every run starts with closed circuits and cold memo
+            _host_breakers.clear()
+            start_time = time.perf_counter()
+            try:
+                await asyncio.wait_for(provider(client, flight=SingleFlight(ttl=0)).get_outages(deadline), deadline)
+                results['ok'] += 1
+            except asyncio.TimeoutError:
+                results['timeout'] += 1
+            except GetOutagesError:
+                results['failed'] += 1
+            timings.append(time.perf_counter() - start_time)
+
+    percentiles = statistics.quantiles(timings, n=100, method='inclusive')
+    return {
+        'p50': percentiles[49],
+        'p95': percentiles[94],
+        'p99': percentiles[98],
+        **{result: count / runs for result, count in results.items()}
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    results = {}
+    server = GWPStubServer(
+        alerts=args.alerts,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        tail_rate=args.tail_rate,
+        tail_latency=args.tail_latency,
+        seed=args.seed
+    )
+    with server:
+        for name, provider in scenarios(stub_provider(server.url), args.hedge_delay).items():
+            results[name] = await bench_scenario(provider, args.runs, args.deadline)
+            logging.info(
+                f"{name}: p50 {results[name]['p50']:.3f}s, p95 {results[name]['p95']:.3f}s, "
+                f"p99 {results[name]['p99']:.3f}s, ok {results[name]['ok']:.0%}, "
+                f"timed out {results[name]['timeout']:.0%}, failed {results[name]['failed']:.0%}"
+            )
+    return results
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description='GWP scraping latency and success rate against local stub server injecting faults'
+    )
+    parser.add_argument('--alerts', type=int, default=20, help='Number of alerts per list view')
+    parser.add_argument('--runs', type=int, default=50, help='Scraps per scenario')
+    parser.add_argument('--latency', type=float, default=0.005, help='Seconds added to every stub response')
+    parser.add_argument('--error-rate', type=float, default=0.02, help='Share of 503 responses')
+    parser.add_argument('--tail-rate', type=float, default=0.02, help='Share of responses delayed by tail latency')
+    parser.add_argument('--tail-latency', type=float, default=1, help='Seconds added to delayed responses')
+    parser.add_argument('--hedge-delay', type=float, default=0.1, help='HEDGE_DELAY of hedged scenario')
+    parser.add_argument('--deadline', type=float, default=5, help='Deadline budget of every scrap')
+    parser.add_argument('--seed', type=int, default=1, help='Seed of injected faults')
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
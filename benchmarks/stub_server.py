@@ -0,0 +1,150 @@
+import random
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from string import Template
+from typing import List, Optional, Tuple, Type
+from urllib.parse import parse_qs, urljoin, urlsplit
+
+from app.parser.gwp import GWP
+
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+# Provider paths of list views, emergency flag by path
+LIST_PATHS = {'dagegmili': False, 'gadaudebeli': True}
+
+
+def stub_provider(url: str) -> Type[GWP]:
+    """Returns GWP provider scraping stub server at given url"""
+
+    return type('StubGWP', (GWP,), {
+        'ROOT_URL': url,
+        'PLANNED_URL': urljoin(url, '/en/dagegmili'),
+        'EMERGENCY_URL': urljoin(url, '/en/gadaudebeli')
+    })
+
+
+def _fixture(name: str) -> Template:
+    return Template((FIXTURES_DIR / name).read_text(encoding='utf-8'))
+
+
+class GWPStubServer:
+    """
+    Local HTTP server serving synthetic gwp.ge pages with given number of alerts.
+
+    Fixtures are hand-written to mimic markup of gwp.ge list and detail views
+    which GWP provider parses, they are not recorded from the site, so
+    changes of its markup have to be reflected in them by hand.
+
+    List views are built from row markup, split into pages of per_page rows
+    (`?page=N`) when given, rows are dated from today minus `past` days,
+    newest first. Detail views of every alert are served from detail page
+    fixtures. Optional latency is added to every response to mimic upstream
+    round trip.
+
+    Faults are injected at random: error_rate share of responses are 503
+    and tail_rate share of responses are delayed by tail_latency seconds,
+    seed makes them reproducible.
+
+    Example:
+        ```python
+        with GWPStubServer(alerts=100, error_rate=0.05, tail_rate=0.01, seed=1) as server:
+            server.url  # http://127.0.0.1:<port>
+        ```
+    """
+
+    def __init__(
+        self,
+        alerts: int = 10,
+        latency: float = 0,
+        per_page: Optional[int] = None,
+        past: int = 0,
+        error_rate: float = 0,
+        tail_rate: float = 0,
+        tail_latency: float = 1,
+        seed: Optional[int] = None
+    ) -> None:
+        self.alerts = alerts
+        self.latency = latency
+        self.error_rate = error_rate
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.requests: List[str] = []
+        # Alerts get dates from tomorrow down to `past` days ago, newest first
+        days = [
+            (date.today() + timedelta(days=1 - (index * (past + 1)) // max(alerts, 1))).strftime('%d/%m/%Y')
+            for index in range(alerts)
+        ]
+        per_page = per_page or max(alerts, 1)
+        self.pages = {}
+        for path, emergency in LIST_PATHS.items():
+            kind = 'emergency' if emergency else 'planned'
+            row = _fixture(f'gwp_{kind}_row.html')
+            rows = [row.substitute(index=index, date=days[index]) for index in range(alerts)]
+            for page in range(1, (alerts - 1) // per_page + 3):
+                page_rows = ''.join(rows[(page - 1) * per_page:page * per_page])
+                url = f'/en/{path}' if page == 1 else f'/en/{path}?page={page}'
+                self.pages[url] = _fixture(f'gwp_{kind}_list.html').substitute(rows=page_rows).encode()
+            details = _fixture(f'gwp_{kind}_details.html')
+            for index in range(alerts):
+                self.pages[f'/en/{path}/{index}'] = details.substitute(index=index, date=days[index]).encode()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def _respond(self, path: str) -> Tuple[int, bytes, float]:
+        """Returns status, body and latency of response to given path, with injected faults"""
+
+        parts = urlsplit(path)
+        page = parse_qs(parts.query).get('page', ['1'])[0]
+        body = self.pages.get(parts.path if page == '1' else f'{parts.path}?page={page}')
+        with self._random_lock:
+            value = self._random.random()
+        if value < self.error_rate:
+            return 503, b'Service Unavailable', self.latency
+        latency = self.latency + (self.tail_latency if value < self.error_rate + self.tail_rate else 0)
+        return (200, body, latency) if body is not None else (404, b'', latency)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                server.requests.append(self.path)
+                status, body, latency = server._respond(self.path)
+                if latency:
+                    time.sleep(latency)
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'text/html; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Client gave up, e.g. hedged request was cancelled
+                    self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self) -> 'GWPStubServer':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._server.shutdown()
+        self._server.server_close()
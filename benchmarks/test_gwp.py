@@ -0,0 +1,73 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+from app.parser import SingleFlight, create_client
+from benchmarks.stub_server import GWPStubServer, stub_provider
+
+
+pytest.importorskip('pytest_benchmark')
+
+
+# Numbers of alerts per list view
+SIZES = (10, 100, 1000)
+
+# Measured runs per benchmark, after one warmup run
+ROUNDS = 5
+
+
+@pytest.fixture(scope='module')
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope='module')
+def client(loop):
+    """Pooled client shared by runs, so connections to stub server are kept alive like in production"""
+
+    client = create_client()
+    yield client
+    loop.run_until_complete(client.aclose())
+
+
+@pytest.fixture(scope='module', params=SIZES, ids=lambda alerts: f'{alerts}_alerts')
+def server(request):
+    with GWPStubServer(alerts=request.param) as server:
+        yield server
+
+
+def run(benchmark, loop, client, server, scrap):
+    """Benchmarks scrap of fresh provider in every run, so page cache and memo are cold"""
+
+    provider_class = stub_provider(server.url)
+    return benchmark.pedantic(
+        lambda: loop.run_until_complete(scrap(provider_class(client, flight=SingleFlight(ttl=0)))),
+        rounds=ROUNDS,
+        warmup_rounds=1
+    )
+
+
+@pytest.mark.benchmark(group='_get_outages')
+def test_get_outages_list(benchmark, loop, client, server):
+    outages = run(
+        benchmark, loop, client, server,
+        lambda provider: provider._get_outages(provider.PLANNED_URL, date.today(), False)
+    )
+    assert len(outages) == server.alerts
+
+
+@pytest.mark.benchmark(group='_divide_outages_by_district')
+def test_divide_outages_by_district(benchmark, loop, client, server):
+    provider = stub_provider(server.url)(client, flight=SingleFlight(ttl=0))
+    outages = loop.run_until_complete(provider._get_outages(provider.PLANNED_URL, date.today(), False))
+    descriptions = run(benchmark, loop, client, server, lambda provider: provider._divide_outages_by_district(outages))
+    assert len(descriptions) >= server.alerts
+
+
+@pytest.mark.benchmark(group='get_outages')
+def test_get_outages(benchmark, loop, client, server):
+    outages = run(benchmark, loop, client, server, lambda provider: provider.get_outages())
+    assert len(outages) >= 2 * server.alerts
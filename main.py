@@ -1,46 +1,237 @@
+import asyncio
 import logging
+import time
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
-from typing import List
-
-from app.parser.gwp import GWP
+from typing import Dict, List
+
+from settings import (
+    NEARBY_DEFAULT_RADIUS,
+    NEARBY_MAX_RADIUS,
+    OUTAGES_CACHE_CONTROL,
+    OUTAGES_STALE_CACHE_CONTROL,
+    PAGES_CACHE_CONTROL,
+    STREETS_RELOAD_INTERVAL,
+    TELEGRAM_BOT_TOKEN
+)
+from app import metrics
+from app.aggregates import DistrictAggregates
+from app.db.session import async_session
+from app.leader import LeaderElection
+from app.nearby import NearbyIndex
+from app.notifier import LogTransport, Notifier, SubscriptionIndex, TelegramTransport
+from app.parser import PageStore, StreetMatcher, create_client
+from app.refresher import OutagesRefresher
+from app.responses import cached_response, digest_etag
+from app.search import StreetIndex
+from app.stream import OutagesHub
 
 
 # Configure basic logger
 
 logging.basicConfig(level=logging.INFO)
+# Request lines of httpx contain Telegram bot token
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+
+# Define lifespan resources shared by handlers
+
+async def reload_streets(app: FastAPI, interval: float = STREETS_RELOAD_INTERVAL) -> None:
+    """
+    Reloads streets of district aggregates and nearby index every interval
+    until cancelled, so streets replaced by update_streets are counted in the
+    right districts and found by their new geometry
+    """
+
+    while True:
+        await asyncio.sleep(interval)
+        await app.state.aggregates.reload(async_session, lambda: app.state.refresher.snapshot.outages)
+        await app.state.nearby.reload(async_session)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Opens pooled http client for providers, takes part in leader election
+    and starts background refresher, notifier and streets reload, all are
+    closed on shutdown.
+    Without database settings app runs without persistence and election.
+    """
+
+    pages = PageStore(async_session)
+    await pages.load()
+    streets = await StreetMatcher.load(async_session)
+    app.state.street_index = await StreetIndex.load(async_session)
+    app.state.aggregates = await DistrictAggregates.load(async_session)
+    app.state.nearby = await NearbyIndex.load(async_session)
+    subscriptions = await SubscriptionIndex.load(async_session)
+    election = LeaderElection() if async_session is not None else None
+    if election is not None:
+        await election.start()
+
+    async with create_client() as client:
+        app.state.http_client = client
+        app.state.refresher = OutagesRefresher(
+            client, pages=pages, streets=streets, sessionmaker=async_session, election=election
+        )
+        app.state.refresher.subscribe(app.state.aggregates.update)
+        app.state.refresher.subscribe(app.state.nearby.update)
+        app.state.hub = OutagesHub()
+        app.state.refresher.subscribe(app.state.hub.publish)
+        transport = TelegramTransport(client, TELEGRAM_BOT_TOKEN) if TELEGRAM_BOT_TOKEN else LogTransport()
+        app.state.notifier = Notifier(subscriptions, transport, async_session, election=election)
+        app.state.refresher.subscribe(app.state.notifier.publish, leader_only=True)
+        await app.state.refresher.load()
+        app.state.refresher.start()
+        app.state.notifier.start()
+        streets_reload = asyncio.create_task(reload_streets(app)) if async_session is not None else None
+        yield
+        if streets_reload is not None:
+            streets_reload.cancel()
+            await asyncio.gather(streets_reload, return_exceptions=True)
+        await app.state.refresher.stop()
+        await app.state.notifier.stop()
+    if election is not None:
+        await election.stop()
 
 
 # Define the app and add static with jinja2 templates
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
 
-# Handlers
-
-@app.get("/", response_class=HTMLResponse)
-async def index(request: Request):
-    """Main page handler"""
+# Record duration of requests by route template, so path parameters don't multiply series
 
-    return templates.TemplateResponse(request, "index.html")
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    start_time = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get('route')
+    metrics.REQUEST_DURATION.observe(
+        time.perf_counter() - start_time,
+        method=request.method,
+        route=route.path if route is not None else 'unmatched',
+        status=str(response.status_code)
+    )
+    return response
 
 
-@app.get("/outages", response_model=List[dict])
-async def outages():
-    """Outages"""
+# Handlers
 
-    gwp_provider = GWP()
-    outages = []
-    try:
-        gwp_outages = await gwp_provider.get_outages()
-        outages.extend(gwp_outages)
-    except GetOutagesError as err:
-        logging.error(f"Error occured while getting outages:\n{err}")
-    return outages
+@app.get("/", response_class=HTMLResponse)
+async def index(request: Request):
+    """Main page handler, compressed and revalidated by content etag"""
+
+    body = templates.get_template("index.html").render(request=request).encode()
+    return cached_response(request, body, digest_etag(body), 'text/html; charset=utf-8', PAGES_CACHE_CONTROL)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_handler():
+    """Metrics in Prometheus text exposition format"""
+
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/outages", response_model=dict)
+async def outages(request: Request):
+    """
+    Outages of all providers from latest background snapshot,
+    with names of timed out or failed providers and staleness flag.
+
+    Body is serialized once per snapshot, weak etag is digest of its outages,
+    so it is kept while they don't change, updated_at is sent in Last-Modified.
+    Stale snapshots are revalidated by clients on every request.
+    """
+
+    snapshot, stale = request.app.state.refresher.current()
+    return cached_response(
+        request, snapshot.body(stale), snapshot.etag(stale), 'application/json',
+        OUTAGES_STALE_CACHE_CONTROL if stale else OUTAGES_CACHE_CONTROL,
+        weak=True, last_modified=snapshot.updated_at
+    )
+
+
+@app.get("/outages/stream")
+async def outages_stream(request: Request):
+    """
+    Server-Sent Events stream of outages, current outages are sent once
+    in `snapshot` event, then only added and resolved ones in `delta` events
+    """
+
+    return StreamingResponse(
+        request.app.state.hub.subscribe(),
+        media_type="text/event-stream",
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.get("/outages/near", response_model=dict)
+async def outages_near(
+    request: Request,
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius: float = Query(NEARBY_DEFAULT_RADIUS, gt=0, le=NEARBY_MAX_RADIUS)
+):
+    """
+    Active outages of streets within radius meters of location, nearest first,
+    looked up in spatial index of streets, with staleness of latest snapshot
+    """
+
+    snapshot, stale = request.app.state.refresher.current()
+    return {
+        'outages': request.app.state.nearby.outages_near(lat, lon, radius),
+        'updated_at': snapshot.updated_at,
+        'stale': stale
+    }
+
+
+@app.get("/streets/search", response_model=List[dict])
+async def streets_search(
+    request: Request,
+    q: str = Query('', max_length=100),
+    limit: int = Query(10, ge=1, le=50)
+):
+    """Typo tolerant street search by english or georgian name prefix"""
+
+    return await request.app.state.street_index.search(q, limit)
+
+
+@app.get("/districts/outages", response_model=Dict[str, dict])
+async def districts_outages(request: Request):
+    """Precomputed numbers of affected streets of all districts"""
+
+    return request.app.state.aggregates.all()
+
+
+@app.get("/districts/{slug}/outages")
+async def district_outages(request: Request, slug: str):
+    """
+    Precomputed number of affected streets of district,
+    cached html fragment is returned for htmx requests of the map
+    """
+
+    aggregates = request.app.state.aggregates
+    if 'HX-Request' not in request.headers:
+        aggregate = aggregates.get(slug)
+        if aggregate is None:
+            raise HTTPException(status_code=404, detail="District not found")
+        return aggregate
+
+    fragment = aggregates.get_fragment(
+        slug,
+        lambda slug, aggregate: templates.get_template("components/district_outages.html").render(
+            slug=slug, aggregate=aggregate
+        )
+    )
+    if fragment is None:
+        raise HTTPException(status_code=404, detail="District not found")
+    return HTMLResponse(fragment)
@@ -0,0 +1,29 @@
+"""Drop outage period index
+
+Revision ID: 216163b72cf7
+Revises: bc4c972c4ce1
+Create Date: 2026-10-17 20:12:22.706623
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '216163b72cf7'
+down_revision: Union[str, None] = 'bc4c972c4ce1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_index('ix_outage_period', table_name='outage', postgresql_using='gist')
+
+
+def downgrade() -> None:
+    op.create_index(
+        'ix_outage_period', 'outage', [sa.text("tsrange(start, \"end\", '[]')")],
+        postgresql_using='gist'
+    )
@@ -0,0 +1,43 @@
+"""Add unique osm_id to street model
+
+Revision ID: 5d7a3c1e8f42
+Revises: c41f8e2d9a37
+Create Date: 2026-10-17 13:08:55.271904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d7a3c1e8f42'
+down_revision: Union[str, None] = 'c41f8e2d9a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Outages keep their rows when street is removed from OSM
+    op.drop_constraint('outage_street_id_fkey', 'outage', type_='foreignkey')
+    op.create_foreign_key(
+        'outage_street_id_fkey', 'outage', 'street', ['street_id'], ['id'], ondelete='SET NULL'
+    )
+    # Ways on district borders were inserted once per district
+    op.execute('DELETE FROM street a USING street b WHERE a.osm_id = b.osm_id AND a.id > b.id')
+    op.alter_column('street', 'osm_id',
+               existing_type=sa.INTEGER(),
+               type_=sa.BigInteger(),
+               existing_nullable=False)
+    op.create_index('ix_street_osm_id', 'street', ['osm_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_street_osm_id', table_name='street')
+    op.alter_column('street', 'osm_id',
+               existing_type=sa.BigInteger(),
+               type_=sa.INTEGER(),
+               existing_nullable=False)
+    op.drop_constraint('outage_street_id_fkey', 'outage', type_='foreignkey')
+    op.create_foreign_key('outage_street_id_fkey', 'outage', 'street', ['street_id'], ['id'])
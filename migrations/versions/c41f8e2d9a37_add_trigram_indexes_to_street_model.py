@@ -0,0 +1,34 @@
+"""Add trigram indexes to street model
+
+Revision ID: c41f8e2d9a37
+Revises: 9b2e4d7c5a10
+Create Date: 2026-10-17 12:26:10.640217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41f8e2d9a37'
+down_revision: Union[str, None] = '9b2e4d7c5a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index(
+        'ix_street_name_en_trgm', 'street', ['name_en'],
+        postgresql_using='gin', postgresql_ops={'name_en': 'gin_trgm_ops'}
+    )
+    op.create_index(
+        'ix_street_name_ka_trgm', 'street', ['name_ka'],
+        postgresql_using='gin', postgresql_ops={'name_ka': 'gin_trgm_ops'}
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_street_name_ka_trgm', table_name='street')
+    op.drop_index('ix_street_name_en_trgm', table_name='street')
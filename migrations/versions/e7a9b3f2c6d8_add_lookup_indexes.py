@@ -0,0 +1,43 @@
+"""Add lookup indexes for outages and streets
+
+Revision ID: e7a9b3f2c6d8
+Revises: 5d7a3c1e8f42
+Create Date: 2026-10-17 14:02:31.904716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a9b3f2c6d8'
+down_revision: Union[str, None] = '5d7a3c1e8f42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_street_district_id', 'street', ['district_id'])
+    op.create_index('ix_outage_street_id', 'outage', ['street_id'])
+    op.create_index(
+        'ix_outage_active_id', 'outage', ['id'],
+        postgresql_where=sa.text('resolved_at IS NULL')
+    )
+    op.create_index(
+        'ix_outage_active_provider', 'outage', ['provider'],
+        postgresql_where=sa.text('resolved_at IS NULL')
+    )
+    op.create_index(
+        'ix_outage_period', 'outage', [sa.text("tsrange(start, \"end\", '[]')")],
+        postgresql_using='gist'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outage_period', table_name='outage')
+    op.drop_index('ix_outage_active_provider', table_name='outage')
+    op.drop_index('ix_outage_active_id', table_name='outage')
+    op.drop_index('ix_outage_street_id', table_name='outage')
+    op.drop_index('ix_street_district_id', table_name='street')
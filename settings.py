@@ -17,3 +17,87 @@ DB_PORT = os.getenv('DB_PORT')
 
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 DATABASE_URL_ASYNC = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+
+# Providers HTTP client settings
+# https://www.python-httpx.org/advanced/resource-limits/
+
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 10))
+HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', 20))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('HTTP_MAX_KEEPALIVE_CONNECTIONS', 10))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', 30))
+HTTP2 = os.getenv('HTTP2', 'False').lower() in ('true', '1')  # Requires httpx[http2]
+HTTP_MAX_CONCURRENCY_PER_HOST = int(os.getenv('HTTP_MAX_CONCURRENCY_PER_HOST', 8))  # 1 means sequential fetching
+
+
+# Providers scraping settings
+
+PROVIDER_DEADLINE = float(os.getenv('PROVIDER_DEADLINE', 15))  # Seconds per provider
+REFRESH_INTERVAL = float(os.getenv('REFRESH_INTERVAL', 300))  # Seconds between background scraps
+SNAPSHOT_MAX_AGE = float(os.getenv('SNAPSHOT_MAX_AGE', 600))  # Seconds until served snapshot is stale
+PARSER_WORKERS = int(os.getenv('PARSER_WORKERS', 4))  # Threads parsing html off event loop
+HTML_PARSER = os.getenv('HTML_PARSER', 'html.parser')  # 'lxml' is faster, requires lxml
+PROVIDER_MAX_LIST_PAGES = int(os.getenv('PROVIDER_MAX_LIST_PAGES', 10))  # Paginated list pages crawled at most
+FETCH_MEMO_TTL = float(os.getenv('FETCH_MEMO_TTL', 30))  # Seconds parsed pages are reused without request
+FETCH_MEMO_SIZE = int(os.getenv('FETCH_MEMO_SIZE', 1024))  # Parsed pages kept in memo at most
+PROVIDER_LIST_BUDGET = float(os.getenv('PROVIDER_LIST_BUDGET', 0.5))  # Share of deadline list views may use
+PROVIDER_RETRIES = int(os.getenv('PROVIDER_RETRIES', 2))  # Retries of failed GET, 0 disables retries
+PROVIDER_RETRY_BACKOFF = float(os.getenv('PROVIDER_RETRY_BACKOFF', 0.2))  # Seconds, doubled every retry
+PROVIDER_RETRY_MAX_BACKOFF = float(os.getenv('PROVIDER_RETRY_MAX_BACKOFF', 2))
+PROVIDER_BREAKER_THRESHOLD = int(os.getenv('PROVIDER_BREAKER_THRESHOLD', 5))  # Failures in a row opening circuit
+PROVIDER_BREAKER_COOLDOWN = float(os.getenv('PROVIDER_BREAKER_COOLDOWN', 30))  # Seconds until host is probed again
+PROVIDER_HEDGE_DELAY = float(os.getenv('PROVIDER_HEDGE_DELAY', 0))  # Seconds until slow GET is duplicated, 0 disables
+
+
+# Overpass API settings used by cli.py update_streets
+# https://wiki.openstreetmap.org/wiki/Overpass_API#Public_Overpass_API_instances
+
+OVERPASS_WORKERS = int(os.getenv('OVERPASS_WORKERS', 4))  # Concurrent district queries
+OVERPASS_RATE = float(os.getenv('OVERPASS_RATE', 1))  # Queries per second
+OVERPASS_BURST = int(os.getenv('OVERPASS_BURST', 2))
+OVERPASS_RETRIES = int(os.getenv('OVERPASS_RETRIES', 5))
+OVERPASS_BACKOFF = float(os.getenv('OVERPASS_BACKOFF', 2))  # Seconds, doubled on every retry
+OVERPASS_CACHE_DIR = os.getenv('OVERPASS_CACHE_DIR', '.overpass_cache')  # Raw responses for --replay
+STREETS_RELOAD_INTERVAL = float(os.getenv('STREETS_RELOAD_INTERVAL', 300))  # Seconds between app street reloads
+STREET_SIMPLIFY_TOLERANCE = float(os.getenv('STREET_SIMPLIFY_TOLERANCE', 5))  # Meters of stored geometry error
+METRICS_TEXTFILE = os.getenv('METRICS_TEXTFILE')  # Prometheus textfile written by cli.py, e.g. for node_exporter
+
+
+# Server-Sent Events stream settings of /outages/stream
+
+STREAM_KEEPALIVE = float(os.getenv('STREAM_KEEPALIVE', 15))  # Seconds between keep-alive comments
+STREAM_QUEUE_SIZE = int(os.getenv('STREAM_QUEUE_SIZE', 16))  # Pending events until slow subscriber is dropped
+
+
+# HTTP caching and compression of responses
+
+OUTAGES_CACHE_CONTROL = os.getenv('OUTAGES_CACHE_CONTROL', 'public, max-age=60')
+OUTAGES_STALE_CACHE_CONTROL = os.getenv('OUTAGES_STALE_CACHE_CONTROL', 'no-cache')  # Stale or not loaded yet
+PAGES_CACHE_CONTROL = os.getenv('PAGES_CACHE_CONTROL', 'public, max-age=300')
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 500))  # Bytes, smaller bodies are sent as is
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 6))
+
+
+# Telegram notifier settings
+# https://core.telegram.org/bots/faq#my-bot-is-hitting-limits-how-do-i-avoid-this
+
+TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')  # Notifications are only logged without token
+NOTIFIER_RATE = float(os.getenv('NOTIFIER_RATE', 25))  # Messages per second, Telegram allows about 30
+NOTIFIER_BURST = int(os.getenv('NOTIFIER_BURST', 25))
+NOTIFIER_BATCH_SIZE = int(os.getenv('NOTIFIER_BATCH_SIZE', 25))  # Messages sent concurrently
+NOTIFIER_RETRIES = int(os.getenv('NOTIFIER_RETRIES', 3))  # Attempts of rate limited message
+NOTIFIER_RELOAD_INTERVAL = float(os.getenv('NOTIFIER_RELOAD_INTERVAL', 60))  # Seconds between subscription reloads
+
+
+# Outages near location of /outages/near
+
+NEARBY_CELL_SIZE = float(os.getenv('NEARBY_CELL_SIZE', 250))  # Meters, grid cell of streets spatial index
+NEARBY_DEFAULT_RADIUS = float(os.getenv('NEARBY_DEFAULT_RADIUS', 500))  # Meters
+NEARBY_MAX_RADIUS = float(os.getenv('NEARBY_MAX_RADIUS', 3000))  # Meters
+
+
+# Leader election of scraping process across workers and nodes
+
+LEADER_LOCK_KEY = int(os.getenv('LEADER_LOCK_KEY', 4242001))  # Postgres advisory lock key
+LEADER_RETRY_INTERVAL = float(os.getenv('LEADER_RETRY_INTERVAL', 10))  # Seconds between lock attempts
+OUTAGES_CHANNEL = os.getenv('OUTAGES_CHANNEL', 'outages')  # LISTEN/NOTIFY channel of saved snapshots
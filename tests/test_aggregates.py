@@ -0,0 +1,126 @@
+import asyncio
+from typing import List, Optional
+
+import asyncpg
+import pytest
+
+from app.aggregates import DistrictAggregates, district_slug
+from app.changes import ChangeSet
+
+
+STREETS = [(1, 10), (2, 10), (3, 20)]
+DISTRICTS = [(10, 'Vake District'), (20, 'Saburtalo District')]
+
+
+class FakeSessionmaker:
+    """Sessions returning given rows of executed statements in order, or raising given error"""
+
+    def __init__(self, *results: list, error: Optional[Exception] = None) -> None:
+        self.results = list(results)
+        self.error = error
+
+    def __call__(self) -> 'FakeSessionmaker':
+        return self
+
+    async def __aenter__(self) -> 'FakeSessionmaker':
+        if self.error is not None:
+            raise self.error
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+    async def execute(self, statement) -> 'FakeSessionmaker':
+        self.rows = self.results.pop(0)
+        return self
+
+    def tuples(self) -> 'FakeSessionmaker':
+        return self
+
+    def all(self) -> List[tuple]:
+        return self.rows
+
+
+def outage(description: str, street_ids: List[int], outage_type: str = 'water', emergency: bool = False) -> dict:
+    return {'description': description, 'street_ids': street_ids, 'type': outage_type, 'emergency': emergency}
+
+
+@pytest.fixture
+def aggregates() -> DistrictAggregates:
+    return DistrictAggregates(STREETS, DISTRICTS)
+
+
+def test_district_slug():
+    assert district_slug('Vake District') == 'vake'
+    assert district_slug('Old Tbilisi District') == 'old-tbilisi'
+
+
+def test_streets_are_counted_once_per_district_and_type(aggregates):
+    aggregates.update(ChangeSet(added=[
+        outage('water 1', [1, 2]),
+        outage('water 2', [2]),
+        outage('power', [1], outage_type='electricity', emergency=True),
+        outage('unknown street', [99]),
+    ]))
+
+    assert aggregates.get('vake') == {
+        'streets': 2,
+        'types': {'water': {'planned': 2, 'emergency': 0}, 'electricity': {'planned': 0, 'emergency': 1}}
+    }
+    assert aggregates.get('saburtalo') == {'streets': 0, 'types': {}}
+    assert aggregates.get('gldani') is None
+
+
+def test_changed_and_removed_outages_are_uncounted(aggregates):
+    water, power = outage('water', [1, 2]), outage('power', [3], outage_type='electricity')
+    aggregates.update(ChangeSet(added=[water, power]))
+
+    aggregates.update(ChangeSet(changed=[(water, outage('water', [2]))], removed=[power]))
+
+    assert aggregates.all() == {
+        'vake': {'streets': 1, 'types': {'water': {'planned': 1, 'emergency': 0}}},
+        'saburtalo': {'streets': 0, 'types': {}}
+    }
+
+
+def test_fragments_are_rendered_once_per_change(aggregates):
+    renders = []
+
+    def render(slug: str, aggregate: dict) -> str:
+        renders.append(slug)
+        return f"{slug}: {aggregate['streets']}"
+
+    assert aggregates.get_fragment('vake', render) == 'vake: 0'
+    assert aggregates.get_fragment('vake', render) == 'vake: 0'
+    aggregates.update(ChangeSet(added=[outage('water', [1])]))
+    assert aggregates.get_fragment('vake', render) == 'vake: 1'
+    assert aggregates.get_fragment('gldani', render) is None
+    assert renders == ['vake', 'vake']
+
+
+def test_reload_recounts_outages_with_new_streets(aggregates):
+    outages = [outage('water', [1, 4])]
+    aggregates.update(ChangeSet(added=outages))
+
+    # Street 1 moved to Saburtalo, street 4 is added by update_streets
+    reloaded = asyncio.run(aggregates.reload(FakeSessionmaker([(1, 20), (4, 20)], DISTRICTS), lambda: outages))
+
+    assert reloaded
+    assert aggregates.get('vake')['streets'] == 0
+    assert aggregates.get('saburtalo')['streets'] == 2
+    # Later change sets apply to reloaded streets
+    aggregates.update(ChangeSet(removed=outages))
+    assert aggregates.get('saburtalo')['streets'] == 0
+
+
+def test_failed_reload_keeps_aggregates(aggregates):
+    aggregates.update(ChangeSet(added=[outage('water', [1])]))
+    error = asyncpg.InvalidPasswordError('password authentication failed')
+
+    assert not asyncio.run(aggregates.reload(FakeSessionmaker(error=error), lambda: ()))
+    assert aggregates.get('vake')['streets'] == 1
+
+
+def test_load_without_database_is_empty():
+    aggregates = asyncio.run(DistrictAggregates.load(None))
+    assert aggregates.all() == {}
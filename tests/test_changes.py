@@ -0,0 +1,56 @@
+from datetime import date
+
+from app.changes import ChangeSet, diff, fingerprint
+
+
+def outage(description: str, **fields) -> dict:
+    result = {
+        'date': date(2024, 5, 1),
+        'type': 'water',
+        'provider': 'GWP',
+        'emergency': False,
+        'title': 'Planned works',
+        'description': description
+    }
+    result.update(fields)
+    return result
+
+
+def test_fingerprint_ignores_whitespace_and_case_of_description():
+    assert fingerprint(outage('Vake,  Chavchavadze ave.')) == fingerprint(outage(' vake, chavchavadze AVE. '))
+
+
+def test_fingerprint_ignores_title():
+    assert fingerprint(outage('Vake')) == fingerprint(outage('Vake', title='Other title'))
+
+
+def test_fingerprint_differs_by_content_and_street():
+    base = fingerprint(outage('Vake'))
+    assert base != fingerprint(outage('Saburtalo'))
+    assert base != fingerprint(outage('Vake', emergency=True))
+    assert base != fingerprint(outage('Vake', date=date(2024, 5, 2)))
+    assert base != fingerprint(outage('Vake'), street_id=1)
+    assert fingerprint(outage('Vake'), street_id=1) != fingerprint(outage('Vake'), street_id=2)
+
+
+def test_diff_of_same_outages_is_empty():
+    outages = [outage('Vake'), outage('Saburtalo')]
+    assert not diff(outages, [dict(item) for item in outages])
+
+
+def test_diff_finds_added_changed_and_removed():
+    vake, saburtalo, gldani = outage('Vake'), outage('Saburtalo'), outage('Gldani')
+    retitled = outage('Vake', title='Works are extended')
+
+    changes = diff([vake, saburtalo], [retitled, gldani])
+
+    assert changes == ChangeSet(added=[gldani], changed=[(vake, retitled)], removed=[saburtalo])
+
+
+def test_diff_uses_attached_fingerprints_and_skips_duplicates():
+    first = outage('Vake', fingerprint='a')
+    second = outage('Saburtalo', fingerprint='a')
+
+    changes = diff([], [first, second])
+
+    assert changes.added == [first]
@@ -0,0 +1,188 @@
+import json
+import time
+from typing import List
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app import cli
+from app.cli import OVERPASS_QUERY, Database, OverpassCache, TokenBucket, replay_district_streets
+from app.db.models import City, District, Street, Subscription
+
+
+def overpass_response(*ways: int) -> bytes:
+    """Returns raw Overpass response with ways of given ids"""
+
+    return json.dumps({'version': 0.6, 'elements': [
+        {
+            'type': 'way',
+            'id': way_id,
+            'nodes': [1, 2],
+            'geometry': [{'lat': 41.7, 'lon': 44.78}, {'lat': 41.7, 'lon': 44.79}],
+            'tags': {'name': f'ქუჩა {way_id}', 'name:en': f'Street {way_id}', 'highway': 'residential'}
+        }
+        for way_id in ways
+    ]}).encode()
+
+
+def test_bucket_allows_burst_then_limits_rate():
+    bucket = TokenBucket(rate=20, capacity=2)
+    start_time = time.monotonic()
+    bucket.acquire()
+    bucket.acquire()
+    burst = time.monotonic() - start_time
+    bucket.acquire()
+    bucket.acquire()
+    assert burst < 0.02
+    assert time.monotonic() - start_time >= 0.09
+
+
+def test_bucket_refills_up_to_capacity():
+    bucket = TokenBucket(rate=1000, capacity=2)
+    bucket.acquire()
+    time.sleep(0.01)
+    bucket.acquire()
+    assert bucket.tokens <= 1
+
+
+def test_cache_keeps_latest_response_of_district_query(tmp_path):
+    cache = OverpassCache(tmp_path)
+    cache.put('Vake District', 'query', b'first')
+    cache.put('Vake District', 'query', b'second')
+
+    assert cache.get('Vake District', 'query') == b'second'
+    assert cache.get('Vake District', 'other query') is None
+    assert cache.get('Saburtalo District', 'query') is None
+
+
+def test_cache_stores_same_responses_once(tmp_path):
+    cache = OverpassCache(tmp_path)
+    cache.put('Vake District', 'query', b'response')
+    cache.put('Saburtalo District', 'query', b'response')
+
+    assert len(list((tmp_path / 'objects').iterdir())) == 1
+    assert len(list((tmp_path / 'refs').iterdir())) == 2
+
+
+def test_replay_parses_cached_response(tmp_path):
+    cache = OverpassCache(tmp_path)
+    cache.put('Vake District', OVERPASS_QUERY.format(district='Vake District'), overpass_response(1, 2))
+
+    result = replay_district_streets('Vake District', cache)
+
+    assert [way.id for way in result.ways] == [1, 2]
+
+
+def test_replay_without_cached_response_fails(tmp_path):
+    with pytest.raises(LookupError):
+        replay_district_streets('Vake District', OverpassCache(tmp_path))
+
+
+class ReplayDatabase(Database):
+    """Database of districts in SQLite, streets are recorded instead of synced"""
+
+    def __init__(self, cache: OverpassCache, saved: bool = True) -> None:
+        super().__init__(cache=cache)
+        City.__table__.create(self.engine)
+        District.__table__.create(self.engine)
+        with Session(self.engine) as session:
+            session.add(City(id=1, name_en='Tbilisi', name_ka='თბილისი'))
+            session.add_all([
+                District(id=1, city_id=1, name_en='Vake District', name_ka='ვაკის რაიონი'),
+                District(id=2, city_id=1, name_en='Saburtalo District', name_ka='საბურთალოს რაიონი')
+            ])
+            session.commit()
+        self.saved = saved
+        self.synced: List[tuple] = []
+
+    def sync_streets(self, streets: List[dict], district_ids: List[int]) -> bool:
+        self.synced.append((streets, district_ids))
+        return self.saved
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch) -> OverpassCache:
+    """Cache with response of Vake District only, databases are created in memory"""
+
+    monkeypatch.setattr(cli, 'DATABASE_URL', 'sqlite://')
+    cache = OverpassCache(tmp_path)
+    cache.put('Vake District', OVERPASS_QUERY.format(district='Vake District'), overpass_response(1, 2))
+    return cache
+
+
+def test_replay_syncs_cached_districts_only(cache):
+    db = ReplayDatabase(cache)
+
+    statuses = db.update_streets(replay=True)
+
+    assert statuses['Vake District'] == '2 streets'
+    assert statuses['Saburtalo District'].startswith('failed: No cached Overpass response')
+    [(streets, district_ids)] = db.synced
+    assert district_ids == [1]
+    assert [(street['osm_id'], street['district_id'], street['name_en']) for street in streets] == [
+        (1, 1, 'Street 1'), (2, 1, 'Street 2')
+    ]
+    assert streets[0]['geometry'] == [[41.7, 44.78], [41.7, 44.79]]
+
+
+def test_unsaved_districts_are_failed(cache):
+    statuses = ReplayDatabase(cache, saved=False).update_streets(replay=True)
+
+    assert statuses['Vake District'] == 'failed: 2 streets retrieved, but not saved'
+    assert cli.report_statuses(statuses)
+
+
+@pytest.fixture
+def connection():
+    """Connection in transaction, which is rolled back afterwards"""
+
+    try:
+        engine = create_engine(cli.DATABASE_URL)
+        connection = engine.connect()
+    except (SQLAlchemyError, ValueError) as err:
+        pytest.skip(f"Postgres is unreachable or not configured. {err}")
+    transaction = connection.begin()
+    yield connection
+    transaction.rollback()
+    connection.close()
+    engine.dispose()
+
+
+def street(district_id: int, osm_id: int, name: str) -> dict:
+    return {'district_id': district_id, 'name_en': name, 'name_ka': name, 'osm_id': osm_id, 'geometry': None}
+
+
+def test_subscriptions_are_kept_when_street_ways_are_replaced(connection):
+    district = District(city=City(name_en='Test', name_ka='Test'), name_en='Test', name_ka='Test')
+    replaced = Street(district=district, name_en='Test street', name_ka='Test street', osm_id=-10_000_001)
+    removed = Street(district=district, name_en='Test removed', name_ka='Test removed', osm_id=-10_000_002)
+    with Session(bind=connection, join_transaction_mode='create_savepoint') as session:
+        session.add_all([replaced, removed])
+        session.flush()
+        subscriptions = [
+            Subscription(chat_id=1, street_id=replaced.id, street_name='Outdated name'),
+            Subscription(chat_id=2, street_id=removed.id, street_name='Test removed'),
+            Subscription(chat_id=3, district_id=district.id)
+        ]
+        session.add_all(subscriptions)
+        session.commit()
+        district_id = district.id
+        subscription_ids = [subscription.id for subscription in subscriptions]
+
+    # Way of the street is replaced by a new one with the same name, the other street is removed
+    street_sync = Database._copy_streets(connection, [street(district_id, -10_000_003, 'Test street')])
+    Database._write_streets(connection, street_sync, [district_id])
+
+    rows = connection.execute(
+        select(Subscription.chat_id, Street.osm_id, Subscription.street_name, Subscription.district_id)
+        .outerjoin(Street, Subscription.street_id == Street.id)
+        .where(Subscription.id.in_(subscription_ids))
+        .order_by(Subscription.id)
+    ).all()
+    assert rows == [
+        (1, -10_000_003, 'Test street', None),
+        (2, None, 'Test removed', None),
+        (3, None, None, district_id)
+    ]
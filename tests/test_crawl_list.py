@@ -0,0 +1,54 @@
+import asyncio
+from datetime import date
+
+import httpx
+import pytest
+
+from app.parser import ParseError, SingleFlight, create_client
+from benchmarks.stub_server import GWPStubServer, stub_provider
+
+
+def crawl(server: GWPStubServer) -> list:
+    """Crawls planned outages list view of stub server with today as horizon"""
+
+    async def run() -> list:
+        async with create_client() as client:
+            provider = stub_provider(server.url)(client, flight=SingleFlight(ttl=0))
+            return await provider._crawl_list(provider.PLANNED_URL, provider._parse_outages, date.today())
+
+    return asyncio.run(run())
+
+
+def test_crawls_pages_until_short_page():
+    with GWPStubServer(alerts=6, per_page=3) as server:
+        rows = crawl(server)
+    assert len(rows) == 6
+    assert server.requests == ['/en/dagegmili', '/en/dagegmili?page=2', '/en/dagegmili?page=3']
+
+
+def test_missing_page_ends_list():
+    with GWPStubServer(alerts=6, per_page=3) as server:
+        del server.pages['/en/dagegmili?page=2']
+        rows = crawl(server)
+    assert len(rows) == 3
+
+
+def test_page_without_list_ends_list():
+    with GWPStubServer(alerts=6, per_page=3) as server:
+        server.pages['/en/dagegmili?page=2'] = b'<html><body><p>Not found</p></body></html>'
+        rows = crawl(server)
+    assert len(rows) == 3
+
+
+def test_missing_first_page_fails():
+    with GWPStubServer(alerts=6, per_page=3) as server:
+        del server.pages['/en/dagegmili']
+        with pytest.raises(httpx.HTTPStatusError):
+            crawl(server)
+
+
+def test_first_page_without_list_fails():
+    with GWPStubServer(alerts=6, per_page=3) as server:
+        server.pages['/en/dagegmili'] = b'<html><body><p>Not found</p></body></html>'
+        with pytest.raises(ParseError):
+            crawl(server)
@@ -0,0 +1,103 @@
+import asyncio
+from typing import Optional
+
+import pytest
+
+from app.parser.flight import SingleFlight
+
+
+class Calls:
+    """Counts calls of fetch, which returns its key after short delay or raises given error"""
+
+    def __init__(self, error: Optional[Exception] = None) -> None:
+        self.count = 0
+        self.error = error
+
+    async def fetch(self, key: str) -> str:
+        self.count += 1
+        await asyncio.sleep(0.01)
+        if self.error is not None:
+            raise self.error
+        return key
+
+
+def test_concurrent_calls_share_one_call():
+    calls = Calls()
+
+    async def run():
+        flight = SingleFlight(ttl=0)
+        return await asyncio.gather(*[flight.do('a', lambda: calls.fetch('a')) for _ in range(5)])
+
+    assert asyncio.run(run()) == ['a'] * 5
+    assert calls.count == 1
+
+
+def test_different_keys_are_called_separately():
+    calls = Calls()
+
+    async def run():
+        flight = SingleFlight(ttl=0)
+        return await asyncio.gather(flight.do('a', lambda: calls.fetch('a')), flight.do('b', lambda: calls.fetch('b')))
+
+    assert asyncio.run(run()) == ['a', 'b']
+    assert calls.count == 2
+
+
+def test_results_are_memoized_for_ttl():
+    calls = Calls()
+
+    async def run():
+        flight = SingleFlight(ttl=60)
+        await flight.do('a', lambda: calls.fetch('a'))
+        await flight.do('a', lambda: calls.fetch('a'))
+        flight.clear()
+        await flight.do('a', lambda: calls.fetch('a'))
+
+    asyncio.run(run())
+    assert calls.count == 2
+
+
+def test_memo_is_bounded_by_max_size():
+    calls = Calls()
+
+    async def run():
+        flight = SingleFlight(ttl=60, max_size=1)
+        await flight.do('a', lambda: calls.fetch('a'))
+        await flight.do('b', lambda: calls.fetch('b'))
+        await flight.do('a', lambda: calls.fetch('a'))
+
+    asyncio.run(run())
+    assert calls.count == 3
+
+
+def test_failures_are_shared_but_not_memoized():
+    calls = Calls(ValueError('upstream failed'))
+
+    async def run():
+        flight = SingleFlight(ttl=60)
+        results = await asyncio.gather(*[flight.do('a', lambda: calls.fetch('a')) for _ in range(3)],
+                                       return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert calls.count == 1
+        calls.error = None
+        return await flight.do('a', lambda: calls.fetch('a'))
+
+    assert asyncio.run(run()) == 'a'
+    assert calls.count == 2
+
+
+def test_cancelled_caller_does_not_cancel_shared_call():
+    calls = Calls()
+
+    async def run():
+        flight = SingleFlight(ttl=0)
+        cancelled = asyncio.ensure_future(flight.do('a', lambda: calls.fetch('a')))
+        waiting = asyncio.ensure_future(flight.do('a', lambda: calls.fetch('a')))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        return await waiting
+
+    assert asyncio.run(run()) == 'a'
+    assert calls.count == 1
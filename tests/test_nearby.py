@@ -0,0 +1,137 @@
+import asyncio
+import math
+from typing import List, Optional
+
+import asyncpg
+import pytest
+
+from app.changes import ChangeSet
+from app.geo import METERS_PER_DEGREE, centroid, distance_to_line, simplify
+from app.nearby import NearbyIndex
+
+
+LAT, LON = 41.7, 44.8
+# Degrees of latitude and longitude per 100 meters
+STEP = 100 / METERS_PER_DEGREE
+EAST_STEP = STEP / math.cos(math.radians(LAT))
+
+STREETS = [
+    # West to east along LAT, 1.6 km long
+    (1, [[LAT, LON - 0.01], [LAT, LON + 0.01]]),
+    # South to north, 300 meters east of LON
+    (2, [[LAT - 0.01, LON + 3 * EAST_STEP], [LAT + 0.01, LON + 3 * EAST_STEP]]),
+    # Single vertex 1 km north
+    (3, [[LAT + 10 * STEP, LON]]),
+    # Without geometry
+    (4, None),
+]
+
+
+class FakeSessionmaker:
+    """Sessions returning given street geometries, or raising given error"""
+
+    def __init__(self, streets: list = (), error: Optional[Exception] = None) -> None:
+        self.streets = list(streets)
+        self.error = error
+
+    def __call__(self) -> 'FakeSessionmaker':
+        return self
+
+    async def __aenter__(self) -> 'FakeSessionmaker':
+        if self.error is not None:
+            raise self.error
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+    async def execute(self, statement) -> 'FakeSessionmaker':
+        return self
+
+    def tuples(self) -> 'FakeSessionmaker':
+        return self
+
+    def all(self) -> List[tuple]:
+        return self.streets
+
+
+@pytest.fixture
+def index() -> NearbyIndex:
+    return NearbyIndex(STREETS, cell_size=50)
+
+
+def outage(description: str, street_ids: list) -> dict:
+    return {'description': description, 'street_ids': street_ids, 'fingerprint': description}
+
+
+def test_distance_to_line_is_measured_to_nearest_segment():
+    line = [(LAT, LON - 0.01), (LAT, LON), (LAT + 0.01, LON)]
+    assert distance_to_line((LAT + STEP, LON - 0.005), line) == pytest.approx(100, abs=1)
+    assert distance_to_line((LAT - STEP, LON), line) == pytest.approx(100, abs=1)
+    assert distance_to_line((LAT, LON), [(LAT, LON)]) == 0
+
+
+def test_simplify_drops_vertices_within_tolerance():
+    line = [(LAT, LON), (LAT + STEP / 100, LON + 0.001), (LAT, LON + 0.002), (LAT + STEP, LON + 0.003)]
+    assert simplify(line, tolerance=5) == [line[0], line[2], line[3]]
+    assert simplify(line, tolerance=0) == line
+    assert simplify(line[:2], tolerance=1000) == line[:2]
+
+
+def test_centroid_is_weighted_by_segment_length():
+    assert centroid([(LAT, LON), (LAT, LON + 0.002)]) == pytest.approx((LAT, LON + 0.001))
+    assert centroid([(LAT, LON), (LAT, LON + 0.003), (LAT, LON + 0.003)]) == pytest.approx((LAT, LON + 0.0015))
+    assert centroid([(LAT, LON), (LAT, LON)]) == (LAT, LON)
+
+
+def test_streets_near_are_found_within_radius(index):
+    streets = index.streets_near(LAT + STEP, LON, radius=150)
+    assert list(streets) == [1]
+    assert streets[1] == pytest.approx(100, abs=1)
+
+
+def test_streets_near_are_measured_exactly(index):
+    assert set(index.streets_near(LAT, LON, radius=350)) == {1, 2}
+    assert set(index.streets_near(LAT, LON, radius=250)) == {1}
+    assert set(index.streets_near(LAT + 10 * STEP, LON, radius=10)) == {3}
+    assert index.streets_near(LAT + 5 * STEP, LON - 5 * STEP, radius=50) == {}
+
+
+def test_outages_near_are_deduplicated_and_nearest_first(index):
+    index.update(ChangeSet(added=[outage('both', [1, 2]), outage('east', [2]), outage('north', [3])]))
+
+    outages = index.outages_near(LAT, LON + 2 * EAST_STEP, radius=500)
+
+    assert [item['description'] for item in outages] == ['both', 'east']
+    assert [item['distance'] for item in outages] == [0, 100]
+
+
+def test_update_applies_changed_and_removed_outages(index):
+    water, power = outage('water', [1]), outage('power', [1])
+    index.update(ChangeSet(added=[water, power]))
+    index.update(ChangeSet(changed=[(water, outage('water', [2]))], removed=[power]))
+
+    assert index.outages_near(LAT + STEP, LON - 0.005, radius=150) == []
+    assert [item['description'] for item in index.outages_near(LAT, LON + 3 * EAST_STEP, radius=10)] == ['water']
+
+
+def test_reload_replaces_geometries_and_keeps_outages(index):
+    index.update(ChangeSet(added=[outage('water', [1, 5])]))
+    # Street 1 is moved 1 km south and street 5 is added by update_streets
+    streets = [(1, [[LAT - 10 * STEP, LON - 0.01], [LAT - 10 * STEP, LON + 0.01]]), (5, [[LAT + STEP, LON]])]
+
+    assert asyncio.run(index.reload(FakeSessionmaker(streets)))
+    assert index.streets_near(LAT, LON, radius=350) == {5: pytest.approx(100, abs=1)}
+    assert set(index.streets_near(LAT - 10 * STEP, LON, radius=10)) == {1}
+    assert [item['distance'] for item in index.outages_near(LAT, LON, radius=1500)] == [100]
+
+
+def test_failed_reload_keeps_geometries(index):
+    error = asyncpg.InvalidPasswordError('password authentication failed')
+
+    assert not asyncio.run(index.reload(FakeSessionmaker(error=error)))
+    assert set(index.streets_near(LAT, LON, radius=350)) == {1, 2}
+
+
+def test_load_without_database_is_empty():
+    assert asyncio.run(NearbyIndex.load(None)).geometries == {}
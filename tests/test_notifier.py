@@ -0,0 +1,159 @@
+import asyncio
+from types import SimpleNamespace
+from typing import List, Optional, Tuple
+
+import asyncpg
+import pytest
+
+from app.changes import ChangeSet
+from app.notifier import AbstractTransport, Notifier, RetryAfter, SubscriptionIndex
+
+
+STREETS = [(1, 10), (2, 10), (3, 20)]
+
+
+class FakeBot(AbstractTransport):
+    """Telegram bot client recording sent messages, first sends are rate limited if asked"""
+
+    def __init__(self, rate_limited: int = 0) -> None:
+        self.rate_limited = rate_limited
+        self.sent: List[Tuple[int, str]] = []
+
+    async def send(self, chat_id: int, text: str) -> None:
+        if self.rate_limited:
+            self.rate_limited -= 1
+            raise RetryAfter(0.01)
+        self.sent.append((chat_id, text))
+
+
+class FakeSessionmaker:
+    """Sessions returning streets and subscriptions rows, or raising given error"""
+
+    def __init__(self, streets: list = (), subscriptions: list = (), error: Optional[Exception] = None) -> None:
+        self.results = [list(streets), list(subscriptions)]
+        self.error = error
+        self.sessions = 0
+
+    def __call__(self) -> 'FakeSessionmaker':
+        self.sessions += 1
+        return self
+
+    async def __aenter__(self) -> 'FakeSessionmaker':
+        if self.error is not None:
+            raise self.error
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+    async def execute(self, statement) -> 'FakeSessionmaker':
+        self.rows = self.results[0] if 'street.district_id' in str(statement) else self.results[1]
+        return self
+
+    def tuples(self) -> 'FakeSessionmaker':
+        return self
+
+    def all(self) -> List[tuple]:
+        return self.rows
+
+
+def outage(description: str, street_ids: List[int], house_number: Optional[int] = None) -> dict:
+    return {
+        'description': description,
+        'street_ids': street_ids,
+        'house_number': house_number,
+        'type': 'water',
+        'date': '2024-05-01'
+    }
+
+
+@pytest.fixture
+def index() -> SubscriptionIndex:
+    index = SubscriptionIndex(STREETS)
+    index.add(chat_id=1, street_id=1)
+    index.add(chat_id=2, street_id=1, house_number=5)
+    index.add(chat_id=3, district_id=10)
+    index.add(chat_id=4, district_id=20)
+    return index
+
+
+def test_outage_matches_street_house_and_district_subscribers(index):
+    assert index.match(outage('whole street', [1])) == {1, 2, 3}
+    assert index.match(outage('other house', [1], house_number=7)) == {1, 3}
+    assert index.match(outage('same house', [1], house_number=5)) == {1, 2, 3}
+    assert index.match(outage('streets of two districts', [2, 3])) == {3, 4}
+    assert index.match(outage('unknown street', [99])) == set()
+
+
+def test_removed_subscription_is_not_matched(index):
+    index.remove(chat_id=2, street_id=1, house_number=5)
+    index.remove(chat_id=3, district_id=10)
+
+    assert index.match(outage('whole street', [1])) == {1}
+    assert len(index) == 2
+
+
+def test_added_outages_are_sent_once_per_chat():
+    async def run():
+        index = SubscriptionIndex(STREETS)
+        index.add(chat_id=1, street_id=1)
+        index.add(chat_id=2, street_id=3)
+        bot = FakeBot(rate_limited=1)
+        notifier = Notifier(index, bot, rate=1000, burst=10)
+        notifier.start()
+        previous = outage('Changed', [3])
+        notifier.publish(ChangeSet(
+            added=[outage('Vake', [1]), outage('Vake again', [1, 2])],
+            changed=[(previous, dict(previous, title='Extended'))],
+            removed=[outage('Removed', [1])]
+        ))
+        while len(bot.sent) < 1 or not notifier._queue.empty():
+            await asyncio.sleep(0.01)
+        await notifier.stop()
+        return bot.sent
+
+    [(chat_id, text)] = asyncio.run(run())
+    assert chat_id == 1
+    assert 'Vake' in text and 'Vake again' in text
+    assert 'Changed' not in text and 'Removed' not in text
+
+
+def test_reload_replaces_subscriptions_and_skips_ones_without_street():
+    index = SubscriptionIndex(STREETS)
+    index.add(chat_id=1, street_id=1)
+    sessionmaker = FakeSessionmaker(
+        streets=[(1, 10), (4, 20)],
+        # Street of chat 3 was deleted by update_streets and not matched again
+        subscriptions=[(2, 4, None, None), (3, None, None, None), (4, None, 20, None)]
+    )
+
+    assert asyncio.run(index.reload(sessionmaker))
+    assert len(index) == 2
+    assert index.match(outage('old subscription', [1])) == set()
+    assert index.match(outage('replaced street', [4])) == {2, 4}
+
+
+def test_failed_reload_keeps_subscriptions(index):
+    error = asyncpg.InvalidPasswordError('password authentication failed')
+
+    assert not asyncio.run(index.reload(FakeSessionmaker(error=error)))
+    assert index.match(outage('whole street', [1])) == {1, 2, 3}
+
+
+@pytest.mark.parametrize('election, reloads', [
+    (None, True),
+    (SimpleNamespace(is_leader=True, connected=True), True),
+    (SimpleNamespace(is_leader=False, connected=True), False),
+    # No process is elected without database, every one publishes
+    (SimpleNamespace(is_leader=False, connected=False), True),
+])
+def test_only_publishing_process_reloads_subscriptions(election, reloads):
+    async def run():
+        notifier = Notifier(SubscriptionIndex(), FakeBot(), sessionmaker, reload_interval=0.01, election=election)
+        notifier.start()
+        await asyncio.sleep(0.05)
+        await notifier.stop()
+
+    sessionmaker = FakeSessionmaker(streets=[(1, 10)], subscriptions=[(1, 1, None, None)])
+    asyncio.run(run())
+    assert (sessionmaker.sessions > 0) is reloads
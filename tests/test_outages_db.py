@@ -0,0 +1,176 @@
+import asyncio
+from datetime import date
+from typing import Awaitable, Callable, List
+
+import pytest
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from settings import DATABASE_URL_ASYNC
+from app.db.errors import DATABASE_ERRORS
+from app.db.models import City, District, Outage, Street
+from app.changes import ChangeSet, diff, get_fingerprint
+from app.db.outages import get_active_outages, save_changes, save_outages
+
+
+PROVIDER = 'Test'
+
+
+def run(scenario: Callable[[async_sessionmaker[AsyncSession]], Awaitable]):
+    """Runs scenario with sessionmaker of single transaction, which is rolled back afterwards"""
+
+    async def main():
+        try:
+            engine = create_async_engine(DATABASE_URL_ASYNC)
+            connection = await engine.connect()
+        except (*DATABASE_ERRORS, ValueError) as err:
+            pytest.skip(f"Postgres is unreachable or not configured. {err}")
+        transaction = await connection.begin()
+        # Transactions of tested code become savepoints of the outer one
+        sessionmaker = async_sessionmaker(
+            bind=connection, join_transaction_mode='create_savepoint', expire_on_commit=False
+        )
+        try:
+            return await scenario(sessionmaker)
+        finally:
+            await transaction.rollback()
+            await connection.close()
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+def outage(description: str, street_ids: List[int] = ()) -> dict:
+    return {
+        'date': date(2024, 5, 1),
+        'type': 'water',
+        'provider': PROVIDER,
+        'emergency': False,
+        'title': 'Planned works',
+        'description': description,
+        'street_ids': list(street_ids)
+    }
+
+
+async def add_streets(sessionmaker: async_sessionmaker[AsyncSession], number: int) -> List[int]:
+    district = District(city=City(name_en='Test', name_ka='Test'), name_en='Test', name_ka='Test')
+    streets = [
+        Street(district=district, name_en=f'Test {i}', name_ka=f'Test {i}', osm_id=-10_000_000 - i)
+        for i in range(number)
+    ]
+    async with sessionmaker() as session, session.begin():
+        session.add_all(streets)
+    return [street.id for street in streets]
+
+
+async def save(sessionmaker: async_sessionmaker[AsyncSession], outages: List[dict], providers: List[str]) -> None:
+    async with sessionmaker() as session:
+        await save_outages(session, outages, providers)
+
+
+async def get_rows(sessionmaker: async_sessionmaker[AsyncSession]) -> List[Outage]:
+    async with sessionmaker() as session:
+        return list(await session.scalars(select(Outage).where(Outage.provider == PROVIDER).order_by(Outage.id)))
+
+
+async def get_active(sessionmaker: async_sessionmaker[AsyncSession]) -> List[dict]:
+    async with sessionmaker() as session:
+        return [item for item in await get_active_outages(session) if item['provider'] == PROVIDER]
+
+
+def test_saving_same_outages_again_writes_no_rows():
+    async def scenario(sessionmaker: async_sessionmaker[AsyncSession]):
+        outages = [outage('Vake'), outage('Saburtalo')]
+        await save(sessionmaker, outages, [PROVIDER])
+        first = [(row.id, row.fingerprint, row.resolved_at) for row in await get_rows(sessionmaker)]
+        await save(sessionmaker, [dict(item) for item in outages], [PROVIDER])
+        return first, [(row.id, row.fingerprint, row.resolved_at) for row in await get_rows(sessionmaker)]
+
+    first, second = run(scenario)
+    assert len(first) == 2
+    assert second == first
+
+
+def test_outages_missing_in_batch_are_resolved():
+    async def scenario(sessionmaker: async_sessionmaker[AsyncSession]):
+        await save(sessionmaker, [outage('Vake'), outage('Saburtalo')], [PROVIDER])
+        await save(sessionmaker, [outage('Vake')], [PROVIDER])
+        return await get_rows(sessionmaker), await get_active(sessionmaker)
+
+    rows, active = run(scenario)
+    assert [(row.description_en, row.resolved_at is None) for row in rows] == [('Vake', True), ('Saburtalo', False)]
+    assert [item['description'] for item in active] == ['Vake']
+
+
+def test_outages_of_other_providers_are_kept():
+    async def scenario(sessionmaker: async_sessionmaker[AsyncSession]):
+        await save(sessionmaker, [outage('Vake')], [PROVIDER])
+        await save(sessionmaker, [], ['Other'])
+        return await get_rows(sessionmaker)
+
+    rows = run(scenario)
+    assert [row.resolved_at for row in rows] == [None]
+
+
+def test_outage_of_several_streets_has_row_per_street():
+    async def scenario(sessionmaker: async_sessionmaker[AsyncSession]):
+        street_ids = await add_streets(sessionmaker, 2)
+        await save(sessionmaker, [outage('Vake', street_ids)], [PROVIDER])
+        return street_ids, await get_rows(sessionmaker), await get_active(sessionmaker)
+
+    street_ids, rows, active = run(scenario)
+    assert [row.street_id for row in rows] == street_ids
+    assert len({row.fingerprint for row in rows}) == 2
+    assert [item['street_ids'] for item in active] == [street_ids]
+
+
+async def delete_street(sessionmaker: async_sessionmaker[AsyncSession], street_id: int) -> None:
+    async with sessionmaker() as session, session.begin():
+        await session.execute(delete(Street).where(Street.id == street_id))
+
+
+async def apply(sessionmaker: async_sessionmaker[AsyncSession], changes: ChangeSet) -> None:
+    async with sessionmaker() as session:
+        await save_changes(session, changes)
+
+
+def test_loaded_outages_have_sorted_streets_and_equal_scrapped_ones():
+    async def scenario(sessionmaker: async_sessionmaker[AsyncSession]):
+        street_ids = await add_streets(sessionmaker, 3)
+        scrapped = outage('Vake', sorted(street_ids))
+        # Rows are inserted in other order than ids of streets
+        await save(sessionmaker, [outage('Vake', reversed(street_ids))], [PROVIDER])
+        return scrapped, await get_active(sessionmaker)
+
+    scrapped, active = run(scenario)
+    assert [item['street_ids'] for item in active] == [scrapped['street_ids']]
+    assert not diff(active, [dict(scrapped, fingerprint=get_fingerprint(scrapped))])
+
+
+def test_removed_outage_resolves_rows_of_deleted_streets():
+    async def scenario(sessionmaker: async_sessionmaker[AsyncSession]):
+        street_ids = await add_streets(sessionmaker, 2)
+        await save(sessionmaker, [outage('Vake', street_ids)], [PROVIDER])
+        await delete_street(sessionmaker, street_ids[0])
+        [loaded] = await get_active(sessionmaker)
+        await apply(sessionmaker, ChangeSet(removed=[loaded]))
+        return street_ids, loaded, await get_rows(sessionmaker)
+
+    street_ids, loaded, rows = run(scenario)
+    assert loaded['street_ids'] == street_ids[1:]
+    assert [(row.street_id, row.resolved_at is None) for row in rows] == [(None, False), (street_ids[1], False)]
+
+
+def test_changed_outage_resolves_rows_of_streets_no_longer_mentioned():
+    async def scenario(sessionmaker: async_sessionmaker[AsyncSession]):
+        kept, deleted, unmentioned, added = await add_streets(sessionmaker, 4)
+        await save(sessionmaker, [outage('Vake', [kept, deleted, unmentioned])], [PROVIDER])
+        await delete_street(sessionmaker, deleted)
+        [previous] = await get_active(sessionmaker)
+        await apply(sessionmaker, ChangeSet(changed=[(previous, dict(previous, street_ids=[kept, added]))]))
+        active_streets = [row.street_id for row in await get_rows(sessionmaker) if row.resolved_at is None]
+        return [kept, added], active_streets, await get_active(sessionmaker)
+
+    street_ids, active_streets, active = run(scenario)
+    assert active_streets == street_ids
+    assert [item['street_ids'] for item in active] == [street_ids]
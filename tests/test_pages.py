@@ -0,0 +1,95 @@
+import asyncio
+from typing import List, Optional
+
+import asyncpg
+from sqlalchemy.dialects import postgresql
+
+from app.parser import Page, PageStore
+
+
+class FakeSession:
+    """Session recording executed statements, raises given error instead when it is set"""
+
+    def __init__(self, sessionmaker: 'FakeSessionmaker') -> None:
+        self.sessionmaker = sessionmaker
+
+    async def __aenter__(self) -> 'FakeSession':
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+    async def execute(self, statement):
+        if self.sessionmaker.error is not None:
+            raise self.sessionmaker.error
+        self.sessionmaker.statements.append(statement)
+
+    async def scalars(self, statement) -> 'FakeSession':
+        await self.execute(statement)
+        return self
+
+    def all(self) -> list:
+        return []
+
+    async def commit(self) -> None:
+        pass
+
+
+class FakeSessionmaker:
+    def __init__(self, error: Optional[Exception] = None) -> None:
+        self.error = error
+        self.statements: List = []
+
+    def __call__(self) -> FakeSession:
+        return FakeSession(self)
+
+
+def upserted_urls(statement) -> set:
+    params = statement.compile(dialect=postgresql.dialect()).params
+    return {value for key, value in params.items() if key.startswith('url_')}
+
+
+def test_conditional_headers_are_sent_only_for_parsed_pages():
+    pages = PageStore()
+    pages.put('a', Page('digest', etag='"v1"', last_modified='Wed, 01 May 2024 12:00:00 GMT', parsed=['row']))
+    pages.put('b', Page('digest', etag='"v1"'))
+
+    assert pages.get_headers('a') == {'If-None-Match': '"v1"', 'If-Modified-Since': 'Wed, 01 May 2024 12:00:00 GMT'}
+    assert pages.get_headers('b') == {}
+    assert pages.get_headers('c') == {}
+
+
+def test_only_changed_pages_are_flushed():
+    sessionmaker = FakeSessionmaker()
+    pages = PageStore(sessionmaker)
+    pages.pages['a'] = Page('digest')
+    pages.put('a', Page('digest', parsed=['row']))
+    pages.put('b', Page('digest'))
+
+    asyncio.run(pages.flush())
+    asyncio.run(pages.flush())
+
+    assert len(sessionmaker.statements) == 1
+    assert upserted_urls(sessionmaker.statements[0]) == {'b'}
+
+
+def test_failed_flush_is_retried():
+    sessionmaker = FakeSessionmaker(asyncpg.InvalidCatalogNameError('database "outages" does not exist'))
+    pages = PageStore(sessionmaker)
+    pages.put('a', Page('digest'))
+
+    asyncio.run(pages.flush())
+    sessionmaker.error = None
+    pages.put('b', Page('digest'))
+    asyncio.run(pages.flush())
+
+    assert upserted_urls(sessionmaker.statements[0]) == {'a', 'b'}
+
+
+def test_load_survives_unavailable_database():
+    sessionmaker = FakeSessionmaker(asyncpg.InvalidPasswordError('password authentication failed'))
+    pages = PageStore(sessionmaker)
+
+    asyncio.run(pages.load())
+
+    assert pages.pages == {}
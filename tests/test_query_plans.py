@@ -0,0 +1,83 @@
+import pytest
+from sqlalchemy import Connection, create_engine, select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from settings import DATABASE_URL
+from app.db.models import Outage, Street
+from app.db.outages import active_outages
+
+
+# Synthetic outages inserted (and rolled back) before explaining, with a tenth as many streets
+SEED_OUTAGES = 100_000
+
+# Core application queries, which should never scan street or outage tables
+QUERIES = {
+    'active outages': active_outages(),
+    'outages of street': select(Outage).where(Outage.street_id == 1),
+    'streets of district': select(Street).where(Street.district_id == 1),
+    'street by osm_id': select(Street).where(Street.osm_id == 1),
+}
+
+
+def seed(connection: Connection, outages: int) -> None:
+    """Inserts synthetic districts, streets and mostly resolved outages, then analyzes tables"""
+
+    city_id = connection.execute(
+        text("INSERT INTO city (name_en, name_ka) VALUES ('Seed', 'Seed') RETURNING id")
+    ).scalar()
+    connection.execute(text(
+        "INSERT INTO district (city_id, name_en, name_ka) "
+        "SELECT :city_id, 'Seed ' || g, 'Seed ' || g FROM generate_series(1, 100) g"
+    ), {'city_id': city_id})
+    connection.execute(text(
+        "INSERT INTO street (district_id, name_en, name_ka, osm_id) "
+        "SELECT d.ids[1 + g % 100], 'Seed street ' || g, 'Seed street ' || g, -g "
+        "FROM generate_series(1, :streets) g, "
+        "(SELECT array_agg(id) AS ids FROM district WHERE city_id = :city_id) d"
+    ), {'city_id': city_id, 'streets': max(outages // 10, 100)})
+    connection.execute(text(
+        "INSERT INTO outage (street_id, type, provider, emergency, start, \"end\", "
+        "uuid, fingerprint, created_at, resolved_at) "
+        "SELECT s.ids[1 + g % array_length(s.ids, 1)], 'water', 'Seed', g % 2 = 0, "
+        "now() - (g % 3650) * interval '1 day', now() - (g % 3650) * interval '1 day' + interval '8 hours', "
+        "gen_random_uuid(), md5(g::text) || md5((-g)::text), now(), "
+        "CASE WHEN g % 50 = 0 THEN NULL ELSE now() END "
+        "FROM generate_series(1, :outages) g, "
+        "(SELECT array_agg(id) AS ids FROM street WHERE osm_id < 0) s"
+    ), {'outages': outages})
+    connection.execute(text("ANALYZE street, outage"))
+
+
+def find_seq_scans(plan: dict, relations: set) -> list:
+    """Returns relations scanned sequentially anywhere in EXPLAIN plan tree"""
+
+    scans = []
+    if plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name') in relations:
+        scans.append(plan['Relation Name'])
+    for subplan in plan.get('Plans', []):
+        scans.extend(find_seq_scans(subplan, relations))
+    return scans
+
+
+@pytest.fixture(scope='module')
+def connection():
+    """Connection to seeded database, everything is rolled back afterwards"""
+
+    try:
+        engine = create_engine(DATABASE_URL)
+        connection = engine.connect()
+    except (SQLAlchemyError, ValueError) as err:
+        pytest.skip(f"Postgres is unreachable or not configured. {err}")
+    transaction = connection.begin()
+    seed(connection, SEED_OUTAGES)
+    yield connection
+    transaction.rollback()
+    connection.close()
+    engine.dispose()
+
+
+@pytest.mark.parametrize('name', QUERIES)
+def test_query_uses_indexes(connection: Connection, name: str):
+    compiled = QUERIES[name].compile(connection)
+    plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    assert find_seq_scans(plan[0]['Plan'], {'street', 'outage'}) == []
@@ -0,0 +1,270 @@
+import asyncio
+import json
+from datetime import date
+from typing import Callable, List, Optional
+
+import pytest
+
+from app import refresher as refresher_module
+from app.changes import ChangeSet, get_fingerprint
+from app.parser import AbstractProvider, GetOutagesError
+from app.refresher import OutagesRefresher
+
+
+class FakeProvider(AbstractProvider):
+    """Provider returning `outages` after `delay` seconds, or failing when they are None, counts scraps"""
+
+    NAME = 'Fake'
+    TYPE = 'water'
+    outages: Optional[List[str]] = ['Vake']
+    delay = 0.0
+    scraps = 0
+
+    async def scrap_outages(self, emergency: bool = False) -> list:
+        if not emergency:
+            type(self).scraps += 1
+        await asyncio.sleep(self.delay)
+        if self.outages is None:
+            raise GetOutagesError(f"{self.NAME}: upstream is down")
+        return [
+            {
+                'date': date(2024, 5, 1),
+                'type': self.TYPE,
+                'provider': self.NAME,
+                'emergency': emergency,
+                'title': 'Planned works',
+                'description': description
+            }
+            for description in self.outages
+            if not emergency
+        ]
+
+
+def fake_provider(**attributes) -> type:
+    return type('Provider', (FakeProvider,), attributes)
+
+
+def make_refresher(provider: type, **kwargs) -> OutagesRefresher:
+    return OutagesRefresher(None, providers=[provider], **kwargs)
+
+
+def test_concurrent_gets_of_stale_snapshot_start_one_scrap():
+    provider = fake_provider(delay=0.05)
+
+    async def run():
+        refresher = make_refresher(provider)
+        results = [refresher.get() for _ in range(10)]
+        await refresher._revalidation
+        return results, refresher.get()
+
+    results, fresh = asyncio.run(run())
+    assert provider.scraps == 1
+    assert all(result['stale'] and result['outages'] == () for result in results)
+    assert not fresh['stale']
+    assert [outage['description'] for outage in fresh['outages']] == ['Vake']
+
+
+def test_concurrent_refreshes_are_merged():
+    provider = fake_provider(delay=0.05)
+
+    async def run():
+        refresher = make_refresher(provider)
+        return await asyncio.gather(*[refresher.refresh() for _ in range(5)])
+
+    snapshots = asyncio.run(run())
+    assert provider.scraps == 1
+    assert all(snapshot is snapshots[0] for snapshot in snapshots)
+
+
+def test_stale_snapshot_is_served_while_revalidating():
+    provider = fake_provider(delay=0.05)
+
+    async def run():
+        refresher = make_refresher(provider, max_age=0.01)
+        await refresher.refresh()
+        provider.outages = ['Vake', 'Saburtalo']
+        await asyncio.sleep(0.02)
+        during = refresher.get()
+        await asyncio.sleep(0)
+        assert refresher._lock.locked()
+        still = refresher.get()
+        await refresher._revalidation
+        return during, still, refresher.snapshot
+
+    during, still, snapshot = asyncio.run(run())
+    assert provider.scraps == 2
+    assert during['stale'] and still['stale']
+    assert len(during['outages']) == len(still['outages']) == 1
+    assert len(snapshot.outages) == 2
+
+
+def test_failing_providers_are_scrapped_once_per_max_age():
+    provider = fake_provider()
+
+    async def run():
+        refresher = make_refresher(provider, max_age=0.1)
+        await refresher.refresh()
+        provider.outages = None
+        await asyncio.sleep(0.1)
+        for _ in range(20):
+            refresher.get()
+            if refresher._revalidation is not None:
+                await refresher._revalidation
+            await asyncio.sleep(0.001)
+        return refresher.get()
+
+    result = asyncio.run(run())
+    assert provider.scraps == 2
+    assert result['stale']
+    assert [outage['description'] for outage in result['outages']] == ['Vake']
+
+
+class FakeElection:
+    """Election with leadership set by test, notifications of leader are recorded"""
+
+    def __init__(self, is_leader: bool) -> None:
+        self.is_leader = is_leader
+        self.connected = True
+        self.notified: List[dict] = []
+        self.callbacks: List[Callable[[str], None]] = []
+
+    def on_notification(self, callback: Callable[[str], None]) -> None:
+        self.callbacks.append(callback)
+
+    async def notify(self, payload: str) -> None:
+        self.notified.append(json.loads(payload))
+
+
+class FakeDatabase:
+    """Sessionmaker of sessions sharing active outages, which fake outages functions read and write"""
+
+    def __init__(self, *descriptions: str) -> None:
+        self.outages = [
+            {
+                'date': date(2024, 5, 1),
+                'type': 'water',
+                'provider': 'Fake',
+                'emergency': False,
+                'title': 'Planned works',
+                'description': description,
+                'street_ids': []
+            }
+            for description in descriptions
+        ]
+        self.saves = 0
+
+    def __call__(self) -> 'FakeDatabase':
+        return self
+
+    async def __aenter__(self) -> 'FakeDatabase':
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+    def descriptions(self) -> List[str]:
+        return sorted(outage['description'] for outage in self.outages)
+
+
+async def get_active_outages(session: FakeDatabase) -> List[dict]:
+    return [dict(outage) for outage in session.outages]
+
+
+async def save_outages(session: FakeDatabase, outages: List[dict], providers: List[str]) -> None:
+    session.saves += 1
+    session.outages = [dict(outage, street_ids=[]) for outage in outages]
+
+
+async def save_changes(session: FakeDatabase, changes: ChangeSet) -> None:
+    session.saves += 1
+    removed = {get_fingerprint(outage) for outage in changes.removed}
+    current = {get_fingerprint(outage): outage for outage in changes.added + [new for _, new in changes.changed]}
+    session.outages = [
+        outage for outage in session.outages
+        if get_fingerprint(outage) not in removed and get_fingerprint(outage) not in current
+    ] + [dict(outage, street_ids=[]) for outage in current.values()]
+
+
+@pytest.fixture
+def database(monkeypatch) -> FakeDatabase:
+    for function in (get_active_outages, save_outages, save_changes):
+        monkeypatch.setattr(refresher_module, function.__name__, function)
+    return FakeDatabase('Vake')
+
+
+def make_elected_refresher(provider: type, database: FakeDatabase, election: FakeElection) -> tuple:
+    """Returns refresher with listeners of all and of leader_only change sets, and their calls"""
+
+    refresher = make_refresher(provider, sessionmaker=database, election=election)
+    changes, scrapped_changes = [], []
+    refresher.subscribe(changes.append)
+    refresher.subscribe(scrapped_changes.append, leader_only=True)
+    return refresher, changes, scrapped_changes
+
+
+def test_leader_scraps_saves_and_notifies(database):
+    provider = fake_provider(outages=['Vake', 'Saburtalo'])
+    election = FakeElection(is_leader=True)
+
+    async def run():
+        refresher, changes, scrapped_changes = make_elected_refresher(provider, database, election)
+        await refresher.load()
+        await refresher.refresh()
+        return refresher.snapshot, scrapped_changes
+
+    snapshot, scrapped_changes = asyncio.run(run())
+    assert provider.scraps == 1
+    assert database.descriptions() == ['Saburtalo', 'Vake']
+    assert election.notified == [{'version': 2, 'timed_out': [], 'failed': []}]
+    assert snapshot.version == 2
+    assert [[outage['description'] for outage in changes.added] for changes in scrapped_changes] == [['Saburtalo']]
+
+
+def test_follower_reloads_outages_and_never_scraps(database):
+    provider = fake_provider()
+    election = FakeElection(is_leader=False)
+
+    async def run():
+        refresher, changes, scrapped_changes = make_elected_refresher(provider, database, election)
+        await refresher.load()
+        await refresher.refresh()
+        first = refresher.get()
+        # Leader saves new outages and notifies followers
+        database.outages.append(dict(database.outages[0], description='Gldani'))
+        [callback] = election.callbacks
+        callback(json.dumps({'version': 2, 'timed_out': [], 'failed': ['Other']}))
+        await refresher._revalidation
+        return first, refresher.get(), changes, scrapped_changes
+
+    first, notified, changes, scrapped_changes = asyncio.run(run())
+    assert provider.scraps == 0
+    assert database.saves == 0
+    assert not first['stale'] and [outage['description'] for outage in first['outages']] == ['Vake']
+    assert [outage['description'] for outage in notified['outages']] == ['Vake', 'Gldani']
+    assert notified['failed'] == ('Other',)
+    assert len(changes) == 2
+    assert scrapped_changes == []
+
+
+def test_leader_losing_leadership_while_scraping_reloads_instead(database):
+    provider = fake_provider(outages=['Saburtalo'], delay=0.05)
+    election = FakeElection(is_leader=True)
+
+    async def run():
+        refresher, changes, scrapped_changes = make_elected_refresher(provider, database, election)
+        await refresher.load()
+        refreshing = asyncio.create_task(refresher.refresh())
+        await asyncio.sleep(0.01)
+        election.is_leader = False
+        # New leader saves its own scrap meanwhile
+        database.outages.append(dict(database.outages[0], description='Gldani'))
+        snapshot = await refreshing
+        return snapshot, scrapped_changes
+
+    snapshot, scrapped_changes = asyncio.run(run())
+    assert provider.scraps == 1
+    assert database.saves == 0
+    assert database.descriptions() == ['Gldani', 'Vake']
+    assert election.notified == []
+    assert [outage['description'] for outage in snapshot.outages] == ['Vake', 'Gldani']
+    assert scrapped_changes == []
@@ -0,0 +1,208 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.parser import GetOutagesError, SingleFlight, create_client
+from app.parser.base import _first_success, _get_host_breaker
+from app.parser.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceeded,
+    backoff,
+    budget,
+    remaining,
+    request_timeout
+)
+from benchmarks.stub_server import GWPStubServer, stub_provider
+
+
+def test_no_budget_is_unlimited():
+    assert remaining() is None
+    assert request_timeout(10) == 10
+
+
+def test_budget_limits_request_timeout():
+    with budget(1):
+        assert 0.9 < remaining() <= 1
+        assert request_timeout(10) <= 1
+        assert request_timeout(0.5) == 0.5
+    assert remaining() is None
+
+
+def test_nested_budget_takes_share_and_never_extends_outer_one():
+    with budget(10):
+        with budget(share=0.5):
+            assert 4.9 < remaining() <= 5
+        with budget(20):
+            assert remaining() <= 10
+        assert 9.9 < remaining() <= 10
+
+
+def test_spent_budget_raises_deadline_exceeded():
+    with budget(0):
+        with pytest.raises(DeadlineExceeded):
+            request_timeout(10)
+
+
+def test_budget_is_inherited_by_tasks():
+    async def run():
+        with budget(1):
+            return await asyncio.create_task(asyncio.sleep(0, remaining()))
+
+    assert 0.9 < asyncio.run(run()) <= 1
+
+
+def test_backoff_is_jittered_below_cap():
+    delays = [backoff(attempt, base=0.1, cap=1) for attempt in range(10) for _ in range(10)]
+    assert all(0 <= delay <= 1 for delay in delays)
+    assert all(backoff(0, base=0.1, cap=1) <= 0.1 for _ in range(10))
+
+
+def test_breaker_opens_after_threshold_failures():
+    breaker = CircuitBreaker('host', threshold=3, cooldown=60)
+    for _ in range(2):
+        breaker.failure()
+        breaker.check()
+    breaker.failure()
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_success_resets_breaker():
+    breaker = CircuitBreaker('host', threshold=2, cooldown=60)
+    breaker.failure()
+    breaker.success()
+    breaker.failure()
+    breaker.check()
+    assert not breaker.is_open
+
+
+def test_breaker_lets_single_probe_through_after_cooldown():
+    breaker = CircuitBreaker('host', threshold=1, cooldown=60)
+    breaker.failure()
+    breaker.opened_at = time.monotonic() - 61
+    breaker.check()
+    # Others fail fast while probe is in flight
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    breaker.success()
+    breaker.check()
+    assert not breaker.is_open
+
+
+async def respond(delay: float, status: int = 200) -> httpx.Response:
+    await asyncio.sleep(delay)
+    if status >= 400:
+        request = httpx.Request('GET', 'http://host')
+        raise httpx.HTTPStatusError('failed', request=request, response=httpx.Response(status, request=request))
+    return httpx.Response(status)
+
+
+def test_first_success_skips_failed_tasks():
+    async def run():
+        return await _first_success({
+            asyncio.ensure_future(respond(0, 503)),
+            asyncio.ensure_future(respond(0.01, 200))
+        })
+
+    assert asyncio.run(run()).status_code == 200
+
+
+def test_first_success_raises_error_when_all_failed():
+    async def run():
+        return await _first_success({asyncio.ensure_future(respond(0, 503)), asyncio.ensure_future(respond(0, 503))})
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(run())
+
+
+def scrap(server: GWPStubServer, **attributes) -> list:
+    """Scraps stub server with provider of given class attributes, circuit of stub host starts closed"""
+
+    async def run():
+        async with create_client() as client:
+            _get_host_breaker(server.url).success()
+            provider_class = type('Provider', (stub_provider(server.url),), attributes)
+            return await provider_class(client, flight=SingleFlight(ttl=0)).get_outages(deadline=5)
+
+    return asyncio.run(run())
+
+
+@pytest.fixture(scope='module')
+def expected() -> int:
+    """Number of outages scrapped from stub server without faults"""
+
+    with GWPStubServer(alerts=3) as server:
+        return len(scrap(server))
+
+
+class FailingServer(GWPStubServer):
+    """Stub server responding with 503 to first `failures` requests of given paths"""
+
+    def __init__(self, paths: set, failures: int, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.failing = paths
+        self.failures = failures
+
+    def _respond(self, path: str):
+        if path in self.failing and self.requests.count(path) <= self.failures:
+            return 503, b'Service Unavailable', 0
+        return super()._respond(path)
+
+
+def test_failed_requests_are_retried(expected):
+    with FailingServer({'/en/gadaudebeli', '/en/dagegmili/0'}, failures=2, alerts=3) as server:
+        outages = scrap(server)
+    assert len(outages) == expected
+    assert server.requests.count('/en/dagegmili/0') == 3
+
+
+def test_requests_failing_after_retries_fail_provider():
+    with FailingServer({'/en/dagegmili/0'}, failures=3, alerts=3) as server:
+        with pytest.raises(GetOutagesError):
+            scrap(server, RETRIES=2)
+    assert server.requests.count('/en/dagegmili/0') == 3
+
+
+def test_client_errors_are_not_retried():
+    with GWPStubServer(alerts=3) as server:
+        del server.pages['/en/dagegmili/0']
+        with pytest.raises(GetOutagesError):
+            scrap(server, RETRIES=5)
+    assert server.requests.count('/en/dagegmili/0') == 1
+
+
+def test_programming_errors_are_not_provider_failures():
+    calls = []
+
+    async def match(outages: list) -> list:
+        # Planned and emergency scraps fail together, so no request of the other one is cancelled midway
+        calls.append(outages)
+        while len(calls) < 2:
+            await asyncio.sleep(0.01)
+        raise AttributeError("'NoneType' object has no attribute 'match'")
+
+    with GWPStubServer(alerts=3) as server:
+        with pytest.raises(AttributeError):
+            scrap(server, _divide_outages_by_streets=staticmethod(match))
+
+
+class SlowFirstResponseServer(GWPStubServer):
+    """Stub server delaying first response of every path by tail latency"""
+
+    def _respond(self, path: str):
+        status, body, latency = super()._respond(path)
+        return status, body, latency + (self.tail_latency if self.requests.count(path) == 1 else 0)
+
+
+def test_slow_requests_are_hedged(expected):
+    with SlowFirstResponseServer(alerts=3, tail_latency=2) as server:
+        start_time = time.perf_counter()
+        outages = scrap(server, HEDGE_DELAY=0.05)
+        elapsed = time.perf_counter() - start_time
+    assert len(outages) == expected
+    assert len(server.requests) == 20
+    assert elapsed < 2
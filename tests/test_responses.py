@@ -0,0 +1,109 @@
+import gzip
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import Request
+
+from app.refresher import Snapshot
+from app.responses import cached_response, digest_etag
+
+
+BODY = b'{"outages":[' + b','.join(b'{"id":%d}' % index for index in range(100)) + b']}'
+
+
+def make_request(**headers: str) -> Request:
+    return Request({
+        'type': 'http',
+        'method': 'GET',
+        'path': '/outages',
+        'headers': [(name.replace('_', '-').encode(), value.encode()) for name, value in headers.items()]
+    })
+
+
+def test_identity_response_has_content_etag():
+    response = cached_response(make_request(), BODY, digest_etag(BODY), 'application/json', 'no-cache')
+    assert response.status_code == 200
+    assert response.body == BODY
+    assert response.headers['etag'] == f'"{digest_etag(BODY)}"'
+    assert response.headers['cache-control'] == 'no-cache'
+    assert 'content-encoding' not in response.headers
+
+
+def test_compressed_response_has_etag_of_encoding():
+    response = cached_response(
+        make_request(accept_encoding='gzip'), BODY, digest_etag(BODY), 'application/json', 'no-cache'
+    )
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.headers['etag'] == f'"{digest_etag(BODY)}-gzip"'
+    assert gzip.decompress(response.body) == BODY
+
+
+@pytest.mark.parametrize('accept_encoding, encoding', [
+    ('gzip;q=0.5', 'gzip'),
+    ('br, *;q=0.1', 'gzip'),
+    ('gzip;q=0.00, *', None),
+    ('gzip;q=0, deflate', None),
+    ('gzip;q=invalid', None),
+    ('br', None),
+])
+def test_encoding_is_chosen_by_q_value(accept_encoding, encoding):
+    response = cached_response(
+        make_request(accept_encoding=accept_encoding), BODY, digest_etag(BODY), 'application/json', 'no-cache'
+    )
+    assert response.headers.get('content-encoding') == encoding
+
+
+def test_matching_etag_is_not_modified():
+    etag = digest_etag(BODY)
+    for if_none_match in (f'"{etag}"', f'W/"{etag}"', f'"other", "{etag}"', '*'):
+        response = cached_response(
+            make_request(if_none_match=if_none_match), BODY, etag, 'application/json', 'no-cache'
+        )
+        assert response.status_code == 304
+        assert response.body == b''
+
+
+def test_etag_of_other_encoding_is_modified():
+    etag = digest_etag(BODY)
+    response = cached_response(
+        make_request(accept_encoding='gzip', if_none_match=f'"{etag}"'), BODY, etag, 'application/json', 'no-cache'
+    )
+    assert response.status_code == 200
+
+
+def test_weak_etag_is_matched_weakly_and_last_modified_is_sent():
+    etag = digest_etag(BODY)
+    updated_at = datetime(2024, 5, 1, 12, tzinfo=timezone.utc)
+    for if_none_match in (None, f'"{etag}"', f'W/"{etag}"'):
+        headers = {} if if_none_match is None else {'if_none_match': if_none_match}
+        response = cached_response(
+            make_request(**headers), BODY, etag, 'application/json', 'no-cache', weak=True, last_modified=updated_at
+        )
+        assert response.status_code == (200 if if_none_match is None else 304)
+        assert response.headers['etag'] == f'W/"{etag}"'
+        assert response.headers['last-modified'] == 'Wed, 01 May 2024 12:00:00 GMT'
+
+
+def test_bodies_of_same_weak_etag_are_compressed_separately():
+    other = BODY.replace(b'"id":1,', b'"id":-1,')
+    responses = [
+        cached_response(make_request(accept_encoding='gzip'), body, 'same', 'application/json', 'no-cache', weak=True)
+        for body in (BODY, other)
+    ]
+    assert [gzip.decompress(response.body) for response in responses] == [BODY, other]
+
+
+def test_snapshot_etag_follows_outages_only():
+    vake = {'fingerprint': 'a', 'description': 'Vake'}
+    gldani = {'fingerprint': 'b', 'description': 'Gldani'}
+    first = Snapshot((vake, gldani), failed=('GWP',), updated_at=datetime(2024, 5, 1, 12), version=1)
+    # Snapshot of the same outages renewed later, or loaded by another process in other order
+    renewed = Snapshot((vake, gldani), failed=('GWP',), updated_at=datetime(2024, 5, 1, 12, 5), version=1)
+    other = Snapshot((gldani, vake), failed=('GWP',), updated_at=datetime(2024, 5, 1, 12, 1), version=7)
+    changed = Snapshot((dict(vake, description='Saburtalo'), gldani), failed=('GWP',), version=1)
+
+    assert first.body() != renewed.body()
+    assert first.etag() == renewed.etag() == other.etag()
+    assert first.etag() != changed.etag()
+    assert first.etag() != Snapshot((vake, gldani), version=1).etag()
+    assert first.etag() != first.etag(stale=True)
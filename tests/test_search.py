@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from app.search import StreetIndex
+
+
+STREETS = [
+    (1, 1, 'Ilia Chavchavadze Avenue', 'ილია ჭავჭავაძის გამზირი'),
+    # Another way of the same street
+    (2, 1, 'Ilia Chavchavadze Avenue', 'ილია ჭავჭავაძის გამზირი'),
+    (3, 2, 'Chavchavadze Street', 'ჭავჭავაძის ქუჩა'),
+    (4, 2, 'Stanislavski Street', 'სტანისლავსკის ქუჩა'),
+    (5, 3, 'Avlabari Street', 'ავლაბრის ქუჩა'),
+    (6, 3, 'Kvishis Street', 'ქვიშის ქუჩა'),
+    (7, 1, 'Merab Kostava Street', 'მერაბ კოსტავას ქუჩა'),
+]
+
+
+@pytest.fixture(scope='module')
+def index() -> StreetIndex:
+    return StreetIndex(STREETS)
+
+
+def search(index: StreetIndex, query: str) -> list:
+    return [entry['name_en'] for entry in asyncio.run(index.search(query, limit=3))]
+
+
+def test_ways_of_street_are_merged(index):
+    entry = asyncio.run(index.search('ilia chavchavadze', limit=1))[0]
+    assert entry['street_ids'] == [1, 2]
+    assert entry['district_ids'] == [1]
+
+
+@pytest.mark.parametrize('query, names', [
+    ('kost', ['Merab Kostava Street']),
+    ('ჭავჭავ', ['Chavchavadze Street', 'Ilia Chavchavadze Avenue']),
+    ('ilia chav', ['Ilia Chavchavadze Avenue', 'Chavchavadze Street']),
+])
+def test_names_starting_with_query_are_ranked_first_then_shorter(index, query, names):
+    assert search(index, query) == names
+
+
+@pytest.mark.parametrize('query, names', [
+    ('kostavq', ['Merab Kostava Street']),
+    ('chavcavadze', ['Chavchavadze Street', 'Ilia Chavchavadze Avenue']),
+])
+def test_typos_are_tolerated(index, query, names):
+    assert search(index, query) == names
+
+
+@pytest.mark.parametrize('query, names', [
+    ('st', ['Stanislavski Street']),
+    ('av', ['Avlabari Street']),
+    ('ქ', ['Kvishis Street']),
+])
+def test_street_type_word_is_kept_as_last_prefix(index, query, names):
+    assert search(index, query) == names
+
+
+def test_street_type_words_before_last_one_are_ignored(index):
+    assert search(index, 'street kostava') == ['Merab Kostava Street']
+
+
+def test_unknown_and_empty_queries_find_nothing(index):
+    assert search(index, 'xyz') == []
+    assert search(index, '') == []
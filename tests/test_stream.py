@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import pytest
+
+from app.changes import ChangeSet
+from app.stream import OutagesHub
+
+
+def parse(event: str) -> tuple:
+    """Returns (name, id, data) of Server-Sent Event"""
+
+    fields = dict(line.split(': ', 1) for line in event.strip().split('\n'))
+    return fields['event'], int(fields['id']), json.loads(fields['data'])
+
+
+def outage(description: str) -> dict:
+    return {'description': description, 'fingerprint': description}
+
+
+def test_subscribers_get_snapshot_then_same_deltas():
+    async def run():
+        hub = OutagesHub()
+        hub.publish(ChangeSet(added=[outage('Vake')]))
+        first, second = hub.subscribe(), hub.subscribe()
+        snapshots = [await first.__anext__(), await second.__anext__()]
+        hub.publish(ChangeSet(added=[outage('Gldani')], removed=[outage('Vake')]))
+        deltas = [await first.__anext__(), await second.__anext__()]
+        await first.aclose()
+        await second.aclose()
+        return snapshots, deltas
+
+    snapshots, deltas = asyncio.run(run())
+    assert parse(snapshots[0]) == ('snapshot', 1, {'outages': [outage('Vake')]})
+    assert deltas[0] is deltas[1]
+    assert parse(deltas[0]) == ('delta', 2, {'added': [outage('Gldani')], 'changed': [], 'resolved': ['Vake']})
+
+
+def test_snapshot_follows_published_changes():
+    hub = OutagesHub()
+    vake = outage('Vake')
+    hub.publish(ChangeSet(added=[vake, outage('Gldani')]))
+    hub.publish(ChangeSet(changed=[(vake, dict(vake, title='Extended'))], removed=[outage('Gldani')]))
+
+    assert parse(hub.snapshot()) == ('snapshot', 2, {'outages': [dict(vake, title='Extended')]})
+    assert hub.snapshot() is hub.snapshot()
+
+
+def test_empty_change_set_is_not_sent():
+    async def run():
+        hub = OutagesHub(keepalive=0.01)
+        subscriber = hub.subscribe()
+        await subscriber.__anext__()
+        hub.publish(ChangeSet())
+        event = await subscriber.__anext__()
+        await subscriber.aclose()
+        return hub, event
+
+    hub, event = asyncio.run(run())
+    assert hub.version == 0
+    assert event == ': keep-alive\n\n'
+
+
+def test_slow_subscriber_is_dropped_after_pending_events():
+    async def run():
+        hub = OutagesHub(queue_size=2)
+        slow, fast = hub.subscribe(), hub.subscribe()
+        await slow.__anext__()
+        await fast.__anext__()
+        received = []
+        for description in ('Vake', 'Gldani', 'Isani'):
+            hub.publish(ChangeSet(added=[outage(description)]))
+            received.append(await fast.__anext__())
+        pending = [event async for event in slow]
+        subscribers = len(hub._subscribers)
+        await fast.aclose()
+        return received, pending, subscribers
+
+    received, pending, subscribers = asyncio.run(run())
+    assert len(received) == 3
+    assert pending == received[:2]
+    assert subscribers == 1
+
+
+@pytest.mark.parametrize('disconnect', ['close', 'cancel'])
+def test_disconnected_subscriber_is_removed(disconnect):
+    async def run():
+        hub = OutagesHub()
+        subscriber = hub.subscribe()
+        await subscriber.__anext__()
+        assert len(hub._subscribers) == 1
+        if disconnect == 'close':
+            await subscriber.aclose()
+        else:
+            task = asyncio.ensure_future(subscriber.__anext__())
+            await asyncio.sleep(0)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        hub.publish(ChangeSet(added=[outage('Vake')]))
+        return hub
+
+    assert asyncio.run(run())._subscribers == set()
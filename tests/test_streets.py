@@ -0,0 +1,51 @@
+import pytest
+
+from app.parser.streets import StreetMatcher, stem
+
+
+STREETS = [
+    (1, 'Merab Kostava Street', 'მერაბ კოსტავას ქუჩა'),
+    (2, 'Beijing Avenue', 'პეკინის გამზირი'),
+    (3, 'Ilia Chavchavadze Avenue', 'ილია ჭავჭავაძის გამზირი'),
+    (4, '1st Lane of Vazha-Pshavela', 'ვაჟა-ფშაველას 1-ლი შესახვევი'),
+    (5, 'Rustaveli', None),
+]
+
+
+@pytest.fixture(scope='module')
+def matcher() -> StreetMatcher:
+    return StreetMatcher(STREETS)
+
+
+@pytest.mark.parametrize('text, street_ids', [
+    ('Vake district, Chavchavadze ave. N37', [3]),
+    ('Kostava st. and Beijing Avenue', [1, 2]),
+    ('I. Chavchavadze Avenue N12', [3]),
+    ('Rustaveli Avenue', []),
+    ('Saburtalo district', []),
+])
+def test_matches_english_names_and_abbreviations(matcher, text, street_ids):
+    assert matcher.match(text) == street_ids
+
+
+@pytest.mark.parametrize('text, street_ids', [
+    ('მერაბ კოსტავას ქუჩა', [1]),
+    ('კოსტავას ქ. 5', [1]),
+    ('კოსტავას ქუჩაზე', [1]),
+    ('პეკინის გამზირზე და ჭავჭავაძის გამზირზე', [2, 3]),
+    ('კოსტავაზე', [1]),
+    ('ვაჟა-ფშაველას 1-ლი შესახვევი', [4]),
+])
+def test_matches_declined_georgian_names(matcher, text, street_ids):
+    assert matcher.match(text) == street_ids
+
+
+def test_short_fragments_are_not_matched(matcher):
+    assert matcher.match('ლი') == []
+
+
+def test_stem_strips_georgian_endings_only():
+    assert stem('კოსტავაზე') == stem('კოსტავას') == stem('კოსტავა')
+    assert stem('ქუჩაზე') == stem('ქუჩა')
+    assert stem('ქ') == 'ქ'
+    assert stem('street') == 'street'